@@ -0,0 +1,220 @@
+"""
+In-process interval index over the active bookings of each venue.
+
+``Booking.is_date_available`` and ``Booking.get_available_dates`` answer from
+this index with a binary search instead of loading overlapping rows on every
+call. The index for a venue is built with a single query the first time it is
+needed, dropped whenever one of its bookings is saved or deleted (see
+booking/signals.py), and expires after ``BOOKING_AVAILABILITY_INDEX_TTL``
+seconds so that other worker processes — which never see this process'
+signals — converge on fresh data. Until then the index can miss another
+worker's booking, so it only serves read endpoints: the write-path checks
+(``Booking.clean``, the create serializer) always run the overlap query.
+
+While a transaction is open the index is never (re)built, so uncommitted rows
+can't leak into the shared cache; callers fall back to the database instead.
+
+On PostgreSQL the database itself rejects overlapping active bookings through
+the ``booking_no_overlapping_active`` exclusion constraint (migration 0028),
+so the write path skips the Python pre-checks there and translates the
+constraint violation into the usual validation error instead.
+"""
+
+import bisect
+import heapq
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+# Statuses that block a venue's calendar.
+ACTIVE_STATUSES = ('solicitud', 'aceptacion', 'apartado', 'liquidado', 'liquidado_entregado', 'entregado')
+
+# Name of the GiST exclusion constraint installed on PostgreSQL.
+OVERLAP_CONSTRAINT = 'booking_no_overlapping_active'
+OVERLAP_ERROR = 'This time range is not available for the selected venue.'
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+class VenueIntervalIndex:
+    """Booking intervals of one venue sorted by start, with a running max of ends.
+
+    ``max_ends`` is non-decreasing, so the first interval that can still reach
+    past a given instant is found with a bisect; together with a bisect over
+    ``starts`` this bounds every overlap lookup to O(log n + k).
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (row[1], row[2]))
+        self.ids = [str(row[0]) for row in rows]
+        self.starts = [row[1] for row in rows]
+        self.ends = [row[2] for row in rows]
+        self.max_ends = []
+        running = None
+        for end in self.ends:
+            running = end if running is None or end > running else running
+            self.max_ends.append(running)
+        self.id_set = set(self.ids)
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def is_expired(self):
+        ttl = getattr(settings, 'BOOKING_AVAILABILITY_INDEX_TTL', 30)
+        return time.monotonic() - self.built_at > ttl
+
+    def overlapping(self, start, end, exclude_id=None):
+        """Yield (id, start, end) for every interval overlapping [start, end)."""
+        exclude_id = str(exclude_id) if exclude_id else None
+        hi = bisect.bisect_left(self.starts, end)
+        lo = bisect.bisect_right(self.max_ends, start, 0, hi)
+        for i in range(lo, hi):
+            if self.ends[i] > start and self.ids[i] != exclude_id:
+                yield self.ids[i], self.starts[i], self.ends[i]
+
+    def has_overlap(self, start, end, exclude_id=None):
+        return next(self.overlapping(start, end, exclude_id), None) is not None
+
+
+def build_index(venue_id):
+    """Load the venue's active bookings and install a fresh index for it."""
+    from .models import Booking
+
+    rows = Booking.objects.filter(
+        venue_id=venue_id,
+        status__in=ACTIVE_STATUSES,
+    ).values_list('id', 'start_datetime', 'end_datetime')
+    index = VenueIntervalIndex(rows)
+    with _lock:
+        _indexes[venue_id] = index
+    return index
+
+
+def get_index(venue_id):
+    """Return a warm index for the venue, building it if possible, else None."""
+    index = _indexes.get(venue_id)
+    if index is not None and not index.is_expired():
+        return index
+    if connection.in_atomic_block:
+        return None
+    return build_index(venue_id)
+
+
+def invalidate(venue_id=None):
+    """Drop the index of one venue, or of every venue when no id is given."""
+    with _lock:
+        if venue_id is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(venue_id, None)
+
+
+def invalidate_booking(booking):
+    """Drop every index that holds, or should hold, the given booking.
+
+    Runs immediately and again once the surrounding transaction commits, so an
+    index rebuilt by a concurrent request from pre-commit data doesn't stick.
+    """
+    def _drop():
+        booking_id = str(booking.pk)
+        with _lock:
+            for venue_id in [v for v, idx in _indexes.items() if booking_id in idx.id_set]:
+                _indexes.pop(venue_id, None)
+            _indexes.pop(booking.venue_id, None)
+
+    _drop()
+    transaction.on_commit(_drop)
+
+
+def sweep_overlaps(intervals, queries):
+    """Overlap join of booked intervals against candidate ranges of one venue.
+
+    ``intervals`` holds (id, start, end) rows, ``queries`` (start, end) pairs;
+    returns, for each query in order, the ids of the intervals overlapping it.
+    A single sweep over both lists sorted by start keeps only the still-open
+    items of each side, so the cost is O((n + m) log(n + m) + matches).
+    """
+    events = sorted(
+        [(start, 0, i) for i, (_, start, _end) in enumerate(intervals)]
+        + [(start, 1, j) for j, (start, _end) in enumerate(queries)]
+    )
+    open_intervals, open_queries = {}, {}
+    interval_heap, query_heap = [], []
+    matches = [[] for _ in queries]
+
+    def expire(heap, active, now):
+        while heap and heap[0][0] <= now:
+            active.pop(heapq.heappop(heap)[1], None)
+
+    for start, kind, idx in events:
+        expire(interval_heap, open_intervals, start)
+        expire(query_heap, open_queries, start)
+        if kind == 0:
+            booking_id, _, end = intervals[idx]
+            if end <= start:
+                continue
+            for j in open_queries:
+                matches[j].append(booking_id)
+            open_intervals[idx] = booking_id
+            heapq.heappush(interval_heap, (end, idx))
+        else:
+            end = queries[idx][1]
+            if end <= start:
+                continue
+            matches[idx].extend(open_intervals.values())
+            open_queries[idx] = True
+            heapq.heappush(query_heap, (end, idx))
+    return matches
+
+
+def db_enforces_overlap(using='default'):
+    """True when the database rejects overlapping active bookings by itself."""
+    return connections[using].vendor == 'postgresql'
+
+
+def is_overlap_violation(exc):
+    return OVERLAP_CONSTRAINT in str(exc)
+
+
+def overlap_error_dict():
+    return {
+        'start_datetime': OVERLAP_ERROR,
+        'end_datetime': OVERLAP_ERROR,
+    }
+
+
+def local_day_span(start, end):
+    """First and last local dates touched by the half-open interval [start, end).
+
+    An interval ending exactly at local midnight does not touch the next day,
+    so events that close at 00:00 occupy only the day they started on.
+    """
+    first = timezone.localtime(start).date()
+    last = timezone.localtime(end).date()
+    if last > first and end <= make_local_datetime(last):
+        last -= datetime.timedelta(days=1)
+    return first, last
+
+
+def make_local_datetime(day, time=datetime.time.min):
+    combined = datetime.datetime.combine(day, time)
+    return timezone.make_aware(combined) if settings.USE_TZ else combined
+
+
+def booked_days(intervals, start_date, end_date):
+    """Set of dates in [start_date, end_date] touched by any of the intervals."""
+    booked = set()
+    for interval_start, interval_end in intervals:
+        first, last = local_day_span(interval_start, interval_end)
+        current = max(first, start_date)
+        last = min(last, end_date)
+        while current <= last:
+            booked.add(current)
+            current += datetime.timedelta(days=1)
+    return booked
@@ -0,0 +1,148 @@
+"""
+In-memory stand-in for the Google Calendar v3 service, for tests and offline
+development::
+
+    from booking import google_calendar
+    from booking.fake_calendar import FakeCalendarService
+
+    fake = FakeCalendarService()
+    google_calendar.set_service(fake)
+
+Implements the parts of the client used by booking/google_calendar.py:
+``events().insert/patch/update/delete/get/list`` and
+``new_batch_http_request``. Each ``execute()`` of a single request, or of a
+whole batch, counts as one HTTP round trip in ``http_requests``; ``calls``
+records every API method invoked, batched or not.
+
+``list`` follows the incremental sync protocol: every response's last page
+carries a ``nextSyncToken``, and listing with it returns only the events
+changed since (deleted ones with ``status: cancelled``). Tokens listed in
+``expired_tokens`` answer 410 Gone, like tokens the real API has dropped.
+"""
+
+import copy
+import uuid
+
+
+class FakeHttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status} {message}")
+        self.status = status
+
+
+class _Request:
+    def __init__(self, service, method, kwargs):
+        self.service = service
+        self.method = method
+        self.kwargs = kwargs
+
+    def execute(self):
+        self.service.http_requests += 1
+        return self.service._call(self.method, self.kwargs)
+
+
+class _BatchRequest:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        request_id = request_id or str(len(self.requests))
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        self.service.http_requests += 1
+        for request_id, request, callback in self.requests:
+            try:
+                response = self.service._call(request.method, request.kwargs)
+            except FakeHttpError as e:
+                callback(request_id, None, e)
+            else:
+                callback(request_id, response, None)
+
+
+class _Events:
+    def __init__(self, service):
+        self.service = service
+
+    def __getattr__(self, method):
+        if method not in ('insert', 'patch', 'update', 'delete', 'get', 'list'):
+            raise AttributeError(method)
+        return lambda **kwargs: _Request(self.service, method, kwargs)
+
+
+class FakeCalendarService:
+    page_size = 250
+
+    def __init__(self):
+        self.events_by_id = {}
+        self.calls = []
+        self.http_requests = 0
+        self.failing_event_ids = set()
+        self.expired_tokens = set()
+        # Change sequence: each write stamps the event, sync tokens are sequence numbers.
+        self.sequence = 0
+        self._changed_at = {}
+
+    def _touch(self, event_id):
+        self.sequence += 1
+        self._changed_at[event_id] = self.sequence
+
+    def events(self):
+        return _Events(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _BatchRequest(self, callback)
+
+    def _call(self, method, kwargs):
+        event_id = kwargs.get('eventId')
+        self.calls.append((method, event_id))
+        if event_id in self.failing_event_ids:
+            raise FakeHttpError(500, f"Backend error for {event_id}")
+        if method == 'list':
+            return self._list(kwargs)
+        if method == 'insert':
+            event = copy.deepcopy(kwargs['body'])
+            event['id'] = uuid.uuid4().hex
+            event.setdefault('iCalUID', f"{event['id']}@google.com")
+            event['status'] = 'confirmed'
+            self.events_by_id[event['id']] = event
+            self._touch(event['id'])
+            return copy.deepcopy(event)
+
+        event = self.events_by_id.get(event_id)
+        if event is None or (method != 'get' and event.get('status') == 'cancelled'):
+            raise FakeHttpError(404, f"Event {event_id} not found")
+        if method == 'get':
+            return copy.deepcopy(event)
+        if method == 'delete':
+            event['status'] = 'cancelled'
+            self._touch(event_id)
+            return ''
+        if method == 'patch':
+            event.update(copy.deepcopy(kwargs['body']))
+        else:
+            self.events_by_id[event_id] = dict(copy.deepcopy(kwargs['body']), id=event_id, status='confirmed')
+        self._touch(event_id)
+        return copy.deepcopy(self.events_by_id[event_id])
+
+    def _list(self, kwargs):
+        sync_token = kwargs.get('syncToken')
+        if sync_token is not None:
+            if sync_token in self.expired_tokens or not sync_token.isdigit() or int(sync_token) > self.sequence:
+                raise FakeHttpError(410, "Sync token is no longer valid, a full sync is required.")
+            since = int(sync_token)
+            ids = [event_id for event_id, seq in self._changed_at.items() if seq > since]
+        else:
+            ids = [event_id for event_id, event in self.events_by_id.items() if event.get('status') != 'cancelled']
+        ids.sort(key=self._changed_at.get)
+
+        offset = int(kwargs.get('pageToken') or 0)
+        page_size = kwargs.get('maxResults') or self.page_size
+        response = {'items': [copy.deepcopy(self.events_by_id[event_id]) for event_id in ids[offset:offset + page_size]]}
+        if offset + page_size < len(ids):
+            response['nextPageToken'] = str(offset + page_size)
+        else:
+            response['nextSyncToken'] = str(self.sequence)
+        return response
@@ -0,0 +1,304 @@
+"""
+Two-way, incremental Google Calendar sync.
+
+Push: a booking is sent to Google only when its event body changed, i.e. when
+``google_calendar.event_hash()`` differs from ``Booking.gcal_event_hash``, so
+saves that don't touch the event (and re-runs of the sync) cost no API call.
+Dirty bookings are created/patched in batches (google_calendar.sync_events).
+
+Pull: ``events.list`` with the sync token stored in ``CalendarSyncState``
+returns only the events changed since the previous run. Our own pushes come
+back in that listing; their times and text already match the booking, so
+they are recognised as echoes and skipped. Real edits made in Google move the
+booking, events created in Google become "[GCal]" bookings (the same
+placeholders import_gcal creates; events it already imported are linked to
+their booking by UID), deleted events cancel "[GCal]" bookings and
+unlink the others so the next push recreates them.
+
+"[GCal]" bookings are owned by the calendar: they are pulled, never pushed.
+"""
+
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import google_calendar as gcal
+from .availability import make_local_datetime
+
+# Description prefix of bookings that mirror events created in Google Calendar
+GCAL_PREFIX = '[GCal]\n'
+
+
+def is_google_owned(booking):
+    return (booking.description or '').startswith(GCAL_PREFIX)
+
+
+def push(bookings):
+    """Create or patch the events of the bookings whose event body changed.
+
+    Returns ``(errors, requests)``: ``errors`` maps the pk of every booking
+    that was sent to its error (None on success).
+    """
+    from .models import Booking
+
+    dirty, hashes = [], {}
+    for booking in bookings:
+        if is_google_owned(booking):
+            continue
+        body_hash = gcal.event_hash(booking)
+        if booking.google_calendar_event_id and body_hash == booking.gcal_event_hash:
+            continue
+        dirty.append(booking)
+        hashes[booking.pk] = body_hash
+    if not dirty:
+        return {}, 0
+
+    results, requests = gcal.sync_events(dirty, hashes)
+    errors, synced = {}, []
+    for booking in dirty:
+        event_id, error = results.get(booking.pk, (None, "El servicio de Google Calendar no está disponible."))
+        errors[booking.pk] = error
+        if error is None:
+            booking.google_calendar_event_id = event_id
+            booking.gcal_event_hash = hashes[booking.pk]
+            synced.append(booking)
+    # bulk_update, not save(): storing the sync bookkeeping must not trigger another sync.
+    Booking.objects.bulk_update(synced, ['google_calendar_event_id', 'gcal_event_hash'])
+    return errors, requests
+
+
+def push_changed():
+    """Push every booking saved since the last push run. Returns stats."""
+    from .models import Booking, CalendarSyncState
+
+    state, _ = CalendarSyncState.objects.get_or_create(calendar_id=settings.GOOGLE_CALENDAR_ID)
+    started_at = timezone.now()
+    candidates = Booking.objects.select_related('user', 'venue', 'package').prefetch_related('extra_services')
+    if state.last_pushed_at is not None:
+        candidates = candidates.filter(updated_at__gte=state.last_pushed_at)
+
+    stats = Counter()
+    for offset in range(0, candidates.count(), 500):
+        errors, requests = push(candidates.order_by('pk')[offset:offset + 500])
+        stats['push_requests'] += requests
+        stats['pushed'] += sum(1 for error in errors.values() if error is None)
+        stats['push_errors'] += sum(1 for error in errors.values() if error is not None)
+
+    if not stats['push_errors']:
+        state.last_pushed_at = started_at
+        state.save(update_fields=['last_pushed_at'])
+    return stats
+
+
+def _event_times(event, config):
+    """(start, end) of an event as a booking would store them, or (None, None)."""
+    start, end = event.get('start') or {}, event.get('end') or {}
+    if 'dateTime' in start and 'dateTime' in end:
+        return datetime.datetime.fromisoformat(start['dateTime']), datetime.datetime.fromisoformat(end['dateTime'])
+    if 'date' in start:
+        # All-day events span whole days; the end date is exclusive.
+        first = datetime.date.fromisoformat(start['date'])
+        last = datetime.date.fromisoformat(end['date']) - datetime.timedelta(days=1) if 'date' in end else first
+        return make_local_datetime(first, config.open_time), make_local_datetime(max(first, last), config.close_time)
+    return None, None
+
+
+def _snap_to_hours(start, end, config):
+    """Placeholder bookings use the venue's opening hours, like import_gcal."""
+    start = make_local_datetime(timezone.localtime(start).date(), config.open_time)
+    end = make_local_datetime(timezone.localtime(end).date(), config.close_time)
+    if end <= start:
+        end += datetime.timedelta(days=1)
+    return start, end
+
+
+def _gcal_description(event):
+    parts = [GCAL_PREFIX.rstrip('\n'), event.get('summary') or 'Evento importado']
+    if (event.get('description') or '').strip():
+        parts.append(event['description'].strip())
+    return '\n'.join(parts)
+
+
+def _save(booking, stats, counter):
+    try:
+        with transaction.atomic():
+            booking.save()
+    except (ValidationError, IntegrityError) as e:
+        stats['conflicts'] += 1
+        print(f"[Google Calendar] No se aplicó el evento {booking.google_calendar_event_id}: {e}")
+        return False
+    stats[counter] += 1
+    return True
+
+
+class _Defaults:
+    """Owner, venue and package of placeholder bookings, resolved on first use."""
+
+    def __init__(self):
+        self._values = None
+
+    def get(self):
+        from .models import Package, Venue
+
+        if self._values is None:
+            User = get_user_model()
+            self._values = (
+                User.objects.filter(is_staff=True).order_by('pk').first(),
+                Venue.objects.order_by('pk').first(),
+                Package.objects.order_by('price').first(),
+            )
+        return self._values
+
+
+def _ical_uid(event):
+    # The key import_gcal and the pull store in gcal_uid; instances of recurring events have none.
+    return None if event.get('recurringEventId') else event.get('iCalUID')
+
+
+def _linked_bookings(events):
+    """Booking of every event that has one, keyed by event id.
+
+    Looked up by event id, then by the booking_id our pushes store on the
+    event, then by UID: bookings from import_gcal (or whose link was lost)
+    know only the UID of their event.
+    """
+    from .models import Booking
+
+    queryset = Booking.objects.select_related('user', 'venue', 'package')
+    event_ids = [event['id'] for event in events]
+    linked = {booking.google_calendar_event_id: booking for booking in queryset.filter(google_calendar_event_id__in=event_ids)}
+
+    orphans = [event for event in events if event['id'] not in linked]
+    booking_ids = {
+        event['id']: ((event.get('extendedProperties') or {}).get('private') or {}).get('booking_id')
+        for event in orphans
+    }
+    booking_ids = {event_id: pk for event_id, pk in booking_ids.items() if pk}
+    if booking_ids:
+        try:
+            by_pk = {str(booking.pk): booking for booking in queryset.filter(pk__in=set(booking_ids.values()))}
+        except ValidationError:
+            by_pk = {}
+        for event_id, pk in booking_ids.items():
+            if pk in by_pk:
+                linked[event_id] = by_pk[pk]
+
+    uids = {event['id']: _ical_uid(event) for event in orphans if event['id'] not in linked}
+    uids = {event_id: uid for event_id, uid in uids.items() if uid}
+    if uids:
+        by_uid = {booking.gcal_uid: booking for booking in queryset.filter(gcal_uid__in=set(uids.values()))}
+        for event_id, uid in uids.items():
+            if uid in by_uid:
+                linked[event_id] = by_uid[uid]
+    return linked
+
+
+def apply_events(events):
+    """Apply pulled events to the bookings. Returns stats."""
+    from .models import Booking, BookingLineItem, VenueConfiguration
+
+    stats = Counter()
+    config = VenueConfiguration.get_config()
+    defaults = _Defaults()
+    linked = _linked_bookings(events)
+    moved = []
+
+    for event in events:
+        booking = linked.get(event['id'])
+
+        if event.get('status') == 'cancelled':
+            if booking is None:
+                stats['ignored'] += 1
+            elif is_google_owned(booking):
+                if booking.status != 'cancelado':
+                    booking.status = 'cancelado'
+                    _save(booking, stats, 'cancelled')
+            else:
+                # Bumping updated_at puts it back in push_changed()'s candidates.
+                Booking.objects.filter(pk=booking.pk).update(
+                    google_calendar_event_id=None, gcal_event_hash=None, updated_at=timezone.now(),
+                )
+                stats['unlinked'] += 1
+            continue
+
+        start, end = _event_times(event, config)
+        if start is None:
+            stats['ignored'] += 1
+            continue
+
+        if booking is None:
+            user, venue, package = defaults.get()
+            if not (user and venue and package):
+                stats['ignored'] += 1
+                continue
+            start, end = _snap_to_hours(start, end, config)
+            booking = Booking(
+                user=user, venue=venue, package=package,
+                start_datetime=start, end_datetime=end,
+                description=_gcal_description(event),
+                status='finalizado' if end < timezone.now() else 'aceptacion',
+                google_calendar_event_id=event['id'],
+                # Same key import_gcal uses, so importing an export later updates this booking.
+                gcal_uid=_ical_uid(event),
+            )
+            line_items = booking.build_line_items(extra_services=[])
+            if _save(booking, stats, 'created'):
+                BookingLineItem.objects.bulk_create(line_items)
+            continue
+
+        if booking.google_calendar_event_id != event['id']:
+            Booking.objects.filter(pk=booking.pk).update(google_calendar_event_id=event['id'])
+            booking.google_calendar_event_id = event['id']
+
+        if is_google_owned(booking):
+            start, end = _snap_to_hours(start, end, config)
+            description = _gcal_description(event)
+        else:
+            description = booking.description
+        if (start, end, description) == (booking.start_datetime, booking.end_datetime, booking.description):
+            # Our own push coming back, or a change to fields we don't mirror.
+            stats['echoes'] += 1
+            continue
+
+        booking.start_datetime, booking.end_datetime, booking.description = start, end, description
+        if _save(booking, stats, 'updated') and not is_google_owned(booking):
+            moved.append(booking.pk)
+
+    if moved:
+        # The event already shows the new times; record its hash so the push
+        # triggered by the save above doesn't send it straight back.
+        refreshed = list(
+            Booking.objects.select_related('user', 'venue', 'package')
+            .prefetch_related('extra_services').filter(pk__in=moved)
+        )
+        for booking in refreshed:
+            booking.gcal_event_hash = gcal.event_hash(booking)
+        Booking.objects.bulk_update(refreshed, ['gcal_event_hash'])
+    return stats
+
+
+def pull(full=False):
+    """Fetch the events changed since the last pull and apply them. Returns stats."""
+    from .models import CalendarSyncState
+
+    state, _ = CalendarSyncState.objects.get_or_create(calendar_id=settings.GOOGLE_CALENDAR_ID)
+    token = None if full else (state.sync_token or None)
+    expired = 0
+    try:
+        events, next_token, requests = gcal.list_changes(token)
+    except gcal.SyncTokenExpired:
+        expired = 1
+        events, next_token, requests = gcal.list_changes(None)
+
+    stats = apply_events(events)
+    stats['pull_requests'] = requests + expired
+    stats['changes'] = len(events)
+    state.sync_token = next_token or ''
+    state.last_pulled_at = timezone.now()
+    state.save(update_fields=['sync_token', 'last_pulled_at'])
+    return stats
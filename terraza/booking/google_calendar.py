@@ -1,5 +1,9 @@
+import hashlib
 import json
+import threading
+
 from django.conf import settings
+from django.utils import timezone
 
 try:
     from google.oauth2 import service_account
@@ -26,7 +30,46 @@ _STATUS_COLOR = {
 }
 
 
+# Calendar batch requests accept at most 50 calls.
+BATCH_LIMIT = 50
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def is_configured():
+    """Whether a service account is set up, i.e. whether syncing can do anything."""
+    if _service is not None:
+        return True
+    return GOOGLE_AVAILABLE and bool(
+        getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_JSON', None)
+        or getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_KEY_FILE', None)
+    )
+
+
+def set_service(service):
+    """Use ``service`` (e.g. a FakeCalendarService) instead of the real API; None resets."""
+    global _service
+    with _service_lock:
+        _service = service
+
+
 def _get_service():
+    """Return the Calendar service, built once per process.
+
+    The service is only used from the job worker (see booking/jobs.py), which
+    runs jobs one at a time, so sharing its HTTP client is safe.
+    """
+    global _service
+    if _service is not None:
+        return _service
+    with _service_lock:
+        if _service is None:
+            _service = _build_service()
+        return _service
+
+
+def _build_service():
     if not GOOGLE_AVAILABLE:
         return None
 
@@ -46,7 +89,7 @@ def _get_service():
             credentials = service_account.Credentials.from_service_account_file(
                 key_file, scopes=SCOPES
             )
-        return build('calendar', 'v3', credentials=credentials)
+        return build('calendar', 'v3', credentials=credentials, cache_discovery=False)
     except Exception as e:
         print(f"[Google Calendar] Failed to build service: {e}")
         return None
@@ -85,12 +128,13 @@ def _build_event_body(booking):
         'summary': f"{display_name} — {booking.venue.name}",
         'description': '\n'.join(description_lines),
         'location': booking.venue.address or booking.venue.name,
+        # Local time, so the body (and its hash) doesn't depend on where the datetime came from.
         'start': {
-            'dateTime': booking.start_datetime.isoformat(),
+            'dateTime': timezone.localtime(booking.start_datetime).isoformat(),
             'timeZone': settings.TIME_ZONE,
         },
         'end': {
-            'dateTime': booking.end_datetime.isoformat(),
+            'dateTime': timezone.localtime(booking.end_datetime).isoformat(),
             'timeZone': settings.TIME_ZONE,
         },
         'colorId': _STATUS_COLOR.get(booking.status, '1'),
@@ -99,6 +143,64 @@ def _build_event_body(booking):
     return body
 
 
+def event_hash(booking):
+    """Fingerprint of the event body pushed for the booking (stored in Booking.gcal_event_hash)."""
+    body = json.dumps(_build_event_body(booking), sort_keys=True, default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def _event_resource(booking, body_hash=None):
+    """Event body plus the private properties that tie the event back to the booking."""
+    resource = _build_event_body(booking)
+    resource['extendedProperties'] = {'private': {
+        'booking_id': str(booking.pk),
+        'body_hash': body_hash or event_hash(booking),
+    }}
+    return resource
+
+
+def error_status(exc):
+    """HTTP status of an API error (googleapiclient's HttpError or the fake's), or None."""
+    status = getattr(exc, 'status_code', None) or getattr(getattr(exc, 'resp', None), 'status', None)
+    return int(status or getattr(exc, 'status', 0) or 0) or None
+
+
+class SyncTokenExpired(Exception):
+    """The stored sync token was rejected (410 Gone); a full listing is needed."""
+
+
+def list_changes(sync_token=None):
+    """List the events changed since ``sync_token``, or every event when it is None.
+
+    Returns ``(events, next_sync_token, requests)``; cancelled events are
+    included so deletions can be applied. Raises SyncTokenExpired when Google
+    no longer accepts the token.
+    """
+    service = _get_service()
+    if not service:
+        return [], sync_token, 0
+
+    calendar_id = getattr(settings, 'GOOGLE_CALENDAR_ID', 'primary')
+    events, page_token, requests = [], None, 0
+    while True:
+        params = {'calendarId': calendar_id, 'showDeleted': True, 'singleEvents': True, 'maxResults': 250}
+        if sync_token:
+            params['syncToken'] = sync_token
+        if page_token:
+            params['pageToken'] = page_token
+        try:
+            response = service.events().list(**params).execute()
+        except Exception as e:
+            if error_status(e) == 410:
+                raise SyncTokenExpired() from e
+            raise
+        requests += 1
+        events.extend(response.get('items', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return events, response.get('nextSyncToken'), requests
+
+
 def create_event(booking):
     """Create a Google Calendar event for a booking. Returns the event ID or None."""
     service = _get_service()
@@ -109,7 +211,7 @@ def create_event(booking):
     try:
         event = service.events().insert(
             calendarId=calendar_id,
-            body=_build_event_body(booking),
+            body=_event_resource(booking),
         ).execute()
         return event.get('id')
     except HttpError as e:
@@ -131,7 +233,7 @@ def update_event(booking, event_id):
         service.events().update(
             calendarId=calendar_id,
             eventId=event_id,
-            body=_build_event_body(booking),
+            body=_event_resource(booking),
         ).execute()
         return True
     except HttpError as e:
@@ -158,3 +260,60 @@ def delete_event(event_id):
     except Exception as e:
         print(f"[Google Calendar] Error deleting event {event_id}: {e}")
         return False
+
+
+def sync_events(bookings, hashes=None):
+    """Create or patch the events of several bookings with batched API calls.
+
+    Bookings with a ``google_calendar_event_id`` are patched, the rest are
+    inserted. ``hashes`` maps booking pks to precomputed event_hash values.
+    Returns ``({booking.pk: (event_id, error)}, requests)``; ``error`` is None
+    on success. Up to BATCH_LIMIT calls travel in one HTTP request.
+    """
+    service = _get_service()
+    if not service:
+        return {}, 0
+    hashes = hashes or {}
+
+    calendar_id = getattr(settings, 'GOOGLE_CALENDAR_ID', 'primary')
+    results = {}
+    requests_sent = 0
+    bookings = list(bookings)
+    for offset in range(0, len(bookings), BATCH_LIMIT):
+        chunk = {str(booking.pk): booking for booking in bookings[offset:offset + BATCH_LIMIT]}
+
+        def _callback(request_id, response, exception):
+            booking = chunk[request_id]
+            if exception is not None:
+                results[booking.pk] = (booking.google_calendar_event_id, str(exception))
+            else:
+                results[booking.pk] = (response.get('id'), None)
+
+        requests = []
+        for request_id, booking in chunk.items():
+            events = service.events()
+            if booking.google_calendar_event_id:
+                request = events.patch(
+                    calendarId=calendar_id,
+                    eventId=booking.google_calendar_event_id,
+                    body=_event_resource(booking, hashes.get(booking.pk)),
+                )
+            else:
+                request = events.insert(calendarId=calendar_id, body=_event_resource(booking, hashes.get(booking.pk)))
+            requests.append((request_id, request))
+
+        requests_sent += 1
+        try:
+            if len(requests) == 1:
+                request_id, request = requests[0]
+                _callback(request_id, request.execute(), None)
+            else:
+                batch = service.new_batch_http_request(callback=_callback)
+                for request_id, request in requests:
+                    batch.add(request, request_id=request_id)
+                batch.execute()
+        except Exception as e:
+            print(f"[Google Calendar] Batch sync failed: {e}")
+            for request_id, booking in chunk.items():
+                results.setdefault(booking.pk, (booking.google_calendar_event_id, str(e)))
+    return results, requests_sent
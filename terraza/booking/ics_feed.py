@@ -0,0 +1,167 @@
+"""
+Subscribable iCalendar feed of a venue's active bookings.
+
+Staff add ``/api/bookings/venues/<id>/calendar.ics?token=...`` to their
+phone's calendar once; the phone polls it instead of every booking change
+being pushed through the Google Calendar API.
+
+Polls are cheap in three layers:
+
+* ``feed_state`` is one query for the values the VEVENTs are built from;
+  the ETag hashes them, so a client whose copy is current gets a 304
+  without anything being rendered. ``updated_at`` alone wouldn't do: the
+  feed also shows the customer and package, and ``total_price`` is written
+  with ``update()``. There is no Last-Modified for the same reason.
+* The rendered feed is cached under that ETag.
+* When it does have to be rendered, each VEVENT block is cached under a hash
+  of the row values it is built from, so only the bookings that changed are
+  rendered again.
+"""
+
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+
+from .availability import ACTIVE_STATUSES
+from .occupancy import booking_label
+
+FEED_CACHE_TIMEOUT = 60 * 10
+VEVENT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+_TOKEN_SALT = 'booking.ics-feed'
+
+_EVENT_FIELDS = (
+    'id', 'status', 'start_datetime', 'end_datetime', 'description',
+    'total_price', 'advance_paid', 'updated_at',
+    'user__first_name', 'user__last_name', 'user__email', 'user__phone',
+    'package__title',
+)
+
+
+def feed_token(venue_id):
+    """Secret for the feed URL of a venue (calendar apps can't send auth headers)."""
+    return signing.Signer(salt=_TOKEN_SALT).signature(str(venue_id))
+
+
+def check_token(venue_id, token):
+    return bool(token) and constant_time_compare(token, feed_token(venue_id))
+
+
+def feed_state(venue_id):
+    """(etag, rows) of the venue's feed: the rows it renders and a hash of their VEVENT keys."""
+    from .models import Booking
+
+    rows = list(
+        Booking.objects.filter(venue_id=venue_id, status__in=ACTIVE_STATUSES)
+        .order_by('start_datetime')
+        .values(*_EVENT_FIELDS)
+    )
+    raw = '|'.join([str(venue_id)] + [_vevent_key(row) for row in rows])
+    return hashlib.md5(raw.encode()).hexdigest(), rows
+
+
+def _escape(value):
+    """RFC 5545 TEXT escaping."""
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;')
+        .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """RFC 5545: lines longer than 75 octets continue on lines starting with a space."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, current, size = [], '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current, size = '', 0
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n '.join(parts)
+
+
+def _utc(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_vevent(row, status_labels):
+    first_name = row['user__first_name'] or ''
+    last_name = row['user__last_name'] or ''
+    client = f"{first_name} {last_name}".strip() or row['user__email']
+    details = [f"Cliente: {client}", f"Email: {row['user__email']}"]
+    if row['user__phone']:
+        details.append(f"Teléfono: {row['user__phone']}")
+    details += [
+        f"Paquete: {row['package__title']}",
+        f"Estado: {status_labels.get(row['status'], row['status'])}",
+        f"Total: ${row['total_price']}",
+        f"Adelanto: ${row['advance_paid']}",
+    ]
+    if row['description']:
+        details.append(f"Notas: {row['description']}")
+
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{row['id']}@terraza-pineda",
+        f"DTSTAMP:{_utc(row['updated_at'])}",
+        f"LAST-MODIFIED:{_utc(row['updated_at'])}",
+        f"DTSTART:{_utc(row['start_datetime'])}",
+        f"DTEND:{_utc(row['end_datetime'])}",
+        f"SUMMARY:{_escape(booking_label(row['description'], first_name, last_name))}",
+        f"DESCRIPTION:{_escape(chr(10).join(details))}",
+        f"STATUS:{'TENTATIVE' if row['status'] == 'solicitud' else 'CONFIRMED'}",
+        'END:VEVENT',
+    ]
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+
+def _vevent_key(row):
+    raw = '|'.join(str(row[field]) for field in _EVENT_FIELDS)
+    return 'ics-vevent:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def render_feed(venue, rows):
+    """The VCALENDAR document of the venue's active bookings (``rows`` from feed_state)."""
+    from .models import Booking
+
+    keys = [_vevent_key(row) for row in rows]
+    blocks = cache.get_many(keys)
+    missing = {}
+    status_labels = dict(Booking.STATUS_CHOICES)
+    for key, row in zip(keys, rows):
+        if key not in blocks:
+            missing[key] = blocks[key] = render_vevent(row, status_labels)
+    if missing:
+        cache.set_many(missing, VEVENT_CACHE_TIMEOUT)
+
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Terraza Pineda//Reservas//ES',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        _fold(f"X-WR-CALNAME:{_escape(venue.name or 'Reservas')}"),
+        f"X-WR-TIMEZONE:{settings.TIME_ZONE}",
+    ]
+    return (
+        '\r\n'.join(header) + '\r\n'
+        + ''.join(blocks[key] for key in keys)
+        + 'END:VCALENDAR\r\n'
+    )
+
+
+def cached_feed(venue, etag, rows):
+    key = f'ics-feed:{venue.pk}:{etag}'
+    body = cache.get(key)
+    if body is None:
+        body = render_feed(venue, rows)
+        cache.set(key, body, FEED_CACHE_TIMEOUT)
+    return body
@@ -0,0 +1,142 @@
+"""
+Background jobs for booking side effects (see jobs/queue.py).
+
+booking/signals.py enqueues these once the booking's transaction commits, so
+creating or updating a booking no longer waits on SMTP, the Google Calendar
+API or image rendering. Handlers reload the booking by id and do nothing if
+it was deleted in the meantime; exceptions make the job retry.
+"""
+
+import datetime
+
+from django.conf import settings
+
+from jobs import queue
+from . import staff_alerts, waitlist
+from .availability import local_day_span
+from .models import Booking
+
+try:
+    from users.email_service import TerrazaEmailService
+except ImportError:
+    TerrazaEmailService = None
+
+try:
+    from . import google_calendar as gcal
+except ImportError:
+    gcal = None
+
+
+def _booking(booking_id):
+    return Booking.objects.select_related('user', 'venue', 'package').filter(pk=booking_id).first()
+
+
+@queue.register('booking.send_confirmation_email')
+def send_confirmation_email(booking_id):
+    booking = _booking(booking_id)
+    if booking is None or TerrazaEmailService is None:
+        return
+    TerrazaEmailService.send_booking_confirmation(user=booking.user, booking=booking)
+
+
+@queue.register('booking.send_status_email')
+def send_status_email(booking_id, old_status):
+    booking = _booking(booking_id)
+    if booking is None or TerrazaEmailService is None:
+        return
+    TerrazaEmailService.send_booking_status_update(user=booking.user, booking=booking, old_status=old_status)
+
+
+@queue.register('booking.sync_google_calendar', batch=True)
+def sync_google_calendar(payloads):
+    """Push the Google Calendar events of every booking due for a sync.
+
+    Saves of a booking are debounced into one pending job (see signals.py);
+    the worker hands all due jobs to this handler at once, so several dirty
+    bookings share one batched API request, and bookings whose event body
+    didn't change are skipped (see gcal_sync.push).
+    """
+    if gcal is None or not gcal.is_configured():
+        return [None] * len(payloads)
+    from . import gcal_sync
+
+    bookings = {
+        str(booking.pk): booking
+        for booking in Booking.objects.select_related('user', 'venue', 'package')
+        .prefetch_related('extra_services')
+        .filter(pk__in={payload['booking_id'] for payload in payloads})
+    }
+    errors, _ = gcal_sync.push(bookings.values())
+    return [
+        errors.get(bookings[payload['booking_id']].pk) if payload['booking_id'] in bookings else None
+        for payload in payloads
+    ]
+
+
+@queue.register('booking.pull_google_calendar')
+def pull_google_calendar(reschedule=True):
+    """Apply the changes made in Google Calendar, then schedule the next pull."""
+    if reschedule:
+        schedule_calendar_pull()
+    if gcal is None or not gcal.is_configured():
+        return
+    from . import gcal_sync
+    gcal_sync.pull()
+
+
+def schedule_calendar_pull(delay=None):
+    """Enqueue the recurring pull job (a no-op while one is already pending)."""
+    queue.enqueue(
+        'booking.pull_google_calendar',
+        {'reschedule': True},
+        dedupe_key='gcal-pull',
+        delay=delay or datetime.timedelta(seconds=settings.GOOGLE_CALENDAR_PULL_INTERVAL),
+    )
+
+
+@queue.register('booking.notify_staff_new_booking', batch=True)
+def notify_staff_new_booking(payloads):
+    """Alert the staff of every new booking in the batch at once (see staff_alerts.py)."""
+    bookings = Booking.objects.select_related('user', 'venue').filter(
+        pk__in={payload['booking_id'] for payload in payloads},
+    ).order_by('start_datetime')
+    staff_alerts.new_bookings(bookings)
+    return [None] * len(payloads)
+
+
+@queue.register('booking.notify_waitlist')
+def notify_waitlist(booking_id):
+    """Notify waitlisted users when the cancelled booking's days open up."""
+    booking = Booking.objects.filter(pk=booking_id).values('venue_id', 'start_datetime', 'end_datetime').first()
+    if booking is None:
+        return
+    first, last = local_day_span(booking['start_datetime'], booking['end_datetime'])
+    waitlist.notify_freed(booking['venue_id'], first, last)
+
+
+@queue.register('booking.sweep_waitlist')
+def sweep_waitlist(reschedule=True):
+    """Match pending wishes against the free days, then schedule the next sweep."""
+    if reschedule:
+        schedule_waitlist_sweep()
+    waitlist.sweep()
+
+
+def schedule_waitlist_sweep(delay=None):
+    """Enqueue the recurring waitlist sweep (a no-op while one is already pending)."""
+    queue.enqueue(
+        'booking.sweep_waitlist',
+        {'reschedule': True},
+        dedupe_key='waitlist-sweep',
+        delay=delay or datetime.timedelta(seconds=settings.WAITLIST_SWEEP_INTERVAL),
+    )
+
+
+@queue.register('booking.render_share_card')
+def render_share_card(booking_id):
+    """Pre-render the confirmation share card so the endpoint only serves a file."""
+    booking = _booking(booking_id)
+    if booking is None or booking.status not in Booking.SHAREABLE_STATUSES:
+        return
+    from .share_cards import generate_confirmation_card
+    generate_confirmation_card(booking)
@@ -0,0 +1,99 @@
+"""
+Count the queries issued by the booking write paths.
+
+Everything runs inside a transaction that is rolled back at the end, with
+outgoing email captured in memory, so it is safe to run against any database.
+
+Usage:
+    python manage.py benchmark_booking_writes
+    python manage.py benchmark_booking_writes --iterations 20
+"""
+
+import datetime
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from booking.models import Booking, ExtraService, Package, Venue, VenueConfiguration
+from booking.serializers import BookingCreateSerializer, BookingUpdateSerializer
+
+
+class Command(BaseCommand):
+    help = "Report queries per booking create/update (all work is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations", type=int, default=10,
+            help="Bookings to create and update per scenario",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        # Warm the configuration cache the way a running server would; it is
+        # only populated outside transactions.
+        VenueConfiguration.get_config()
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            with transaction.atomic():
+                results = self._run(iterations)
+                transaction.set_rollback(True)
+
+        for scenario, counts in results.items():
+            self.stdout.write(
+                f"{scenario:<28} avg {sum(counts) / len(counts):6.1f}  min {min(counts):3d}  max {max(counts):3d}"
+            )
+
+    def _run(self, iterations):
+        User = get_user_model()
+        user = User.objects.create_user(
+            email='benchmark@terrazapineda.local', first_name='Bench', last_name='Mark',
+        )
+        venue = Venue.objects.order_by('pk').first() or Venue.objects.create(name='Benchmark', slug='benchmark')
+        package = Package.objects.create(title='Benchmark', price=5000, description='benchmark')
+        extras = [ExtraService.objects.create(name=f'Extra {i}', price=100 * (i + 1)) for i in range(2)]
+        request = SimpleNamespace(user=user)
+        base = timezone.now() + datetime.timedelta(days=3650)
+
+        results = {'create (serializer)': [], 'update status': [], 'update description': [], 'move dates (serializer)': []}
+        for i in range(iterations):
+            start = base + datetime.timedelta(days=3 * i)
+            serializer = BookingCreateSerializer(
+                data={
+                    'package_id': package.pk,
+                    'extra_service_ids': [str(extra.pk) for extra in extras],
+                    'start_datetime': start.isoformat(),
+                    'end_datetime': (start + datetime.timedelta(hours=12)).isoformat(),
+                },
+                context={'request': request, 'venue_id': venue.pk},
+            )
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as ctx:
+                booking = serializer.save()
+            results['create (serializer)'].append(len(ctx.captured_queries))
+
+            booking = Booking.objects.get(pk=booking.pk)
+            booking.status = 'aceptacion'
+            with CaptureQueriesContext(connection) as ctx:
+                booking.save()
+            results['update status'].append(len(ctx.captured_queries))
+
+            booking.description = f'benchmark {i}'
+            with CaptureQueriesContext(connection) as ctx:
+                booking.save()
+            results['update description'].append(len(ctx.captured_queries))
+
+            serializer = BookingUpdateSerializer(
+                Booking.objects.get(pk=booking.pk),
+                data={'start_datetime': (start + datetime.timedelta(days=1)).isoformat(),
+                      'end_datetime': (start + datetime.timedelta(days=1, hours=12)).isoformat()},
+                partial=True,
+                context={'request': SimpleNamespace(user=SimpleNamespace(is_staff=True))},
+            )
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as ctx:
+                serializer.save()
+            results['move dates (serializer)'].append(len(ctx.captured_queries))
+        return results
@@ -53,7 +53,7 @@ class Command(BaseCommand):
         if end <= start:
             end += datetime.timedelta(days=1)
 
-        if not Booking.is_date_available(venue, start, end):
+        if not Booking.is_date_available(venue, start, end, use_index=False):
             raise CommandError(
                 f"{day} is already occupied by a non-cancelled booking for this venue."
             )
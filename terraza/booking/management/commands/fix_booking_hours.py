@@ -2,6 +2,7 @@ import datetime
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from booking.models import Booking, VenueConfiguration
+from booking import availability, occupancy
 
 
 class Command(BaseCommand):
@@ -67,6 +68,11 @@ class Command(BaseCommand):
                 )
             updated += 1
 
+        if updated and not dry_run:
+            # QuerySet.update() skips the booking signals that keep these in sync.
+            occupancy.rebuild()
+            availability.invalidate()
+
         self.stdout.write(
             self.style.SUCCESS(
                 f"\nDone. Updated: {updated}  Already correct / skipped: {skipped}"
@@ -5,6 +5,12 @@ Usage:
     python manage.py import_gcal path/to/calendar.ics
     python manage.py import_gcal calendar.ics --dry-run        # preview only
     python manage.py import_gcal calendar.ics --status apartado
+    python manage.py import_gcal calendar.ics --chunk-size 1000 -v 2   # list every event
+
+Re-importing is safe: bookings remember the UID of their event (gcal_uid),
+so events seen before update their booking instead of creating another one.
+The file is streamed and written with bulk inserts per chunk, which skips
+the booking signals; occupancy and status counters are rebuilt at the end.
 
 How to export from Google Calendar:
     Settings (gear icon) → Settings → Import & Export → Export
@@ -13,22 +19,39 @@ How to export from Google Calendar:
 
 import datetime
 import re
+import time
+import uuid
+from collections import Counter
 from zoneinfo import ZoneInfo
 
 from django.contrib.auth import get_user_model
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone as tz
+from django.utils.text import slugify
 
-from booking.models import Booking, Package, Venue
+from booking import availability, occupancy, status_counts
+from booking.availability import VenueIntervalIndex
+from booking.models import Booking, BookingLineItem, Package, Venue, VenueConfiguration
 
 MEXICO_TZ = ZoneInfo("America/Mexico_City")
 
 
 # ── ICS parser ────────────────────────────────────────────────────────────────
 
-def _unfold(text):
-    """RFC 5545: a CRLF followed by whitespace is a line continuation."""
-    return re.sub(r"\r?\n[ \t]", "", text)
+def _unfolded_lines(lines):
+    """RFC 5545: a line starting with whitespace continues the previous one."""
+    current = None
+    for raw in lines:
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t") and current is not None:
+            current += raw[1:]
+            continue
+        if current is not None:
+            yield current
+        current = raw
+    if current is not None:
+        yield current
 
 
 def _unescape_ics(value):
@@ -67,90 +90,119 @@ def _parse_dt(prop_name, value):
     return tz.make_aware(dt, zone)
 
 
-def parse_ics(path, open_time, close_time):
-    """Parse .ics file; return list of {summary, start, end, raw_start_is_date}."""
+def _local_span(ev, open_time, close_time):
+    """Start/end of the placeholder booking: the event's local dates at venue hours."""
+    start_raw = ev["_start_raw"]
+    end_raw   = ev.get("_end_raw")
+
+    # Always use Mexico local date — UTC datetimes crossing midnight give wrong date otherwise
+    if isinstance(start_raw, datetime.datetime):
+        start_date = start_raw.astimezone(MEXICO_TZ).date()
+    else:
+        start_date = start_raw
+
+    # For all-day events DTEND is the exclusive next day — step back one day
+    if end_raw:
+        if isinstance(end_raw, datetime.datetime):
+            end_date = end_raw.astimezone(MEXICO_TZ).date()
+        else:
+            end_date = end_raw - datetime.timedelta(days=1)
+    else:
+        end_date = start_date
+
+    start = tz.make_aware(
+        datetime.datetime.combine(start_date, open_time), MEXICO_TZ
+    )
+    end = tz.make_aware(
+        datetime.datetime.combine(end_date, close_time), MEXICO_TZ
+    )
+
+    # close_time midnight (00:00) means it rolls to next day
+    if end <= start:
+        end += datetime.timedelta(days=1)
+    return start, end
+
+
+def iter_ics(path, open_time, close_time):
+    """
+    Stream the events of an .ics file as {uid, summary, description, start, end}.
+
+    The file is read line by line and each event is yielded as soon as its
+    END:VEVENT is seen, so memory stays flat however long the export is.
+    ``uid`` is the event UID, suffixed with its RECURRENCE-ID for modified
+    occurrences of a recurring event (they share the UID of the series).
+    """
     with open(path, "r", encoding="utf-8") as f:
-        text = f.read()
+        current = None
 
-    text = _unfold(text)
-    events = []
-    current = None
+        for line in _unfolded_lines(f):
+            if line.strip() == "BEGIN:VEVENT":
+                current = {}
+                continue
+            if line.strip() == "END:VEVENT":
+                # Always use venue open/close times — GCal times are unreliable notes
+                if current is not None and current.get("_start_raw"):
+                    start, end = _local_span(current, open_time, close_time)
+                    uid = current.get("uid")
+                    if uid and current.get("_recurrence_id"):
+                        uid = f"{uid}#{current['_recurrence_id']}"
+                    yield {
+                        "uid":         uid,
+                        "summary":     current.get("summary", "Evento importado"),
+                        "description": current.get("description", ""),
+                        "start":       start,
+                        "end":         end,
+                    }
+                current = None
+                continue
+            if current is None:
+                continue
 
-    for line in text.splitlines():
-        if line.strip() == "BEGIN:VEVENT":
-            current = {}
-            continue
-        if line.strip() == "END:VEVENT":
-            if current is not None:
-                events.append(current)
-            current = None
-            continue
-        if current is None:
-            continue
+            if ":" not in line:
+                continue
+            prop, _, value = line.partition(":")
+            prop_upper = prop.upper()
 
-        if ":" not in line:
-            continue
-        prop, _, value = line.partition(":")
-        prop_upper = prop.upper()
-
-        if prop_upper.startswith("DTSTART"):
-            parsed = _parse_dt(prop_upper, value)
-            current["_start_raw"] = parsed
-            current["_start_is_date"] = isinstance(parsed, datetime.date) and not isinstance(parsed, datetime.datetime)
-
-        elif prop_upper.startswith("DTEND"):
-            parsed = _parse_dt(prop_upper, value)
-            current["_end_raw"] = parsed
-            current["_end_is_date"] = isinstance(parsed, datetime.date) and not isinstance(parsed, datetime.datetime)
-
-        elif prop_upper == "SUMMARY":
-            current["summary"] = _unescape_ics(value.strip())
-
-        elif prop_upper == "DESCRIPTION":
-            current["description"] = _unescape_ics(value.strip())
-
-    # Always use venue open/close times — GCal times are unreliable notes
-    result = []
-    for ev in events:
-        start_raw = ev.get("_start_raw")
-        end_raw   = ev.get("_end_raw")
-        if not start_raw:
-            continue
+            if prop_upper.startswith("DTSTART"):
+                current["_start_raw"] = _parse_dt(prop_upper, value)
 
-        # Always use Mexico local date — UTC datetimes crossing midnight give wrong date otherwise
-        if isinstance(start_raw, datetime.datetime):
-            start_date = start_raw.astimezone(MEXICO_TZ).date()
-        else:
-            start_date = start_raw
+            elif prop_upper.startswith("DTEND"):
+                current["_end_raw"] = _parse_dt(prop_upper, value)
 
-        # For all-day events DTEND is the exclusive next day — step back one day
-        if end_raw:
-            if isinstance(end_raw, datetime.datetime):
-                end_date = end_raw.astimezone(MEXICO_TZ).date()
-            else:
-                end_date = end_raw - datetime.timedelta(days=1)
-        else:
-            end_date = start_date
+            elif prop_upper == "UID":
+                current["uid"] = value.strip()
 
-        start = tz.make_aware(
-            datetime.datetime.combine(start_date, open_time), MEXICO_TZ
-        )
-        end = tz.make_aware(
-            datetime.datetime.combine(end_date, close_time), MEXICO_TZ
-        )
+            elif prop_upper.startswith("RECURRENCE-ID"):
+                current["_recurrence_id"] = value.strip()
+
+            elif prop_upper == "SUMMARY":
+                current["summary"] = _unescape_ics(value.strip())
+
+            elif prop_upper == "DESCRIPTION":
+                current["description"] = _unescape_ics(value.strip())
+
+
+def parse_ics(path, open_time, close_time):
+    """Parse .ics file; return list of {uid, summary, description, start, end}."""
+    return list(iter_ics(path, open_time, close_time))
 
-        # close_time midnight (00:00) means it rolls to next day
-        if end <= start:
-            end += datetime.timedelta(days=1)
 
-        result.append({
-            "summary":     ev.get("summary", "Evento importado"),
-            "description": ev.get("description", ""),
-            "start":       start,
-            "end":         end,
-        })
+def gcal_description(summary, description):
+    description_parts = ["[GCal]", summary]
+    if (description or "").strip():
+        description_parts.append(description.strip())
+    return "\n".join(description_parts)
 
-    return result
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
 # ── Command ───────────────────────────────────────────────────────────────────
@@ -180,12 +232,17 @@ class Command(BaseCommand):
             "--close-time", default="22:00",
             help="Venue close time HH:MM (default: 22:00)",
         )
+        parser.add_argument(
+            "--chunk-size", type=int, default=500,
+            help="Events written per bulk insert/update (default: 500)",
+        )
 
     def handle(self, *args, **options):
         ics_path     = options["ics_file"]
         dry_run      = options["dry_run"]
         status       = options["status"]
         include_past = options["past"]
+        chunk_size   = max(1, options["chunk_size"])
 
         try:
             open_time  = datetime.time(*[int(x) for x in options["open_time"].split(":")])
@@ -193,15 +250,6 @@ class Command(BaseCommand):
         except Exception:
             raise CommandError("Invalid time format. Use HH:MM, e.g. --open-time 10:00")
 
-        # Suppress post_save signals (email + GCal sync) during bulk import
-        from django.db.models.signals import post_save
-        try:
-            from booking import signals as booking_signals
-            post_save.disconnect(booking_signals.booking_created_notification, sender=Booking)
-            post_save.disconnect(booking_signals.sync_booking_to_google_calendar, sender=Booking)
-        except Exception:
-            pass
-
         # ── resolve required DB objects ───────────────────────────────────────
         User = get_user_model()
         staff_user = User.objects.filter(is_staff=True).first()
@@ -216,79 +264,187 @@ class Command(BaseCommand):
         if not package:
             raise CommandError("No Package found in the database.")
 
-        # ── parse ─────────────────────────────────────────────────────────────
+        self.staff_user = staff_user
+        self.venue = venue
+        self.package = package
+        self.status = status
+        self.include_past = include_past
+        self.dry_run = dry_run
+        self.verbosity = options["verbosity"]
+        self.minimum_deposit = VenueConfiguration.get_config().minimum_deposit
+        self.now = tz.now()
+        self.stats = Counter()
+        # Slots already taken (anything not cancelled), kept up to date as chunks are written
+        self.occupied = {
+            booking_id: (start, end)
+            for booking_id, start, end in Booking.objects.filter(venue=venue)
+            .exclude(status="cancelado")
+            .values_list("id", "start_datetime", "end_datetime")
+        }
+
+        self.stdout.write(f"\nImporting {ics_path} in chunks of {chunk_size}\n")
+        self.stdout.write("─" * 60)
+
+        started = time.monotonic()
         try:
-            events = parse_ics(ics_path, open_time, close_time)
+            for chunk in _chunks(iter_ics(ics_path, open_time, close_time), chunk_size):
+                self._import_chunk(chunk)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f"  {self.stats['events']} event(s) read, "
+                    f"{self.stats['events'] / elapsed if elapsed else 0:.0f} rows/s"
+                )
         except FileNotFoundError:
             raise CommandError(f"File not found: {ics_path}")
-        except Exception as e:
+        except (ValueError, UnicodeDecodeError) as e:
             raise CommandError(f"Error parsing .ics file: {e}")
 
-        now = tz.now()
-        created = skipped_conflict = skipped_past = 0
+        # bulk_create/bulk_update skip the booking signals: bring the derived
+        # tables up to date once for the whole import.
+        if not dry_run and (self.stats["created"] or self.stats["updated"]):
+            occupancy.rebuild(venue_id=venue.pk)
+            availability.invalidate(venue.pk)
+            status_counts.reconcile()
 
-        self.stdout.write(f"\nFound {len(events)} event(s) in {ics_path}\n")
+        elapsed = time.monotonic() - started
+        stats = self.stats
         self.stdout.write("─" * 60)
+        self.stdout.write(
+            f"\nCreated: {stats['created']}   "
+            f"Updated: {stats['updated']}   "
+            f"Unchanged: {stats['unchanged']}   "
+            f"Conflicts: {stats['conflicts']}   "
+            f"Past (skipped): {stats['past']}"
+        )
+        self.stdout.write(
+            f"{stats['events']} event(s) in {elapsed:.2f}s "
+            f"({stats['events'] / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING("\n⚠  Dry run — nothing was saved."))
 
-        for ev in events:
-            summary  = ev["summary"]
-            start    = ev["start"]
-            end      = ev["end"]
-            is_past  = end < now
-            label    = f"{summary}  |  {start.strftime('%d/%m/%Y %H:%M')} → {end.strftime('%d/%m/%Y %H:%M')}"
-
-            # Skip past events unless --past flag is set
-            if not include_past and is_past:
-                self.stdout.write(self.style.WARNING(f"  PAST     {label}"))
-                skipped_past += 1
-                continue
+    def _log(self, style, tag, ev):
+        """Per-event lines only with -v 2: a multi-year export has thousands."""
+        if self.verbosity >= 2:
+            label = f"{ev['summary']}  |  {ev['start'].strftime('%d/%m/%Y %H:%M')} → {ev['end'].strftime('%d/%m/%Y %H:%M')}"
+            self.stdout.write(style(f"  {'[DRY] ' if self.dry_run and tag not in ('PAST', 'CONFLICT') else ''}{tag}   {label}"))
 
-            # Skip if any non-cancelled booking already occupies this slot
-            already_exists = Booking.objects.filter(
-                venue=venue,
-                start_datetime__lt=end,
-                end_datetime__gt=start,
-            ).exclude(status='cancelado').exists()
-            if already_exists:
-                self.stdout.write(self.style.ERROR(f"  CONFLICT {label}"))
-                skipped_conflict += 1
-                continue
+    def _import_chunk(self, events):
+        self.stats["events"] += len(events)
 
+        # Last occurrence of a UID in the file wins; events without one are always new.
+        by_uid, candidates = {}, []
+        for ev in events:
+            if not self.include_past and ev["end"] < self.now:
+                self._log(self.style.WARNING, "PAST", ev)
+                self.stats["past"] += 1
+            elif ev["uid"]:
+                by_uid[ev["uid"]] = ev
+            else:
+                candidates.append(ev)
+        candidates.extend(by_uid.values())
+
+        existing = {
+            booking.gcal_uid: booking
+            for booking in Booking.objects.filter(gcal_uid__in=list(by_uid))
+            .only("id", "gcal_uid", "start_datetime", "end_datetime", "description")
+        }
+
+        to_create, to_update = [], []
+        for ev in candidates:
+            booking = existing.get(ev["uid"])
+            description = gcal_description(ev["summary"], ev["description"])
+            if booking is None:
+                to_create.append((ev, description))
+            elif (booking.start_datetime, booking.end_datetime, booking.description) == (ev["start"], ev["end"], description):
+                self.stats["unchanged"] += 1
+            else:
+                to_update.append((ev, description, booking))
+
+        # One conflict check for the chunk: an index over the slots taken
+        # outside it, then the chunk's own events in start order.
+        moving = {booking.pk for _, _, booking in to_update}
+        index = VenueIntervalIndex(
+            (booking_id, start, end)
+            for booking_id, (start, end) in self.occupied.items()
+            if booking_id not in moving
+        )
+        pending = [(ev, description, None) for ev, description in to_create] + to_update
+        pending.sort(key=lambda item: item[0]["start"])
+        accepted, reach = [], None
+        for ev, description, booking in pending:
+            if index.has_overlap(ev["start"], ev["end"]) or (reach is not None and ev["start"] < reach):
+                self._log(self.style.ERROR, "CONFLICT", ev)
+                self.stats["conflicts"] += 1
+                continue
+            reach = ev["end"] if reach is None else max(reach, ev["end"])
+            accepted.append((ev, description, booking))
+
+        new_bookings, line_items, updated = [], [], []
+        for ev, description, booking in accepted:
+            if booking is None:
+                booking = self._new_booking(ev, description)
+                new_bookings.append(booking)
+                line_items.extend(booking.build_line_items(extra_services=[]))
+                booking.total_price = booking.calculate_total()
+                self._log(self.style.SUCCESS, f"CREATE [{booking.status}]", ev)
+                self.stats["created"] += 1
+            else:
+                booking.start_datetime = ev["start"]
+                booking.end_datetime = ev["end"]
+                booking.start_date = ev["start"].date()
+                booking.description = description
+                booking.updated_at = self.now
+                updated.append(booking)
+                self._log(self.style.SUCCESS, "UPDATE", ev)
+                self.stats["updated"] += 1
+            self.occupied[booking.pk] = (ev["start"], ev["end"])
+
+        if self.dry_run:
+            return
+        self._assign_slugs(new_bookings)
+        with transaction.atomic():
+            Booking.objects.bulk_create(new_bookings)
+            BookingLineItem.objects.bulk_create(line_items)
+            Booking.objects.bulk_update(
+                updated, ["start_datetime", "end_datetime", "start_date", "description", "updated_at"],
+            )
+
+    def _new_booking(self, ev, description):
+        uid = ev["uid"]
+        event_id = None
+        # Google exports use "<event id>@google.com": link the booking so the
+        # incremental sync (booking/gcal_sync.py) recognises the event.
+        if uid and uid.endswith("@google.com") and "#" not in uid:
+            event_id = uid[:-len("@google.com")]
+        return Booking(
+            user=self.staff_user,
+            venue=self.venue,
+            package=self.package,
+            start_datetime=ev["start"],
+            start_date=ev["start"].date(),
+            end_datetime=ev["end"],
+            description=description,
             # Past events → finalizado; future events → use --status (default aceptacion)
-            resolved_status = "finalizado" if is_past else status
-
-            if not dry_run:
-                gcal_desc = ev.get("description", "").strip()
-                description_parts = ["[GCal]", summary]
-                if gcal_desc:
-                    description_parts.append(gcal_desc)
-                full_description = "\n".join(description_parts)
-
-                b = Booking.objects.create(
-                    user=staff_user,
-                    venue=venue,
-                    package=package,
-                    start_datetime=start,
-                    end_datetime=end,
-                    description=full_description,
-                    status=resolved_status,
-                    total_price=0,
-                    advance_paid=0,
-                )
-                b.create_line_items()
-                b.total_price = b.calculate_total()
-                b.save()
-
-            self.stdout.write(self.style.SUCCESS(
-                f"  {'[DRY] ' if dry_run else ''}CREATE [{resolved_status}]   {label}"
-            ))
-            created += 1
-
-        self.stdout.write("─" * 60)
-        self.stdout.write(
-            f"\nCreated: {created}   "
-            f"Conflicts: {skipped_conflict}   "
-            f"Past (skipped): {skipped_past}"
+            status="finalizado" if ev["end"] < self.now else self.status,
+            advance_paid=0,
+            minimum_deposit=self.minimum_deposit,
+            gcal_uid=uid,
+            google_calendar_event_id=event_id,
         )
-        if dry_run:
-            self.stdout.write(self.style.WARNING("\n⚠  Dry run — nothing was saved."))
+
+    def _assign_slugs(self, bookings):
+        """Slugs in Booking._generate_unique_slug's format, checked in one query."""
+        pending = bookings
+        while pending:
+            for booking in pending:
+                booking.slug = slugify(
+                    f"{booking.user_id}-{booking.start_datetime.strftime('%Y%m%d%H%M')}-{uuid.uuid4().hex[:6]}"
+                )
+            taken = set(Booking.objects.filter(slug__in=[b.slug for b in pending]).values_list("slug", flat=True))
+            seen, retry = set(), []
+            for booking in pending:
+                if booking.slug in taken or booking.slug in seen:
+                    retry.append(booking)
+                seen.add(booking.slug)
+            pending = retry
@@ -0,0 +1,27 @@
+"""
+Rebuild the materialized per-day venue occupancy table from Booking.
+
+Usage:
+    python manage.py rebuild_occupancy
+    python manage.py rebuild_occupancy --venue 3
+"""
+
+from django.core.management.base import BaseCommand
+from booking import availability, occupancy
+
+
+class Command(BaseCommand):
+    help = "Recompute VenueDayOccupancy rows from the current bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--venue", type=int, default=None,
+            help="Only rebuild the rows of this venue id",
+        )
+
+    def handle(self, *args, **options):
+        venue_id = options["venue"]
+        rows = occupancy.rebuild(venue_id=venue_id)
+        availability.invalidate(venue_id)
+        scope = f"venue {venue_id}" if venue_id is not None else "all venues"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} occupancy row(s) for {scope}."))
@@ -0,0 +1,34 @@
+"""
+Recompute the per-status booking counters from scratch.
+
+Usage:
+    python manage.py reconcile_status_counts
+"""
+
+from django.core.management.base import BaseCommand
+from booking import status_counts
+from booking.models import BookingStatusCount
+
+
+class Command(BaseCommand):
+    help = "Rebuild BookingStatusCount rows from the current bookings"
+
+    def handle(self, *args, **options):
+        before = {
+            (row.scope, row.status): row.count
+            for row in BookingStatusCount.objects.all()
+        }
+        rows = status_counts.reconcile()
+        after = {
+            (row.scope, row.status): row.count
+            for row in BookingStatusCount.objects.all()
+        }
+
+        drifted = sorted(key for key in before.keys() | after.keys() if before.get(key, 0) != after.get(key, 0))
+        for scope, status in drifted:
+            self.stdout.write(
+                f"  {scope} {status}: {before.get((scope, status), 0)} → {after.get((scope, status), 0)}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {rows} counter(s); {len(drifted)} had drifted."
+        ))
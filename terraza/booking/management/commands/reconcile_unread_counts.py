@@ -0,0 +1,17 @@
+"""
+Recompute the per-user unread notification counters from scratch.
+
+Usage:
+    python manage.py reconcile_unread_counts
+"""
+
+from django.core.management.base import BaseCommand
+from booking import unread
+
+
+class Command(BaseCommand):
+    help = "Rebuild UnreadNotificationCount rows from the current notifications"
+
+    def handle(self, *args, **options):
+        rows = unread.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled unread counters; {rows} had drifted."))
@@ -0,0 +1,31 @@
+"""
+Notify waitlisted users whose wished day is free again (see booking/waitlist.py).
+
+Usage:
+    python manage.py sweep_waitlist
+    python manage.py sweep_waitlist --schedule   # start the recurring sweep job for run_jobs
+"""
+
+from django.core.management.base import BaseCommand
+
+from booking import waitlist
+from booking.jobs import schedule_waitlist_sweep
+
+
+class Command(BaseCommand):
+    help = "Match pending waitlist wishes against free days and notify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--schedule", action="store_true",
+            help="Enqueue the recurring sweep job (WAITLIST_SWEEP_INTERVAL) and exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            schedule_waitlist_sweep()
+            self.stdout.write(self.style.SUCCESS("Barrido periódico de la lista de espera programado."))
+            return
+
+        notified = waitlist.sweep()
+        self.stdout.write(self.style.SUCCESS(f"{notified} deseo(s) notificados."))
@@ -0,0 +1,59 @@
+"""
+Two-way incremental sync with Google Calendar (see booking/gcal_sync.py).
+
+Pulls the events changed since the last run (sync token), then pushes the
+bookings whose event body changed. Both sides cost API calls proportional to
+the number of changes, not to the size of the calendar.
+
+Usage:
+    python manage.py sync_gcal
+    python manage.py sync_gcal --full          # drop the sync token and list every event
+    python manage.py sync_gcal --pull-only
+    python manage.py sync_gcal --schedule      # start the recurring pull job for run_jobs
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from booking import gcal_sync, google_calendar
+from booking.jobs import schedule_calendar_pull
+
+
+class Command(BaseCommand):
+    help = "Pull Google Calendar changes and push changed bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Ignore the stored sync token")
+        parser.add_argument("--pull-only", action="store_true", help="Don't push bookings")
+        parser.add_argument("--push-only", action="store_true", help="Don't pull events")
+        parser.add_argument(
+            "--schedule", action="store_true",
+            help="Enqueue the recurring pull job (GOOGLE_CALENDAR_PULL_INTERVAL) and exit",
+        )
+
+    def handle(self, *args, **options):
+        if options["schedule"]:
+            schedule_calendar_pull()
+            self.stdout.write(self.style.SUCCESS("Pull periódico de Google Calendar programado."))
+            return
+
+        if not google_calendar.is_configured():
+            raise CommandError(
+                "Google Calendar no está configurado (GOOGLE_SERVICE_ACCOUNT_JSON / GOOGLE_SERVICE_ACCOUNT_KEY_FILE)."
+            )
+
+        if not options["push_only"]:
+            stats = gcal_sync.pull(full=options["full"])
+            self.stdout.write(
+                f"Pull: {stats['changes']} cambio(s) en {stats['pull_requests']} request(s) — "
+                f"creadas {stats['created']}, actualizadas {stats['updated']}, "
+                f"canceladas {stats['cancelled']}, desvinculadas {stats['unlinked']}, "
+                f"ecos {stats['echoes']}, conflictos {stats['conflicts']}, ignoradas {stats['ignored']}"
+            )
+
+        if not options["pull_only"]:
+            stats = gcal_sync.push_changed()
+            line = f"Push: {stats['pushed']} evento(s) en {stats['push_requests']} request(s)"
+            if stats['push_errors']:
+                self.stdout.write(self.style.WARNING(f"{line}, {stats['push_errors']} con error"))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0025_booking_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VenueDayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bookings', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('venue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_occupancy', to='booking.venue')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['date'], name='booking_ven_date_2696c4_idx')],
+                'unique_together': {('venue', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+import datetime
+
+from django.db import migrations
+
+from booking.availability import local_day_span
+from booking.occupancy import EXCLUDED_STATUSES, booking_initials, booking_label
+
+
+def backfill(apps, schema_editor):
+    Booking = apps.get_model('booking', 'Booking')
+    VenueDayOccupancy = apps.get_model('booking', 'VenueDayOccupancy')
+
+    days = {}
+    rows = Booking.objects.exclude(status__in=EXCLUDED_STATUSES).order_by('start_datetime').values(
+        'id', 'venue_id', 'user_id', 'status', 'start_datetime', 'end_datetime',
+        'description', 'user__first_name', 'user__last_name',
+    )
+    for row in rows.iterator(chunk_size=2000):
+        first_name = row['user__first_name'] or ''
+        last_name = row['user__last_name'] or ''
+        entry = {
+            'booking_id': str(row['id']),
+            'user_id': row['user_id'],
+            'status': row['status'],
+            'initials': booking_initials(first_name, last_name),
+            'label': booking_label(row['description'], first_name, last_name),
+        }
+        first, last = local_day_span(row['start_datetime'], row['end_datetime'])
+        while first <= last:
+            days.setdefault((row['venue_id'], first), []).append(entry)
+            first += datetime.timedelta(days=1)
+
+    VenueDayOccupancy.objects.bulk_create(
+        [VenueDayOccupancy(venue_id=venue_id, date=day, bookings=entries) for (venue_id, day), entries in days.items()],
+        batch_size=500,
+    )
+
+
+def clear(apps, schema_editor):
+    apps.get_model('booking', 'VenueDayOccupancy').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0026_venuedayoccupancy'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, clear),
+    ]
@@ -0,0 +1,77 @@
+from django.db import migrations
+
+# Frozen copy of booking.availability.ACTIVE_STATUSES at the time of this migration.
+ACTIVE_STATUSES = ('solicitud', 'aceptacion', 'apartado', 'liquidado', 'liquidado_entregado', 'entregado')
+
+CONSTRAINT = 'booking_no_overlapping_active'
+
+FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    # greatest() keeps legacy rows with end < start from aborting the migration;
+    # they become empty ranges, which overlap nothing.
+    """
+    ALTER TABLE booking_booking
+    ADD COLUMN period tstzrange
+    GENERATED ALWAYS AS (
+        tstzrange(start_datetime, greatest(start_datetime, end_datetime), '[)')
+    ) STORED
+    """,
+    f"""
+    ALTER TABLE booking_booking
+    ADD CONSTRAINT {CONSTRAINT}
+    EXCLUDE USING gist (venue_id WITH =, period WITH &&)
+    WHERE (status IN ({', '.join(f"'{s}'" for s in ACTIVE_STATUSES)}))
+    """,
+]
+
+REVERSE_SQL = [
+    f"ALTER TABLE booking_booking DROP CONSTRAINT IF EXISTS {CONSTRAINT}",
+    "ALTER TABLE booking_booking DROP COLUMN IF EXISTS period",
+]
+
+CONFLICTS_SQL = f"""
+    SELECT a.id, b.id
+    FROM booking_booking a
+    JOIN booking_booking b
+      ON a.venue_id = b.venue_id
+     AND a.id < b.id
+     AND a.start_datetime < b.end_datetime
+     AND b.start_datetime < a.end_datetime
+    WHERE a.status IN ({', '.join(f"'{s}'" for s in ACTIVE_STATUSES)})
+      AND b.status IN ({', '.join(f"'{s}'" for s in ACTIVE_STATUSES)})
+    LIMIT 20
+"""
+
+
+def add_constraint(apps, schema_editor):
+    # SQLite keeps the Python overlap checks in Booking.clean() as the only guard.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CONFLICTS_SQL)
+        conflicts = cursor.fetchall()
+    if conflicts:
+        pairs = ', '.join(f"{a}/{b}" for a, b in conflicts)
+        raise RuntimeError(
+            f"Hay reservas activas traslapadas; resuélvelas antes de migrar: {pairs}"
+        )
+    for sql in FORWARD_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in REVERSE_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0027_backfill_venuedayoccupancy'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_constraint, drop_constraint),
+    ]
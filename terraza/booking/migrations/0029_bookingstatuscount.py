@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0028_booking_overlap_exclusion_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('solicitud', 'Solicitud de Reserva'), ('aceptacion', 'Aceptación de Reserva'), ('apartado', 'Apartado inicial'), ('liquidado', 'Monto liquidado'), ('liquidado_entregado', 'Monto liquidado y lugar entregado'), ('entregado', 'Entregado'), ('finalizado', 'Reserva finalizada'), ('cancelado', 'Reserva cancelada'), ('rechazado', 'Rechazado')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'status')},
+            },
+        ),
+    ]
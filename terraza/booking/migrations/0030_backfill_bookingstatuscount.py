@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill(apps, schema_editor):
+    Booking = apps.get_model('booking', 'Booking')
+    BookingStatusCount = apps.get_model('booking', 'BookingStatusCount')
+
+    rows = [
+        BookingStatusCount(scope='global', status=status, count=total)
+        for status, total in Booking.objects.order_by().values_list('status').annotate(total=Count('pk'))
+    ]
+    rows += [
+        BookingStatusCount(scope=f'user:{user_id}', status=status, count=total)
+        for user_id, status, total in Booking.objects.order_by().values_list('user_id', 'status').annotate(total=Count('pk'))
+    ]
+    BookingStatusCount.objects.bulk_create(rows, batch_size=500)
+
+
+def clear(apps, schema_editor):
+    apps.get_model('booking', 'BookingStatusCount').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0029_bookingstatuscount'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, clear),
+    ]
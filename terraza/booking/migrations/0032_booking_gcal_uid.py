@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0031_gcal_sync_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='gcal_uid',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:44
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    BookingWish = apps.get_model('booking', 'BookingWish')
+
+    wishes = list(BookingWish.objects.filter(wished_date__isnull=True))
+    for wish in wishes:
+        wish.wished_date = timezone.localtime(wish.wished_start_datetime).date()
+    BookingWish.objects.bulk_update(wishes, ['wished_date'], batch_size=500)
+
+
+def noop_reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0032_booking_gcal_uid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingwish',
+            name='wished_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill, noop_reverse),
+        migrations.AddIndex(
+            model_name='bookingwish',
+            index=models.Index(fields=['venue', 'wished_date', 'notified'], name='booking_boo_venue_i_66d388_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill(apps, schema_editor):
+    Notification = apps.get_model('booking', 'Notification')
+    UnreadNotificationCount = apps.get_model('booking', 'UnreadNotificationCount')
+
+    totals = Notification.objects.filter(read=False).order_by().values_list('user_id').annotate(total=Count('id'))
+    UnreadNotificationCount.objects.bulk_create(
+        [UnreadNotificationCount(user_id=user_id, count=total, version=1) for user_id, total in totals],
+        batch_size=500,
+    )
+
+
+def noop_reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0033_bookingwish_wished_date'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadNotificationCount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_notifications', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.IntegerField(default=0)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill, noop_reverse),
+    ]
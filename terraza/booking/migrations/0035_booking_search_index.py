@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from terraza.search import CreateSearchIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0034_unread_notification_count'),
+    ]
+
+    operations = [
+        CreateSearchIndex(table='booking_booking', columns=('description',)),
+    ]
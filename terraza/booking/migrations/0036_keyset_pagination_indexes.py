@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0035_booking_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['start_datetime', 'id'], name='booking_boo_start_d_4f030b_idx'),
+        ),
+    ]
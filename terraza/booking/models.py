@@ -1,13 +1,16 @@
 from django.conf import settings
-from django.db import models
+from django.core.cache import cache
+from django.db import connection, models, transaction
 import datetime
 from django.dispatch import receiver
 from django.db.models.signals import post_save
 from shortuuid.django_fields import ShortUUIDField
 import uuid
+from django.utils import timezone
 from django.utils.text import slugify
 from users.models import UserAccount, Profile
 from decimal import Decimal
+from terraza.tracking import TrackedFieldsMixin
 
 
 ICON_TYPE= (
@@ -18,6 +21,8 @@ ICON_TYPE= (
     ("Flat Icons", "Flat Icons")
 )
 
+CONFIG_CACHE_KEY = 'venue-configuration'
+
 
 class VenueConfiguration(models.Model):
     open_time = models.TimeField(default=datetime.time(10, 0))
@@ -63,6 +68,12 @@ class VenueConfiguration(models.Model):
 
     @classmethod
     def get_config(cls):
+        # Read on every booking write; cached until the row is saved or deleted
+        # (see invalidate_cache, wired in booking/signals.py) in this process, and
+        # for at most VENUE_CONFIG_CACHE_TTL seconds in the others.
+        obj = cache.get(CONFIG_CACHE_KEY)
+        if obj is not None:
+            return obj
         obj, _ = cls.objects.get_or_create(pk=1, defaults={
             'open_time': datetime.time(10, 0),
             'close_time': datetime.time(22, 0),
@@ -71,8 +82,17 @@ class VenueConfiguration(models.Model):
             'cancellation_refund_threshold_days': 45,
             'cancellation_refund_percent': Decimal('50'),
         })
+        # Uncommitted values must not leak to other requests.
+        if not connection.in_atomic_block:
+            cache.set(CONFIG_CACHE_KEY, obj, settings.VENUE_CONFIG_CACHE_TTL)
         return obj
 
+    @classmethod
+    def invalidate_cache(cls):
+        """Forget the cached configuration now and again once the transaction commits."""
+        cache.delete(CONFIG_CACHE_KEY)
+        transaction.on_commit(lambda: cache.delete(CONFIG_CACHE_KEY))
+
     def __str__(self):
         return f"Horario: {self.open_time.strftime('%H:%M')} - {self.close_time.strftime('%H:%M')}"
 
@@ -161,7 +181,7 @@ class Coupon(models.Model):
         return f'{self.code} (-{self.discount_percent}%)'
 
 
-class Booking(models.Model):
+class Booking(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = (
         ("solicitud", "Solicitud de Reserva"),
         ("aceptacion", "Aceptación de Reserva"),
@@ -173,6 +193,13 @@ class Booking(models.Model):
         ("cancelado", "Reserva cancelada"),
         ("rechazado", "Rechazado"),
     )
+    # Statuses whose customers can download a confirmation share card
+    SHAREABLE_STATUSES = frozenset({
+        'aceptacion', 'apartado', 'liquidado',
+        'liquidado_entregado', 'entregado', 'finalizado',
+    })
+    # Loaded values kept for has_changed()/previous() (see terraza/tracking.py)
+    tracked_fields = ('status', 'user', 'venue', 'start_datetime', 'end_datetime')
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="bookings", on_delete=models.CASCADE)
@@ -193,8 +220,13 @@ class Booking(models.Model):
     hora_entrega = models.TimeField(null=True, blank=True)
     visible_to_users = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="visible_bookings", blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     slug = models.SlugField(unique=True, blank=True, null=True)
     google_calendar_event_id = models.CharField(max_length=255, blank=True, null=True, editable=False)
+    # google_calendar.event_hash() of the body last pushed to (or pulled from) Google Calendar
+    gcal_event_hash = models.CharField(max_length=64, blank=True, null=True, editable=False)
+    # UID (plus RECURRENCE-ID) of the .ics event an import_gcal booking came from
+    gcal_uid = models.CharField(max_length=255, unique=True, blank=True, null=True, editable=False)
     date_changes_count = models.IntegerField(default=0)
     cancellation_reason = models.TextField(blank=True, null=True)
     minimum_deposit = models.DecimalField(
@@ -205,17 +237,24 @@ class Booking(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=["start_datetime", "end_datetime"]),
+            # Keyset pagination of the booking list (terraza/pagination.py).
+            models.Index(fields=["start_datetime", "id"]),
         ]
         ordering = ['start_datetime']
         # Note: Removed the unique constraint as it was too restrictive
         # Now we handle date conflicts in the save method and validation
   # Calculate total price — uses locked line items when available, falls back to live prices
     def calculate_total(self):
-        if self.pk:
-            line_items = self.line_items.all()
-            if line_items.exists():
-                total = sum(item.unit_price * item.quantity for item in line_items)
-                return total.quantize(Decimal('0.01'))
+        # Items priced on this instance (build_line_items) need no query.
+        line_items = self.__dict__.get('_built_line_items')
+        if line_items is None and not self._state.adding:
+            # Never from a prefetch (EagerLoadingMixin): the charge/coupon/discount
+            # actions change line items after the booking was loaded.
+            getattr(self, '_prefetched_objects_cache', {}).pop('line_items', None)
+            line_items = list(self.line_items.all())
+        if line_items:
+            total = sum(item.unit_price * item.quantity for item in line_items)
+            return total.quantize(Decimal('0.01'))
 
         # Fallback: live prices (first save, or legacy bookings without line items)
         total = Decimal('0.00')
@@ -223,7 +262,7 @@ class Booking(models.Model):
         if package is not None:
             total = Decimal(str(package.price))
         try:
-            if hasattr(self, 'extra_services') and self.pk:
+            if hasattr(self, 'extra_services') and not self._state.adding:
                 for extra in self.extra_services.all():
                     total += extra.price
         except Exception:
@@ -233,9 +272,13 @@ class Booking(models.Model):
             total -= coupon.get_discount_amount(total)
         return total.quantize(Decimal('0.01'))
 
-    def create_line_items(self):
-        """Snapshot current package, extra services, and coupon into immutable line items."""
-        self.line_items.all().delete()
+    def build_line_items(self, extra_services=None):
+        """Price the current package, extra services, and coupon as unsaved line items.
+
+        The items are remembered on the instance until the next ``save()``, so
+        ``calculate_total`` and that save use them without reading the line items
+        back. Pass ``extra_services`` when the booking has not been saved yet.
+        """
         items = []
         if self.package:
             items.append(BookingLineItem(
@@ -244,7 +287,9 @@ class Booking(models.Model):
                 description=str(self.package),
                 unit_price=Decimal(str(self.package.price)),
             ))
-        for extra in self.extra_services.all():
+        if extra_services is None:
+            extra_services = self.extra_services.all()
+        for extra in extra_services:
             items.append(BookingLineItem(
                 booking=self,
                 item_type='extra_service',
@@ -261,7 +306,26 @@ class Booking(models.Model):
                 description=f'Cupón {coupon.label()}',
                 unit_price=-discount_amount,
             ))
-        BookingLineItem.objects.bulk_create(items)
+        self._built_line_items = items
+        return items
+
+    def create_line_items(self, extra_services=None):
+        """Snapshot current package, extra services, and coupon into immutable line items."""
+        if not self._state.adding:
+            self.line_items.all().delete()
+        BookingLineItem.objects.bulk_create(self.build_line_items(extra_services))
+
+    def needs_overlap_check(self):
+        """Whether saving could create an overlap: new, moved, or reactivated bookings."""
+        from . import availability
+
+        if self.status not in availability.ACTIVE_STATUSES:
+            return False
+        if self._state.adding:
+            return True
+        if any(self.has_changed(name) for name in ('venue', 'start_datetime', 'end_datetime')):
+            return True
+        return self.previous('status') not in availability.ACTIVE_STATUSES
 
     # Override save to set total_price and slug correctly
     def save(self, *args, **kwargs):
@@ -271,6 +335,8 @@ class Booking(models.Model):
             self.minimum_deposit = VenueConfiguration.get_config().minimum_deposit
 
         self.total_price = self.calculate_total()
+        # Built items are only current for this save; later ones read the stored items.
+        self.__dict__.pop('_built_line_items', None)
         # Set start_date from start_datetime
         if self.start_datetime:
             self.start_date = self.start_datetime.date()
@@ -285,11 +351,35 @@ class Booking(models.Model):
             if self.advance_paid >= self.total_price and  self.status not in ["liquidado","entregado", "finalizado","cancelado","rechazado"]:
                 self.status = "liquidado"
         
-        # Validate the booking before saving (only if we have required fields)
-        if self.venue and self.start_datetime:
+        from django.core.exceptions import ValidationError
+        from django.db import IntegrityError
+        from . import availability
+
+        # Validate the booking before saving (only if we have required fields and
+        # the save could introduce an overlap). PostgreSQL enforces the overlap
+        # rule itself through an exclusion constraint.
+        if (
+            self.venue_id and self.start_datetime and self.needs_overlap_check()
+            and not availability.db_enforces_overlap(kwargs.get('using') or 'default')
+        ):
             self.clean()
-            
-        super().save(*args, **kwargs)
+
+        # Partial saves must still bump updated_at — it fingerprints cached calendar payloads.
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['updated_at']
+
+        try:
+            # One atomic block for the row and its post_save receivers, so the status
+            # counters (status_counts.py) commit or roll back with the transition even
+            # without an outer transaction. As a savepoint, it also keeps an enclosing
+            # PostgreSQL transaction usable after the overlap constraint rejects the write.
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+        except IntegrityError as e:
+            if availability.is_overlap_violation(e):
+                raise ValidationError(availability.overlap_error_dict()) from e
+            raise
 
 
     STATUS_CHOICES = (
@@ -335,18 +425,25 @@ class Booking(models.Model):
         return None
 
     @classmethod
-    def is_date_available(cls, venue, start_datetime, end_datetime, exclude_booking_id=None):
+    def is_date_available(cls, venue, start_datetime, end_datetime, exclude_booking_id=None, use_index=True):
         """
         Check if a time range is available for a venue using overlap detection.
         Handles bookings that go past midnight correctly.
+        Answers from the per-venue interval index when it is warm, otherwise
+        falls back to an overlap query. Write paths pass ``use_index=False``:
+        the index may miss another worker's booking until it expires.
         """
-        active_statuses = ['solicitud', 'aceptacion', 'apartado', 'liquidado', 'liquidado_entregado', 'entregado']
+        from . import availability
+
+        index = availability.get_index(getattr(venue, 'pk', venue)) if use_index else None
+        if index is not None:
+            return not index.has_overlap(start_datetime, end_datetime, exclude_booking_id)
 
         conflicting_bookings = cls.objects.filter(
             venue=venue,
             start_datetime__lt=end_datetime,
             end_datetime__gt=start_datetime,
-            status__in=active_statuses,
+            status__in=availability.ACTIVE_STATUSES,
         ).exclude(id=exclude_booking_id)
 
         return not conflicting_bookings.exists()
@@ -357,41 +454,33 @@ class Booking(models.Model):
         Get available dates for a specific venue using time-overlap detection.
         A date is unavailable if any booking's time range overlaps with any part of that day.
         Handles bookings that run past midnight correctly.
+        Answers from the interval index when it is warm, otherwise from the
+        materialized per-day occupancy rows.
         """
         from django.utils import timezone
         import datetime
+        from . import availability, occupancy
 
         if not start_date:
             start_date = timezone.now().date()
         if not end_date:
             end_date = start_date + datetime.timedelta(days=days_ahead)
 
-        active_statuses = ['solicitud', 'aceptacion', 'apartado', 'liquidado', 'liquidado_entregado', 'entregado']
-
-        use_tz = timezone.is_aware(timezone.now())
-
-        def make_dt(d, t=datetime.time.min):
-            combined = datetime.datetime.combine(d, t)
-            return timezone.make_aware(combined) if use_tz else combined
-
-        # Fetch all bookings that could overlap with any day in range
-        range_start = make_dt(start_date)
-        range_end = make_dt(end_date + datetime.timedelta(days=1))
-
-        bookings = list(cls.objects.filter(
-            venue=venue,
-            status__in=active_statuses,
-            start_datetime__lt=range_end,
-            end_datetime__gt=range_start,
-        ).values_list('start_datetime', 'end_datetime'))
+        index = availability.get_index(getattr(venue, 'pk', venue))
+        if index is not None:
+            range_start = availability.make_local_datetime(start_date)
+            range_end = availability.make_local_datetime(end_date + datetime.timedelta(days=1))
+            bookings = [(start, end) for _, start, end in index.overlapping(range_start, range_end)]
+            booked = availability.booked_days(bookings, start_date, end_date)
+        else:
+            booked = occupancy.occupied_dates(
+                getattr(venue, 'pk', venue), start_date, end_date, availability.ACTIVE_STATUSES,
+            )
 
         available_dates = []
         current_date = start_date
         while current_date <= end_date:
-            day_start = make_dt(current_date)
-            day_end = make_dt(current_date + datetime.timedelta(days=1))
-            is_booked = any(b_start < day_end and b_end > day_start for b_start, b_end in bookings)
-            if not is_booked:
+            if current_date not in booked:
                 available_dates.append(current_date)
             current_date += datetime.timedelta(days=1)
 
@@ -452,6 +541,7 @@ class Booking(models.Model):
     def clean(self):
         """Validate the booking before saving"""
         from django.core.exceptions import ValidationError
+        from . import availability
         
         # Check if this is a new booking or status is being changed to active
         if self.pk is None or self.status in ['solicitud', 'aceptacion', 'apartado', 'liquidado', 'liquidado_entregado', 'entregado']:
@@ -461,12 +551,10 @@ class Booking(models.Model):
                     self.start_datetime,
                     self.end_datetime,
                     exclude_booking_id=self.pk,
+                    use_index=False,
                 )
                 if not is_available:
-                    raise ValidationError({
-                        'start_datetime': 'This time range is not available for the selected venue.',
-                        'end_datetime': 'This time range is not available for the selected venue.',
-                    })
+                    raise ValidationError(availability.overlap_error_dict())
         
         super().clean()
     
@@ -485,17 +573,40 @@ class BookingWish(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     venue = models.ForeignKey('Venue', on_delete=models.CASCADE)
     wished_start_datetime = models.DateTimeField()
+    # Local date of wished_start_datetime, what the waitlist matcher joins on
+    wished_date = models.DateField(editable=False, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     notified = models.BooleanField(default=False)
 
     class Meta:
         unique_together = ('user', 'venue', 'wished_start_datetime')
+        indexes = [
+            models.Index(fields=['venue', 'wished_date', 'notified']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.wished_start_datetime:
+            self.wished_date = timezone.localtime(self.wished_start_datetime).date()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user} esta en espera en {self.venue} para {self.wished_start_datetime}  "
 
 
-class Notification(models.Model):
+class NotificationQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create sends no post_save; keep the unread counters in step here.
+        from . import unread
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        unread.apply_created(objs)
+        return objs
+
+
+class Notification(TrackedFieldsMixin, models.Model):
+    # Loaded values kept for the unread counter (see booking/unread.py)
+    tracked_fields = ('user', 'read')
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
@@ -503,6 +614,8 @@ class Notification(models.Model):
     booking = models.ForeignKey('Booking', null=True, blank=True, on_delete=models.CASCADE)
     type = models.CharField(max_length=50, default='general')
 
+    objects = NotificationQuerySet.as_manager()
+
     def __str__(self):
         return f"Notification for {self.user}: {self.message[:30]}"
 
@@ -545,3 +658,75 @@ class BookingLineItem(models.Model):
 
     def __str__(self):
         return f"{self.description}: ${self.unit_price}"
+
+
+class VenueDayOccupancy(models.Model):
+    """One row per venue and local date listing the bookings that touch that day.
+
+    Denormalized from Booking and kept in sync by booking/occupancy.py, so the
+    calendar and the daily views read an indexed date range instead of
+    recomputing overlaps. Rebuild with ``python manage.py rebuild_occupancy``.
+    """
+    venue = models.ForeignKey(Venue, related_name='day_occupancy', on_delete=models.CASCADE)
+    date = models.DateField()
+    # [{'booking_id', 'user_id', 'status', 'initials', 'label'}, ...] ordered by start
+    bookings = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('venue', 'date')
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.venue} {self.date}: {len(self.bookings)} reserva(s)"
+
+
+class BookingStatusCount(models.Model):
+    """Running number of bookings per status, globally and per customer.
+
+    Maintained transactionally by booking/status_counts.py on every create,
+    status/owner change and delete; ``python manage.py reconcile_status_counts``
+    recomputes it from scratch.
+    """
+    # 'global' or 'user:<id>'
+    scope = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'status')
+
+    def __str__(self):
+        return f"{self.scope} {self.status}: {self.count}"
+
+
+class CalendarSyncState(models.Model):
+    """Bookkeeping of the two-way Google Calendar sync (see booking/gcal_sync.py)."""
+    calendar_id = models.CharField(max_length=255, unique=True)
+    # nextSyncToken of the last events.list; empty forces a full listing
+    sync_token = models.TextField(blank=True)
+    last_pulled_at = models.DateTimeField(null=True, blank=True)
+    last_pushed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.calendar_id} (pull: {self.last_pulled_at}, push: {self.last_pushed_at})"
+
+
+class UnreadNotificationCount(models.Model):
+    """Number of unread notifications of a user, for the notification badge.
+
+    Maintained by booking/unread.py on every create, read/unread change and
+    delete; ``version`` increases with every change so long-polling clients
+    (``notifications/wait``) can tell that something moved.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, primary_key=True, on_delete=models.CASCADE, related_name='unread_notifications',
+    )
+    count = models.IntegerField(default=0)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count} (v{self.version})"
@@ -0,0 +1,230 @@
+"""
+Maintenance of the materialized ``VenueDayOccupancy`` table.
+
+Every booking that is not cancelled or rejected is expanded once, at write
+time, into the local dates it touches (half-open: an event ending at 00:00
+does not occupy the next day). Readers filter the stored entries by status,
+so the same rows serve the public calendar, the availability checks and the
+dashboard week view.
+
+Booking signals call ``refresh_booking`` on every save/delete; writes that
+bypass signals (``QuerySet.update``, bulk imports) must call ``refresh_days``
+or ``rebuild`` themselves.
+"""
+
+import datetime
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .availability import local_day_span, make_local_datetime
+
+# Bookings in these statuses never appear in the occupancy table.
+EXCLUDED_STATUSES = ('cancelado', 'rechazado')
+
+_BOOKING_FIELDS = (
+    'id', 'venue_id', 'user_id', 'status', 'start_datetime', 'end_datetime',
+    'description', 'user__first_name', 'user__last_name',
+)
+
+
+def booking_initials(first_name, last_name):
+    if first_name and last_name:
+        return f"{first_name[0]}{last_name[0]}".upper()
+    if first_name:
+        return first_name[0].upper()
+    if last_name:
+        return last_name[0].upper()
+    return "?"
+
+
+def booking_label(description, first_name, last_name):
+    if description and description.startswith('[GCal]\n'):
+        lines = description.split('\n', 2)
+        return lines[1].strip() if len(lines) > 1 else 'Sin nombre'
+    name = f"{first_name} {last_name}".strip()
+    if name:
+        return name
+    if description:
+        return description[:40]
+    return 'Sin nombre'
+
+
+def _entry(row):
+    first_name = row['user__first_name'] or ''
+    last_name = row['user__last_name'] or ''
+    return {
+        'booking_id': str(row['id']),
+        'user_id': row['user_id'],
+        'status': row['status'],
+        'initials': booking_initials(first_name, last_name),
+        'label': booking_label(row['description'], first_name, last_name),
+    }
+
+
+def _days(start, end):
+    first, last = local_day_span(start, end)
+    current = first
+    while current <= last:
+        yield current
+        current += datetime.timedelta(days=1)
+
+
+def _date_runs(dates):
+    """Collapse a set of dates into sorted (first, last) runs of consecutive days."""
+    runs = []
+    for day in sorted(dates):
+        if runs and day - runs[-1][1] == datetime.timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def _entries_for(venue_id, dates):
+    """Map each requested date of the venue to its entries, computed from Booking."""
+    from .models import Booking
+
+    window = Q()
+    for first, last in _date_runs(dates):
+        window |= Q(
+            start_datetime__lt=make_local_datetime(last + datetime.timedelta(days=1)),
+            end_datetime__gt=make_local_datetime(first),
+        )
+    rows = (
+        Booking.objects.filter(window, venue_id=venue_id)
+        .exclude(status__in=EXCLUDED_STATUSES)
+        .order_by('start_datetime')
+        .values(*_BOOKING_FIELDS)
+    )
+
+    entries = {day: [] for day in dates}
+    for row in rows:
+        entry = _entry(row)
+        for day in _days(row['start_datetime'], row['end_datetime']):
+            if day in entries:
+                entries[day].append(entry)
+    return entries
+
+
+def refresh_days(venue_id, dates):
+    """Recompute the occupancy rows of the given dates of one venue."""
+    from .models import Venue, VenueDayOccupancy
+
+    dates = set(dates)
+    if not dates:
+        return
+
+    with transaction.atomic():
+        # Serialize writers per venue so concurrent bookings can't overwrite each other's rows.
+        list(Venue.objects.select_for_update().filter(pk=venue_id).values_list('pk', flat=True))
+
+        entries = _entries_for(venue_id, dates)
+        existing = {
+            row.date: row
+            for row in VenueDayOccupancy.objects.filter(venue_id=venue_id, date__in=dates)
+        }
+        now = timezone.now()
+        to_create, to_update, to_delete = [], [], []
+        for day, bookings in entries.items():
+            row = existing.get(day)
+            if not bookings:
+                if row is not None:
+                    to_delete.append(row.pk)
+            elif row is None:
+                to_create.append(VenueDayOccupancy(venue_id=venue_id, date=day, bookings=bookings))
+            elif row.bookings != bookings:
+                row.bookings = bookings
+                row.updated_at = now
+                to_update.append(row)
+
+        if to_delete:
+            VenueDayOccupancy.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            VenueDayOccupancy.objects.bulk_update(to_update, ['bookings', 'updated_at'])
+        if to_create:
+            VenueDayOccupancy.objects.bulk_create(to_create)
+
+
+def refresh_booking(booking, deleted=False):
+    """Bring every day the booking touches, or used to touch, up to date.
+
+    The days it used to touch come from the tracked values loaded with the
+    instance (see terraza/tracking.py), so no lookup is needed to find them.
+    """
+    affected = {}
+    if not deleted:
+        previous_start = booking.previous('start_datetime')
+        previous_end = booking.previous('end_datetime')
+        if previous_start and previous_end and booking.previous('status') not in EXCLUDED_STATUSES:
+            affected.setdefault(booking.previous('venue'), set()).update(_days(previous_start, previous_end))
+
+    if booking.status not in EXCLUDED_STATUSES and booking.start_datetime and booking.end_datetime:
+        affected.setdefault(booking.venue_id, set()).update(
+            _days(booking.start_datetime, booking.end_datetime)
+        )
+
+    for venue_id, dates in affected.items():
+        refresh_days(venue_id, dates)
+
+
+def refresh_user(user):
+    """Re-denormalize initials and labels after a customer's name changes."""
+    from .models import Booking
+
+    affected = {}
+    rows = Booking.objects.filter(user=user).exclude(
+        status__in=EXCLUDED_STATUSES,
+    ).values_list('venue_id', 'start_datetime', 'end_datetime')
+    for venue_id, start, end in rows:
+        affected.setdefault(venue_id, set()).update(_days(start, end))
+
+    for venue_id, dates in affected.items():
+        refresh_days(venue_id, dates)
+
+
+def rebuild(venue_id=None, batch_size=500):
+    """Drop and recompute the occupancy rows of one venue, or of every venue.
+
+    Returns the number of rows written.
+    """
+    from .models import Booking, VenueDayOccupancy
+
+    bookings = Booking.objects.exclude(status__in=EXCLUDED_STATUSES)
+    occupancy = VenueDayOccupancy.objects.all()
+    if venue_id is not None:
+        bookings = bookings.filter(venue_id=venue_id)
+        occupancy = occupancy.filter(venue_id=venue_id)
+
+    days = {}
+    for row in bookings.order_by('start_datetime').values(*_BOOKING_FIELDS).iterator(chunk_size=2000):
+        entry = _entry(row)
+        for day in _days(row['start_datetime'], row['end_datetime']):
+            days.setdefault((row['venue_id'], day), []).append(entry)
+
+    with transaction.atomic():
+        occupancy.delete()
+        VenueDayOccupancy.objects.bulk_create(
+            [
+                VenueDayOccupancy(venue_id=venue, date=day, bookings=entries)
+                for (venue, day), entries in days.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(days)
+
+
+def occupied_dates(venue_id, start_date, end_date, statuses):
+    """Dates in [start_date, end_date] with at least one booking in ``statuses``."""
+    from .models import VenueDayOccupancy
+
+    rows = VenueDayOccupancy.objects.filter(
+        venue_id=venue_id,
+        date__gte=start_date,
+        date__lte=end_date,
+    ).values_list('date', 'bookings')
+    return {
+        day for day, bookings in rows
+        if any(entry['status'] in statuses for entry in bookings)
+    }
@@ -1,4 +1,5 @@
 import datetime as dt_module
+from . import availability
 from .models import Booking, Coupon, ExtraService, Package, Venue, BookingWish, Notification, Review, BookingLineItem, VenueConfiguration
 from users.serializers import UserSerializer
 from rest_framework import serializers
@@ -124,23 +125,21 @@ class BookingSerializer(serializers.ModelSerializer):
         start_datetime = validated_data.get('start_datetime')
         end_datetime = validated_data.get('end_datetime')
 
-        if start_datetime and end_datetime:
-            if not Booking.is_date_available(venue=venue, start_datetime=start_datetime, end_datetime=end_datetime):
+        # On PostgreSQL the exclusion constraint rejects the insert instead (see Booking.save).
+        if start_datetime and end_datetime and not availability.db_enforces_overlap():
+            if not Booking.is_date_available(venue=venue, start_datetime=start_datetime, end_datetime=end_datetime, use_index=False):
                 from rest_framework.exceptions import ValidationError
-                raise ValidationError({
-                    'start_datetime': 'This time range is not available for the selected venue.',
-                    'end_datetime': 'This time range is not available for the selected venue.',
-                })
-
-        booking = Booking.objects.create(venue=venue, package=package, **validated_data)
+                raise ValidationError(availability.overlap_error_dict())
 
-        for service_data in extra_services_data:
-            service = ExtraService.objects.get(id=service_data['id'])
-            booking.extra_services.add(service)
+        services = [ExtraService.objects.get(id=data['id']) for data in extra_services_data]
 
-        booking.create_line_items()
-        booking.total_price = booking.calculate_total()
+        # Price the line items up front so the booking is inserted once with its final total.
+        booking = Booking(venue=venue, package=package, **validated_data)
+        line_items = booking.build_line_items(extra_services=services)
         booking.save()
+        if services:
+            booking.extra_services.add(*services)
+        BookingLineItem.objects.bulk_create(line_items)
         return booking
 
     def update(self, instance, validated_data):
@@ -200,37 +199,80 @@ class BookingListSerializer(serializers.ModelSerializer):
             'rejection_reason',
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Load everything the list representation reads in a fixed number of queries.
+
+        Line items and extras are prefetched once for the whole page and the
+        latest rejection note is annotated through a subquery, so the method
+        fields below never touch the database per row.
+        """
+        from django.db import connection
+        from django.db.models import Case, CharField, OuterRef, Prefetch, Subquery, Value, When
+        from django.db.models.functions import Cast, Concat, Substr
+        from dashboard.models import AdminAction
+
+        # target_id holds str(uuid). Normalise the booking side, never the column,
+        # so the (action, target_id) index serves the lookup. Backends without a
+        # native uuid type store the pk as bare hex: put the hyphens back.
+        booking_id = Cast(OuterRef('pk'), CharField())
+        if not connection.features.has_native_uuid_field:
+            booking_id = Concat(
+                Substr(booking_id, 1, 8), Value('-'), Substr(booking_id, 9, 4), Value('-'),
+                Substr(booking_id, 13, 4), Value('-'), Substr(booking_id, 17, 4), Value('-'),
+                Substr(booking_id, 21, 12),
+                output_field=CharField(),
+            )
+        latest_rejection = AdminAction.objects.filter(
+            action='booking_rejected', target_id=booking_id,
+        ).order_by('-created_at').values('description')[:1]
+
+        return queryset.select_related(
+            'user', 'user__profile', 'package',
+        ).prefetch_related(
+            Prefetch('line_items', queryset=BookingLineItem.objects.order_by('pk')),
+            'extra_services',
+        ).annotate(
+            rejection_description=Case(
+                When(status='rechazado', then=Subquery(latest_rejection)),
+                default=Value(None),
+                output_field=CharField(),
+            ),
+        )
+
     def get_rejection_reason(self, obj):
         """Get rejection reason from AdminAction if status is 'rechazado'"""
-        if obj.status == 'rechazado':
-            try:
-                from dashboard.models import AdminAction
-                admin_action = AdminAction.objects.filter(
-                    action='booking_rejected',
-                    target_id=str(obj.id)
-                ).order_by('-created_at').first()
-                
-                if admin_action:
-                    # Extract the reason from the description
-                    description = admin_action.description
-                    if 'Reason:' in description:
-                        reason = description.split('Reason:' + ' ')[-1]
-                        return reason
-                    return description
-                return None
-            except Exception:
-                return None
+        if obj.status != 'rechazado':
+            return None
+        if hasattr(obj, 'rejection_description'):
+            description = obj.rejection_description
+        else:
+            from dashboard.models import AdminAction
+            description = AdminAction.objects.filter(
+                action='booking_rejected',
+                target_id=str(obj.id)
+            ).order_by('-created_at').values_list('description', flat=True).first()
+
+        if description:
+            # Extract the reason from the description
+            if 'Reason:' in description:
+                return description.split('Reason:' + ' ')[-1]
+            return description
         return None
 
+    def _line_items(self, obj, item_type):
+        # Filter in Python so the prefetched line items are reused.
+        return [item for item in obj.line_items.all() if item.item_type == item_type]
+
     def get_package_price(self, obj):
-        line_item = obj.line_items.filter(item_type='package').first()
-        if line_item:
-            return str(line_item.unit_price)
+        line_items = self._line_items(obj, 'package')
+        if line_items:
+            return str(line_items[0].unit_price)
         return str(obj.package.price) if obj.package else None
 
     def get_extras_with_prices(self, obj):
-        line_items = obj.line_items.filter(item_type='extra_service')
-        if line_items.exists():
+        line_items = self._line_items(obj, 'extra_service')
+        if line_items:
             return [{'name': item.description, 'price': str(item.unit_price)} for item in line_items]
         # Fallback for legacy bookings without line items
         return [{'name': extra.name, 'price': str(extra.price)} for extra in obj.extra_services.all()]
@@ -361,19 +403,18 @@ class BookingCreateSerializer(serializers.ModelSerializer):
         else:
             raise ValidationError({'user': 'Autenticación requerida.'})
 
-        booking = Booking.objects.create(
+        # Price the line items up front so the booking is inserted once with its final total.
+        booking = Booking(
             venue=venue,
             package=package,
             user=user,
             **validated_data
         )
-
-        for service in services:
-            booking.extra_services.add(service)
-
-        booking.create_line_items()
-        booking.total_price = booking.calculate_total()
+        line_items = booking.build_line_items(extra_services=services)
         booking.save()
+        if services:
+            booking.extra_services.add(*services)
+        BookingLineItem.objects.bulk_create(line_items)
         return booking
 
 class BookingUpdateSerializer(serializers.ModelSerializer):
@@ -399,6 +440,11 @@ class BookingUpdateSerializer(serializers.ModelSerializer):
             'hora_entrega',
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # BookingViewSet.perform_update diffs these against the saved booking.
+        return queryset.select_related('package', 'venue').prefetch_related('extra_services')
+
     def update(self, instance, validated_data):
         from rest_framework.exceptions import ValidationError
         from django.utils import timezone
@@ -487,4 +533,25 @@ class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ['id', 'booking', 'user', 'rating', 'review', 'created_at', 'updated_at']
-        read_only_fields = ['booking', 'user', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['booking', 'user', 'created_at', 'updated_at']
+
+class AvailabilityRangeSerializer(serializers.Serializer):
+    venue = serializers.IntegerField(required=False, default=1)
+    start_datetime = serializers.DateTimeField()
+    end_datetime = serializers.DateTimeField()
+    exclude_booking_id = serializers.UUIDField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if attrs['end_datetime'] <= attrs['start_datetime']:
+            raise serializers.ValidationError({'end_datetime': 'La fecha de fin debe ser posterior al inicio.'})
+        return attrs
+
+
+class AvailabilityCheckSerializer(serializers.Serializer):
+    MAX_RANGES = 300
+
+    ranges = serializers.ListField(
+        child=AvailabilityRangeSerializer(),
+        allow_empty=False,
+        max_length=MAX_RANGES,
+    )
@@ -207,11 +207,23 @@ def _strip_emoji(text):
     return _EMOJI_RE.sub('', text).strip()
 
 
+def card_path(booking_id, filename):
+    return f'share_cards/{booking_id}/{filename}'
+
+
+def existing_card_url(booking_id, filename):
+    """URL of a card rendered earlier (e.g. by the booking.render_share_card job), or None."""
+    path = card_path(booking_id, filename)
+    if default_storage.exists(path):
+        return default_storage.url(path)
+    return None
+
+
 def _save_card(img, booking_id, filename):
     buf = io.BytesIO()
     img.save(buf, format='PNG', optimize=True)
     buf.seek(0)
-    path = f'share_cards/{booking_id}/{filename}'
+    path = card_path(booking_id, filename)
     if default_storage.exists(path):
         default_storage.delete(path)
     saved = default_storage.save(path, ContentFile(buf.read()))
@@ -1,31 +1,91 @@
-from django.db.models.signals import post_save, pre_save
+import datetime
+
+from django.conf import settings
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Booking, BookingWish, Notification
-
-try:
-    from users.email_service import TerrazaEmailService
-except ImportError:
-    TerrazaEmailService = None
+from .models import Booking, Notification, VenueConfiguration
+from jobs import queue
+from . import availability, occupancy, status_counts, unread
 
 try:
     from . import google_calendar as gcal
+    from . import gcal_sync
 except ImportError:
     gcal = None
 
 User = get_user_model()
 
 
-@receiver(pre_save, sender=Booking)
-def booking_status_change_notification(sender, instance, **kwargs):
-    if not instance.pk:
+@receiver(post_save, sender=VenueConfiguration)
+@receiver(post_delete, sender=VenueConfiguration)
+def invalidate_venue_configuration(sender, **kwargs):
+    VenueConfiguration.invalidate_cache()
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_availability_index(sender, instance, **kwargs):
+    """Drop the cached interval index of the booking's venue."""
+    availability.invalidate_booking(instance)
+
+
+@receiver(post_save, sender=Booking)
+def refresh_venue_day_occupancy(sender, instance, **kwargs):
+    """Keep the materialized per-day occupancy rows in sync with the booking."""
+    if kwargs.get('raw'):
+        return
+    occupancy.refresh_booking(instance)
+
+
+@receiver(post_delete, sender=Booking)
+def clear_venue_day_occupancy(sender, instance, **kwargs):
+    occupancy.refresh_booking(instance, deleted=True)
+
+
+@receiver(post_save, sender=Booking)
+def update_status_counts_on_save(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    status_counts.apply_transition(
+        instance.previous('user'),
+        instance.previous('status'),
+        instance.user_id,
+        instance.status,
+    )
+
+
+@receiver(post_delete, sender=Booking)
+def update_status_counts_on_delete(sender, instance, **kwargs):
+    status_counts.apply_transition(instance.user_id, instance.status, None, None)
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_count_on_save(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    unread.apply_change(instance.previous('user'), instance.previous('read'), instance.user_id, instance.read)
+
+
+@receiver(post_delete, sender=Notification)
+def update_unread_count_on_delete(sender, instance, **kwargs):
+    unread.apply_change(instance.user_id, instance.read, None, None)
+
+
+@receiver(post_save, sender=User)
+def refresh_user_occupancy_labels(sender, instance, created, update_fields=None, **kwargs):
+    """Initials and labels are denormalized into the occupancy rows."""
+    if created or kwargs.get('raw'):
         return
-    try:
-        old = sender.objects.get(pk=instance.pk)
-    except sender.DoesNotExist:
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
         return
+    occupancy.refresh_user(instance)
 
-    if old.status == instance.status:
+
+@receiver(pre_save, sender=Booking)
+def booking_status_change_notification(sender, instance, **kwargs):
+    old_status = instance.previous('status')
+    if old_status is None or not instance.has_changed('status'):
         return
 
     # Notify user of status change
@@ -36,42 +96,14 @@ def booking_status_change_notification(sender, instance, **kwargs):
         type='status_change'
     )
 
-    if TerrazaEmailService:
-        try:
-            TerrazaEmailService.send_booking_status_update(
-                user=instance.user,
-                booking=instance,
-                old_status=old.get_status_display()
-            )
-        except Exception as e:
-            print(f"Error sending booking status update email: {e}")
+    queue.enqueue('booking.send_status_email', {
+        'booking_id': str(instance.pk),
+        'old_status': dict(Booking.STATUS_CHOICES).get(old_status, old_status),
+    })
 
     # When a booking is cancelled or rejected, notify waitlisted users
     if instance.status in ('cancelado', 'rechazado'):
-        _notify_booking_wish_users(instance)
-
-
-def _notify_booking_wish_users(booking):
-    """Notify waitlisted users when a slot opens up on the cancelled booking's date."""
-    wishes = BookingWish.objects.filter(
-        venue=booking.venue,
-        wished_start_datetime__date=booking.start_datetime.date(),
-        notified=False,
-    ).select_related('user')
-
-    for wish in wishes:
-        date_str = booking.start_datetime.strftime('%d/%m/%Y')
-        Notification.objects.create(
-            user=wish.user,
-            message=(
-                f"¡Buenas noticias! El {date_str} en {booking.venue.name} "
-                f"está disponible nuevamente. ¡Reserva antes de que se ocupe!"
-            ),
-            booking=None,
-            type='wishlist'
-        )
-        wish.notified = True
-        wish.save(update_fields=['notified'])
+        queue.enqueue('booking.notify_waitlist', {'booking_id': str(instance.pk)})
 
 
 @receiver(post_save, sender=Booking)
@@ -93,47 +125,35 @@ def booking_created_notification(sender, instance, created, **kwargs):
         type='booking_created'
     )
 
-    # Confirmation email to customer
-    if TerrazaEmailService:
-        try:
-            TerrazaEmailService.send_booking_confirmation(
-                user=instance.user,
-                booking=instance
-            )
-        except Exception as e:
-            print(f"Error sending booking confirmation email: {e}")
-
-    # In-app notification for all staff members
-    customer_name = instance.user.get_full_name() or instance.user.email
-    staff_notifications = [
-        Notification(
-            user=staff_user,
-            message=f"Nueva solicitud de {customer_name} para el {date_str}.",
-            booking=instance,
-            type='new_booking_staff'
-        )
-        for staff_user in User.objects.filter(is_staff=True)
-    ]
-    if staff_notifications:
-        Notification.objects.bulk_create(staff_notifications)
+    # Confirmation email and staff notifications run in the background (booking/jobs.py)
+    queue.enqueue('booking.send_confirmation_email', {'booking_id': str(instance.pk)})
+    queue.enqueue('booking.notify_staff_new_booking', {'booking_id': str(instance.pk)})
 
 
 @receiver(post_save, sender=Booking)
 def sync_booking_to_google_calendar(sender, instance, created, **kwargs):
-    """Create or update a Google Calendar event whenever a booking is saved."""
-    if not gcal:
+    """Create or update the Google Calendar event whenever a booking is saved."""
+    if not gcal or not gcal.is_configured() or gcal_sync.is_google_owned(instance):
         return
+    # Debounced: saves within the window (e.g. the follow-up saves of payment
+    # signals) collapse into the one pending sync of this booking.
+    queue.enqueue(
+        'booking.sync_google_calendar',
+        {'booking_id': str(instance.pk)},
+        dedupe_key=f'gcal-sync:{instance.pk}',
+        delay=datetime.timedelta(seconds=settings.GOOGLE_CALENDAR_SYNC_DELAY),
+    )
+
 
-    if created:
-        event_id = gcal.create_event(instance)
-        if event_id:
-            Booking.objects.filter(pk=instance.pk).update(google_calendar_event_id=event_id)
-            instance.google_calendar_event_id = event_id
-    else:
-        if instance.google_calendar_event_id:
-            gcal.update_event(instance, instance.google_calendar_event_id)
-        else:
-            event_id = gcal.create_event(instance)
-            if event_id:
-                Booking.objects.filter(pk=instance.pk).update(google_calendar_event_id=event_id)
-                instance.google_calendar_event_id = event_id
+@receiver(post_save, sender=Booking)
+def prerender_share_card(sender, instance, created, **kwargs):
+    """Render the confirmation card once the booking becomes shareable or moves."""
+    if kwargs.get('raw') or instance.status not in Booking.SHAREABLE_STATUSES:
+        return
+    if instance.previous('status') in Booking.SHAREABLE_STATUSES and not instance.has_changed('start_datetime'):
+        return
+    queue.enqueue(
+        'booking.render_share_card',
+        {'booking_id': str(instance.pk)},
+        dedupe_key=f'share-card:{instance.pk}',
+    )
@@ -0,0 +1,46 @@
+"""
+Fan-out of new-booking alerts to the staff.
+
+``booking.notify_staff_new_booking`` is a batch job: every booking created
+enqueues one, and the worker hands all the due ones to ``new_bookings`` at
+once. The recipients are read once per batch (users/staff.py), the
+in-app notifications for every (booking, staff member) pair are written with
+a single ``bulk_create``, and with ``STAFF_NEW_BOOKING_DIGEST`` enabled each
+staff member also gets one email listing the batch, all sent over one SMTP
+connection. A seed script creating hundreds of bookings costs a handful of
+queries, not one staff lookup per booking.
+"""
+
+from django.conf import settings
+
+from users import staff
+
+try:
+    from users.email_service import TerrazaEmailService
+except ImportError:
+    TerrazaEmailService = None
+
+
+def _message(booking):
+    customer_name = booking.user.get_full_name() or booking.user.email
+    return f"Nueva solicitud de {customer_name} para el {booking.start_datetime.strftime('%d/%m/%Y')}."
+
+
+def new_bookings(bookings):
+    """Alert every staff member of ``bookings``. Returns the number of notifications written."""
+    from .models import Notification
+
+    bookings = list(bookings)
+    recipients = staff.staff_recipients()
+    if not bookings or not recipients:
+        return 0
+
+    notifications = Notification.objects.bulk_create([
+        Notification(user_id=recipient['id'], message=_message(booking), booking=booking, type='new_booking_staff')
+        for booking in bookings
+        for recipient in recipients
+    ], batch_size=500)
+
+    if getattr(settings, 'STAFF_NEW_BOOKING_DIGEST', False) and TerrazaEmailService is not None:
+        TerrazaEmailService.send_staff_new_bookings_digest(recipients, bookings)
+    return len(notifications)
@@ -0,0 +1,73 @@
+"""
+Incrementally maintained booking counters per status.
+
+Every booking contributes to the ``global`` scope and to the scope of its
+owner (``user:<id>``). Signals in booking/signals.py apply +1/-1 deltas with
+``F()`` expressions, so concurrent transitions never lose updates and
+``BookingStatusCountsView`` answers with a single read. The receivers run
+inside the atomic block of ``Booking.save`` (and of ``delete()``), so a
+counter never commits without its transition or the other way round.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F
+
+GLOBAL_SCOPE = 'global'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def _bump(scope, status, delta):
+    from .models import BookingStatusCount
+
+    updated = BookingStatusCount.objects.filter(scope=scope, status=status).update(count=F('count') + delta)
+    if not updated:
+        counter, created = BookingStatusCount.objects.get_or_create(
+            scope=scope, status=status, defaults={'count': delta},
+        )
+        if not created:
+            BookingStatusCount.objects.filter(pk=counter.pk).update(count=F('count') + delta)
+
+
+def apply_transition(old_user_id, old_status, new_user_id, new_status):
+    """Move one booking between (owner, status) buckets; None means absent."""
+    if (old_user_id, old_status) == (new_user_id, new_status):
+        return
+    with transaction.atomic():
+        if old_status is not None:
+            if old_status != new_status:
+                _bump(GLOBAL_SCOPE, old_status, -1)
+            _bump(user_scope(old_user_id), old_status, -1)
+        if new_status is not None:
+            if old_status != new_status:
+                _bump(GLOBAL_SCOPE, new_status, 1)
+            _bump(user_scope(new_user_id), new_status, 1)
+
+
+def counts_for(user=None):
+    """Status → count for the user's scope, or globally when no user is given."""
+    from .models import Booking, BookingStatusCount
+
+    scope = GLOBAL_SCOPE if user is None else user_scope(user.pk)
+    counts = {status: 0 for status, _ in Booking.STATUS_CHOICES}
+    counts.update(BookingStatusCount.objects.filter(scope=scope).values_list('status', 'count'))
+    return counts
+
+
+def reconcile():
+    """Recompute every counter from Booking; returns the number of rows written."""
+    from .models import Booking, BookingStatusCount
+
+    with transaction.atomic():
+        rows = []
+        for status, total in Booking.objects.order_by().values_list('status').annotate(total=Count('pk')):
+            rows.append(BookingStatusCount(scope=GLOBAL_SCOPE, status=status, count=total))
+        per_user = Booking.objects.order_by().values_list('user_id', 'status').annotate(total=Count('pk'))
+        for user_id, status, total in per_user:
+            rows.append(BookingStatusCount(scope=user_scope(user_id), status=status, count=total))
+
+        BookingStatusCount.objects.all().delete()
+        BookingStatusCount.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
@@ -1,3 +1,1209 @@
-from django.test import TestCase
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core import mail
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+
+from jobs import queue
+from jobs.models import Job
+from users import outbox
+from . import availability, gcal_sync, google_calendar, occupancy, status_counts
+from . import ics_feed, unread, waitlist
+from .fake_calendar import FakeCalendarService
+from .models import (
+    CONFIG_CACHE_KEY, Booking, BookingLineItem, BookingWish, CalendarSyncState, BookingStatusCount, ExtraService, Package, Venue,
+    Notification, UnreadNotificationCount, VenueConfiguration, VenueDayOccupancy,
+)
+from .serializers import BookingCreateSerializer, BookingListSerializer, BookingSerializer
+
+User = get_user_model()
+
+
+def aware(year, month, day, hour=0, minute=0):
+    return timezone.make_aware(datetime.datetime(year, month, day, hour, minute))
+
+
+class BookingFixturesMixin:
+    def setUp(self):
+        # Queued jobs (booking.render_share_card) write files under MEDIA_ROOT.
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings_override = override_settings(MEDIA_ROOT=self.media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(
+            email='cliente@test.com', first_name='Ana', last_name='López', password='testpass123',
+        )
+        self.venue = Venue.objects.create(name='Terraza', slug='terraza')
+        self.package = Package.objects.create(title='Básico', price=5000, description='Paquete básico')
+        availability.invalidate()
+
+    def make_booking(self, start, end, status='solicitud', **kwargs):
+        return Booking.objects.create(
+            user=self.user, venue=self.venue, package=self.package,
+            start_datetime=start, end_datetime=end, status=status, **kwargs
+        )
+
+
+class AvailabilityIndexTestCase(BookingFixturesMixin, TestCase):
+    def test_overlap_lookup_matches_half_open_intervals(self):
+        index = availability.VenueIntervalIndex([
+            ('a', aware(2030, 1, 1, 10), aware(2030, 1, 1, 22)),
+            ('b', aware(2030, 1, 3, 10), aware(2030, 1, 5, 0)),
+        ])
+        self.assertTrue(index.has_overlap(aware(2030, 1, 1, 21), aware(2030, 1, 1, 23)))
+        self.assertFalse(index.has_overlap(aware(2030, 1, 1, 22), aware(2030, 1, 2, 10)))
+        self.assertFalse(index.has_overlap(aware(2030, 1, 1, 0), aware(2030, 1, 1, 10)))
+        self.assertTrue(index.has_overlap(aware(2030, 1, 4, 12), aware(2030, 1, 4, 13)))
+        self.assertFalse(index.has_overlap(aware(2030, 1, 4, 12), aware(2030, 1, 4, 13), exclude_id='b'))
+
+    def test_available_dates_from_warm_index_match_database(self):
+        self.make_booking(aware(2030, 3, 2, 10), aware(2030, 3, 2, 22))
+        # Runs past midnight into the 6th, but ends exactly at midnight of the 7th.
+        self.make_booking(aware(2030, 3, 5, 18), aware(2030, 3, 7, 0), status='apartado')
+        self.make_booking(aware(2030, 3, 9, 10), aware(2030, 3, 9, 22), status='cancelado')
+
+        start, end = datetime.date(2030, 3, 1), datetime.date(2030, 3, 10)
+        cold = Booking.get_available_dates(self.venue, start, end)
+
+        availability.build_index(self.venue.pk)
+        warm = Booking.get_available_dates(self.venue, start, end)
+
+        self.assertEqual(cold, warm)
+        self.assertNotIn(datetime.date(2030, 3, 2), warm)
+        self.assertNotIn(datetime.date(2030, 3, 6), warm)
+        self.assertIn(datetime.date(2030, 3, 7), warm)
+        self.assertIn(datetime.date(2030, 3, 9), warm)
+
+    def test_saving_a_booking_invalidates_the_index(self):
+        availability.build_index(self.venue.pk)
+        self.assertTrue(Booking.is_date_available(self.venue, aware(2030, 4, 1, 10), aware(2030, 4, 1, 22)))
+
+        self.make_booking(aware(2030, 4, 1, 10), aware(2030, 4, 1, 22))
+
+        self.assertIsNone(availability._indexes.get(self.venue.pk))
+        self.assertFalse(Booking.is_date_available(self.venue, aware(2030, 4, 1, 12), aware(2030, 4, 1, 14)))
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'PostgreSQL enforces overlaps with a constraint')
+    def test_writes_never_trust_a_stale_index(self):
+        # An index built before another worker's booking, which this process never heard of.
+        stale = availability.build_index(self.venue.pk)
+        self.make_booking(aware(2030, 4, 2, 10), aware(2030, 4, 2, 22))
+        availability._indexes[self.venue.pk] = stale
+
+        with self.assertRaises(ValidationError):
+            self.make_booking(aware(2030, 4, 2, 12), aware(2030, 4, 2, 14))
+
+
+class BookedDatesViewTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('booked-dates')
+
+    def test_window_limits_the_returned_days(self):
+        self.make_booking(aware(2030, 5, 1, 10), aware(2030, 5, 3, 22))
+        self.make_booking(aware(2030, 6, 1, 10), aware(2030, 6, 1, 22))
+
+        response = self.client.get(self.url, {'from': '2030-05-02', 'to': '2030-05-31'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['date'] for item in response.data], ['2030-05-02', '2030-05-03'])
+        self.assertEqual(response.data[0]['user_initials'], 'AL')
+        self.assertNotIn('booking_id', response.data[0])
+
+    def test_etag_revalidation_and_invalidation(self):
+        booking = self.make_booking(aware(2030, 5, 1, 10), aware(2030, 5, 1, 22))
+
+        first = self.client.get(self.url, {'venue': self.venue.pk})
+        self.assertIn('Authorization', first['Vary'])
+        etag = first['ETag']
+
+        second = self.client.get(self.url, {'venue': self.venue.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, 304)
+
+        booking.status = 'cancelado'
+        booking.save(update_fields=['status'])
+
+        third = self.client.get(self.url, {'venue': self.venue.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(third.status_code, 200)
+        self.assertEqual(third.data, [])
+
+    def test_invalid_window_is_rejected(self):
+        response = self.client.get(self.url, {'from': 'mayo'})
+        self.assertEqual(response.status_code, 400)
+
+
+class VenueDayOccupancyTestCase(BookingFixturesMixin, TestCase):
+    def occupied(self):
+        return {
+            row.date: [entry['booking_id'] for entry in row.bookings]
+            for row in VenueDayOccupancy.objects.filter(venue=self.venue)
+        }
+
+    def test_multi_day_booking_is_expanded_on_write(self):
+        booking = self.make_booking(aware(2030, 7, 1, 18), aware(2030, 7, 3, 0))
+
+        self.assertEqual(self.occupied(), {
+            datetime.date(2030, 7, 1): [str(booking.pk)],
+            datetime.date(2030, 7, 2): [str(booking.pk)],
+        })
+        entry = VenueDayOccupancy.objects.get(venue=self.venue, date=datetime.date(2030, 7, 1)).bookings[0]
+        self.assertEqual(entry['initials'], 'AL')
+        self.assertEqual(entry['label'], 'Ana López')
+
+    def test_moving_cancelling_and_deleting_keep_rows_in_sync(self):
+        booking = self.make_booking(aware(2030, 7, 1, 10), aware(2030, 7, 1, 22))
+        other = self.make_booking(aware(2030, 7, 5, 10), aware(2030, 7, 5, 22))
+
+        booking.start_datetime = aware(2030, 7, 5, 8)
+        booking.end_datetime = aware(2030, 7, 5, 9)
+        booking.save()
+        self.assertEqual(self.occupied(), {datetime.date(2030, 7, 5): [str(booking.pk), str(other.pk)]})
+
+        other.status = 'cancelado'
+        other.save()
+        self.assertEqual(self.occupied(), {datetime.date(2030, 7, 5): [str(booking.pk)]})
+
+        booking.delete()
+        self.assertEqual(self.occupied(), {})
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        self.make_booking(aware(2030, 8, 1, 10), aware(2030, 8, 2, 2))
+        self.make_booking(aware(2030, 8, 4, 10), aware(2030, 8, 4, 22), status='finalizado')
+        incremental = list(VenueDayOccupancy.objects.values_list('venue_id', 'date', 'bookings'))
+
+        occupancy.rebuild()
+
+        self.assertEqual(list(VenueDayOccupancy.objects.values_list('venue_id', 'date', 'bookings')), incremental)
+
+    def test_renaming_the_customer_refreshes_labels(self):
+        self.make_booking(aware(2030, 8, 1, 10), aware(2030, 8, 1, 22))
+
+        self.user.first_name = 'Beatriz'
+        self.user.save()
+
+        entry = VenueDayOccupancy.objects.get(venue=self.venue).bookings[0]
+        self.assertEqual(entry['initials'], 'BL')
+
+
+class OverlapEnforcementTestCase(BookingFixturesMixin, TestCase):
+    def test_overlapping_active_booking_is_rejected_with_field_errors(self):
+        self.make_booking(aware(2030, 9, 1, 10), aware(2030, 9, 1, 22))
+
+        with self.assertRaises(ValidationError) as ctx:
+            self.make_booking(aware(2030, 9, 1, 20), aware(2030, 9, 2, 2))
+
+        self.assertEqual(set(ctx.exception.message_dict), {'start_datetime', 'end_datetime'})
+
+    def test_cancelled_bookings_do_not_block(self):
+        self.make_booking(aware(2030, 9, 1, 10), aware(2030, 9, 1, 22), status='cancelado')
+        self.make_booking(aware(2030, 9, 1, 10), aware(2030, 9, 1, 22))
+
+    def test_exception_handler_maps_constraint_violation_to_400(self):
+        from terraza.utils import custom_exception_handler
+
+        exc = IntegrityError(f'conflicting key value violates exclusion constraint "{availability.OVERLAP_CONSTRAINT}"')
+        response = custom_exception_handler(exc, {})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['start_datetime'], [availability.OVERLAP_ERROR])
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'exclusion constraint is PostgreSQL-only')
+    def test_database_rejects_overlap_without_python_checks(self):
+        self.make_booking(aware(2030, 9, 1, 10), aware(2030, 9, 1, 22))
+        self.assertTrue(availability.db_enforces_overlap())
+
+        # bulk_create sidesteps every Python-side check; only the constraint can catch it.
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Booking.objects.bulk_create([Booking(
+                user=self.user, venue=self.venue, package=self.package, slug='race',
+                start_datetime=aware(2030, 9, 1, 12), end_datetime=aware(2030, 9, 1, 14),
+            )])
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'exclusion constraint is PostgreSQL-only')
+    def test_constraint_violation_is_translated_and_the_transaction_stays_usable(self):
+        self.make_booking(aware(2030, 9, 1, 10), aware(2030, 9, 1, 22))
+
+        # TestCase wraps the test in a transaction, like ATOMIC_REQUESTS or a serializer's create().
+        with self.assertRaises(ValidationError) as ctx:
+            self.make_booking(aware(2030, 9, 1, 12), aware(2030, 9, 1, 14))
+
+        self.assertEqual(ctx.exception.message_dict['start_datetime'], [availability.OVERLAP_ERROR])
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class BatchAvailabilityTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.url = reverse('booking-check-availability')
+
+    def test_sweep_matches_pairwise_overlap(self):
+        intervals = [
+            ('a', aware(2030, 1, 1, 10), aware(2030, 1, 1, 22)),
+            ('b', aware(2030, 1, 1, 20), aware(2030, 1, 3, 0)),
+            ('c', aware(2030, 1, 5, 10), aware(2030, 1, 5, 22)),
+        ]
+        queries = [
+            (aware(2030, 1, 1, 0), aware(2030, 1, 1, 10)),
+            (aware(2030, 1, 1, 21), aware(2030, 1, 1, 23)),
+            (aware(2030, 1, 2, 0), aware(2030, 1, 6, 0)),
+            (aware(2030, 1, 3, 0), aware(2030, 1, 4, 0)),
+        ]
+        expected = [
+            sorted(i for i, s, e in intervals if s < qe and e > qs)
+            for qs, qe in queries
+        ]
+        self.assertEqual([sorted(m) for m in availability.sweep_overlaps(intervals, queries)], expected)
+
+    def test_many_ranges_in_one_query(self):
+        booking = self.make_booking(aware(2030, 10, 2, 10), aware(2030, 10, 2, 22))
+        ranges = [
+            {
+                'venue': self.venue.pk,
+                'start_datetime': aware(2030, 10, day, 10).isoformat(),
+                'end_datetime': aware(2030, 10, day, 22).isoformat(),
+            }
+            for day in range(1, 6)
+        ]
+        ranges.append(dict(ranges[1], exclude_booking_id=str(booking.pk)))
+
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {'ranges': ranges}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r['available'] for r in response.data['results']],
+            [True, False, True, True, True, True],
+        )
+        self.assertNotIn('conflicting_booking_ids', response.data['results'][1])
+
+    def test_rejects_oversized_batches(self):
+        item = {'start_datetime': aware(2030, 10, 1, 10).isoformat(), 'end_datetime': aware(2030, 10, 1, 22).isoformat()}
+        response = self.client.post(self.url, {'ranges': [item] * 301}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BookingStatusCountTestCase(BookingFixturesMixin, TestCase):
+    def test_counters_follow_transitions_and_match_reconcile(self):
+        other = User.objects.create_user(email='otro@test.com', first_name='Luis', last_name='Pérez', password='x')
+        first = self.make_booking(aware(2030, 11, 1, 10), aware(2030, 11, 1, 22))
+        second = self.make_booking(aware(2030, 11, 2, 10), aware(2030, 11, 2, 22))
+        self.make_booking(aware(2030, 11, 3, 10), aware(2030, 11, 3, 22), status='apartado')
+
+        first.status = 'cancelado'
+        first.save()
+        second.user = other
+        second.save()
+        second.delete()
+
+        counts = status_counts.counts_for()
+        self.assertEqual((counts['solicitud'], counts['cancelado'], counts['apartado']), (0, 1, 1))
+        self.assertEqual(status_counts.counts_for(other)['solicitud'], 0)
+
+        incremental = {(c.scope, c.status): c.count for c in BookingStatusCount.objects.exclude(count=0)}
+        status_counts.reconcile()
+        self.assertEqual({(c.scope, c.status): c.count for c in BookingStatusCount.objects.all()}, incremental)
+
+    def test_counters_roll_back_with_a_failed_save(self):
+        booking = self.make_booking(aware(2030, 11, 1, 10), aware(2030, 11, 1, 22))
+
+        def fail(sender, **kwargs):
+            raise RuntimeError('fallo después de los contadores')
+
+        post_save.connect(fail, sender=Booking)
+        self.addCleanup(post_save.disconnect, fail, sender=Booking)
+        booking.status = 'cancelado'
+        with self.assertRaises(RuntimeError):
+            booking.save()
+
+        counts = status_counts.counts_for()
+        self.assertEqual((counts['solicitud'], counts['cancelado']), (1, 0))
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'solicitud')
+
+    def test_view_answers_with_a_single_query(self):
+        self.make_booking(aware(2030, 11, 1, 10), aware(2030, 11, 1, 22))
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.assertNumQueries(1):
+            response = client.get(reverse('booking-status-counts'))
+
+        self.assertEqual(response.data['solicitud'], 1)
+        self.assertEqual(len(response.data), len(Booking.STATUS_CHOICES))
+
+
+class BookingListQueryBudgetTestCase(BookingFixturesMixin, TestCase):
+    # One query for the page, one per prefetched relation (line items, extras).
+    QUERY_BUDGET = 3
+
+    def seed(self, n):
+        from dashboard.models import AdminAction
+
+        Booking.objects.all().delete()
+        extra = ExtraService.objects.create(name='Mesa de dulces', price=800)
+        base = aware(2031, 1, 1, 10)
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                user=self.user, venue=self.venue, package=self.package,
+                start_datetime=base + datetime.timedelta(days=i),
+                end_datetime=base + datetime.timedelta(days=i, hours=12),
+                status='rechazado' if i % 3 == 0 else 'solicitud',
+            )
+            for i in range(n)
+        ])
+        BookingLineItem.objects.bulk_create([
+            BookingLineItem(booking=b, item_type='package', description='Básico', unit_price=5000)
+            for b in bookings[::2]
+        ])
+        Booking.extra_services.through.objects.bulk_create([
+            Booking.extra_services.through(booking_id=b.pk, extraservice_id=extra.pk)
+            for b in bookings[1::2]
+        ])
+        AdminAction.objects.bulk_create([
+            AdminAction(
+                admin_user=self.user, action='booking_rejected', target_id=str(b.pk),
+                description=f'Booking rejected: solicitud → rechazado. Reason: motivo {b.pk}',
+            )
+            for b in bookings[::3]
+        ])
+        return bookings
+
+    def test_query_count_is_constant(self):
+        for n in (10, 100, 1000):
+            with self.subTest(n=n):
+                bookings = self.seed(n)
+                with self.assertNumQueries(self.QUERY_BUDGET):
+                    data = BookingListSerializer(
+                        BookingListSerializer.setup_eager_loading(Booking.objects.all()), many=True,
+                    ).data
+                self.assertEqual(len(data), n)
+
+        by_id = {row['id']: row for row in data}
+        rejected = by_id[str(bookings[0].pk)]
+        self.assertEqual(rejected['rejection_reason'], f'motivo {bookings[0].pk}')
+        self.assertEqual(rejected['package_price'], '5000.00')
+        self.assertEqual(by_id[str(bookings[1].pk)]['extras_with_prices'], [{'name': 'Mesa de dulces', 'price': '800.00'}])
+        self.assertIsNone(by_id[str(bookings[1].pk)]['rejection_reason'])
+
+    def test_rejection_lookup_compares_the_bare_target_id_column(self):
+        sql = str(BookingListSerializer.setup_eager_loading(Booking.objects.all()).query)
+        # No function around the column, so the (action, target_id) index applies.
+        self.assertIn('U0."target_id" = ', sql)
+        self.assertNotIn('REPLACE(U0."target_id"', sql)
+
+
+class EagerLoadingPlanTestCase(BookingFixturesMixin, TestCase):
+    def test_plan_follows_nested_serializers_and_sources(self):
+        from terraza.eager_loading import plan_for
+
+        select, prefetch = plan_for(BookingSerializer)
+
+        self.assertEqual(
+            set(select),
+            {'user', 'user__profile', 'staff', 'staff__profile', 'venue', 'package', 'coupon'},
+        )
+        self.assertEqual(set(prefetch), {'extra_services', 'line_items'})
+
+    def test_staff_list_query_count_does_not_grow_with_page_size(self):
+        staff = User.objects.create_user(email='staff@test.com', first_name='S', last_name='T', password='x')
+        staff.is_staff = True
+        staff.save()
+        client = APIClient()
+        client.force_authenticate(staff)
+        url = reverse('booking-list')
+
+        def list_queries(n):
+            for day in range(Booking.objects.count(), n):
+                self.make_booking(aware(2032, 1, 1, 10) + datetime.timedelta(days=day), aware(2032, 1, 1, 22) + datetime.timedelta(days=day))
+            with CaptureQueriesContext(connection) as ctx:
+                response = client.get(url, {'page_size': 50})
+            self.assertEqual(len(response.data['results']), n)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(list_queries(3), list_queries(30))
+
+    def test_line_item_actions_save_the_fresh_total(self):
+        staff = User.objects.create_user(email='staff@test.com', first_name='S', last_name='T', password='x')
+        staff.is_staff = True
+        staff.save()
+        client = APIClient()
+        client.force_authenticate(staff)
+        booking = self.make_booking(aware(2032, 2, 1, 10), aware(2032, 2, 1, 22))
+        booking.create_line_items()
+        booking.save()
+
+        response = client.post(
+            reverse('booking-add-custom-charge', args=[booking.pk]),
+            {'description': 'Decoración', 'price': 100},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).total_price, Decimal('5100.00'))
+        self.assertEqual(len(response.data['line_items']), 2)
+
+
+class TrackedFieldsTestCase(BookingFixturesMixin, TestCase):
+    def test_previous_values_survive_until_save_returns(self):
+        booking = Booking.objects.get(pk=self.make_booking(aware(2033, 1, 1, 10), aware(2033, 1, 1, 22)).pk)
+        self.assertEqual(booking.changed_fields(), [])
+
+        booking.status = 'apartado'
+        self.assertTrue(booking.has_changed('status'))
+        self.assertEqual(booking.previous('status'), 'solicitud')
+        self.assertEqual(booking.changed_fields(), ['status'])
+
+        booking.save()
+        self.assertFalse(booking.has_changed('status'))
+        self.assertEqual(booking.previous('status'), 'apartado')
+
+    def test_status_change_does_not_reload_the_row(self):
+        booking = Booking.objects.get(pk=self.make_booking(aware(2033, 1, 1, 10), aware(2033, 1, 1, 22)).pk)
+        booking.status = 'aceptacion'
+
+        with CaptureQueriesContext(connection) as ctx:
+            booking.save()
+
+        reloads = [q['sql'] for q in ctx.captured_queries if 'WHERE "booking_booking"."id" =' in q['sql'] and q['sql'].startswith('SELECT')]
+        self.assertEqual(reloads, [])
+        self.assertEqual(status_counts.counts_for()['aceptacion'], 1)
+        self.assertEqual(status_counts.counts_for()['solicitud'], 0)
+
+    def test_update_endpoint_logs_the_previous_state(self):
+        from logs.models import ActivityLog
+
+        booking = self.make_booking(aware(2033, 2, 1, 10), aware(2033, 2, 1, 22))
+        self.user.is_staff = True
+        self.user.save()
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.patch(reverse('booking-detail', args=[booking.pk]), {'status': 'aceptacion'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        log = ActivityLog.objects.filter(action='updated', metadata__booking_id=str(booking.pk)).latest('timestamp')
+        self.assertEqual(log.metadata['old_data']['status'], 'solicitud')
+        self.assertEqual(log.metadata['new_data']['status'], 'aceptacion')
+
+
+class BookingWritePathTestCase(BookingFixturesMixin, TestCase):
+    def create_with_serializer(self, start, end, extras=()):
+        request = APIRequestFactory().post('/')
+        request.user = self.user
+        serializer = BookingCreateSerializer(
+            data={
+                'package_id': self.package.pk,
+                'extra_service_ids': [str(extra.pk) for extra in extras],
+                'start_datetime': start.isoformat(),
+                'end_datetime': end.isoformat(),
+            },
+            context={'request': request, 'venue_id': self.venue.pk},
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_create_inserts_the_final_total_once(self):
+        extras = [
+            ExtraService.objects.create(name='Mesa', price=100),
+            ExtraService.objects.create(name='Silla', price=250),
+        ]
+
+        with CaptureQueriesContext(connection) as ctx:
+            booking = self.create_with_serializer(aware(2034, 1, 1, 10), aware(2034, 1, 1, 22), extras)
+
+        booking_updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "booking_booking" SET "user_id"')]
+        self.assertEqual(booking_updates, [])
+        stored = Booking.objects.get(pk=booking.pk)
+        self.assertEqual(stored.total_price, 5350)
+        self.assertEqual(stored.total_price, sum(item.subtotal for item in stored.line_items.all()))
+        self.assertEqual(sorted(stored.extra_services.values_list('name', flat=True)), ['Mesa', 'Silla'])
+
+    def test_later_saves_total_the_stored_line_items(self):
+        booking = self.create_with_serializer(aware(2034, 1, 2, 10), aware(2034, 1, 2, 22))
+        BookingLineItem.objects.create(booking=booking, item_type='other', description='Decoración', unit_price=100)
+
+        booking.save()
+
+        self.assertEqual(Booking.objects.get(pk=booking.pk).total_price, 5100)
+
+    def test_overlap_check_only_runs_when_the_booking_could_collide(self):
+        booking = Booking.objects.get(pk=self.make_booking(aware(2034, 2, 1, 10), aware(2034, 2, 1, 22)).pk)
+
+        def overlap_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                booking.save()
+            return [
+                q['sql'] for q in ctx.captured_queries
+                if q['sql'].startswith('SELECT 1 AS "a" FROM "booking_booking"') and '"end_datetime" >' in q['sql']
+            ]
+
+        booking.description = 'Sin cambios de fecha'
+        self.assertEqual(overlap_queries(), [])
+        booking.end_datetime = aware(2034, 2, 1, 23)
+        self.assertEqual(len(overlap_queries()), 1)
+        booking.status = 'cancelado'
+        self.assertEqual(overlap_queries(), [])
+        booking.status = 'solicitud'
+        self.assertEqual(len(overlap_queries()), 1)
+
+    def test_moving_onto_an_active_booking_is_still_rejected(self):
+        self.make_booking(aware(2034, 3, 1, 10), aware(2034, 3, 1, 22))
+        other = self.make_booking(aware(2034, 3, 2, 10), aware(2034, 3, 2, 22))
+        other.start_datetime = aware(2034, 3, 1, 12)
+        other.end_datetime = aware(2034, 3, 1, 20)
+        with self.assertRaises(ValidationError):
+            other.save()
+
+    def test_configuration_cache_is_invalidated_on_save(self):
+        cache.delete(CONFIG_CACHE_KEY)
+        config = VenueConfiguration.get_config()
+        cache.set(CONFIG_CACHE_KEY, config)
+
+        with self.assertNumQueries(0):
+            VenueConfiguration.get_config()
+
+        config.minimum_deposit = 1500
+        config.save()
+        self.assertIsNone(cache.get(CONFIG_CACHE_KEY))
+        self.assertEqual(VenueConfiguration.get_config().minimum_deposit, 1500)
+
+    def test_configuration_cache_expires_for_edits_made_elsewhere(self):
+        cache.delete(CONFIG_CACHE_KEY)
+        VenueConfiguration.get_config()
+        # get_config only caches outside transactions; pretend the test isn't in one.
+        with unittest.mock.patch.object(connection, 'in_atomic_block', False):
+            with override_settings(VENUE_CONFIG_CACHE_TTL=60):
+                VenueConfiguration.get_config()
+            self.assertIsNotNone(cache.get(CONFIG_CACHE_KEY))
+            cache.delete(CONFIG_CACHE_KEY)
+            with override_settings(VENUE_CONFIG_CACHE_TTL=0):
+                VenueConfiguration.get_config()
+                # Another process' save: this process' copy isn't invalidated, it expires.
+                VenueConfiguration.objects.filter(pk=1).update(minimum_deposit=2500)
+                self.assertEqual(VenueConfiguration.get_config().minimum_deposit, 2500)
+
+
+class GoogleCalendarSyncTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.calendar = FakeCalendarService()
+        google_calendar.set_service(self.calendar)
+        self.addCleanup(google_calendar.set_service, None)
+
+    def save(self, booking=None, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            if booking is None:
+                return self.make_booking(**fields)
+            for name, value in fields.items():
+                setattr(booking, name, value)
+            booking.save()
+            return booking
+
+    def run_due_jobs(self):
+        Job.objects.filter(status='pending').update(run_at=timezone.now())
+        return queue.run_pending('test-worker')
+
+    def test_saves_are_coalesced_and_dirty_bookings_share_one_batch(self):
+        bookings = [
+            self.save(start=aware(2036, 1, day, 10), end=aware(2036, 1, day, 22))
+            for day in (1, 2, 3)
+        ]
+        self.save(bookings[0], status='aceptacion')
+        self.save(bookings[0], description='Con mariachi')
+
+        self.assertEqual(Job.objects.filter(name='booking.sync_google_calendar', status='pending').count(), 3)
+        queue.run_pending('test-worker')
+        self.assertEqual(self.calendar.calls, [])  # still inside the debounce window
+
+        self.run_due_jobs()
+        self.assertEqual(self.calendar.http_requests, 1)
+        self.assertEqual([method for method, _ in self.calendar.calls], ['insert'] * 3)
+        stored = dict(Booking.objects.values_list('pk', 'google_calendar_event_id'))
+        self.assertEqual(set(stored.values()), set(self.calendar.events_by_id))
+
+        booking = Booking.objects.get(pk=bookings[0].pk)
+        self.save(booking, status='apartado')
+        self.save(booking, advance_paid=1000)
+        self.run_due_jobs()
+        self.assertEqual(self.calendar.http_requests, 2)
+        self.assertEqual(self.calendar.calls[-1], ('patch', booking.google_calendar_event_id))
+        self.assertIn('Apartado', self.calendar.events_by_id[booking.google_calendar_event_id]['description'])
+
+    def test_failed_event_is_retried_without_blocking_the_batch(self):
+        first = self.save(start=aware(2036, 2, 1, 10), end=aware(2036, 2, 1, 22))
+        second = self.save(start=aware(2036, 2, 2, 10), end=aware(2036, 2, 2, 22))
+        self.run_due_jobs()
+        first.refresh_from_db()
+        second.refresh_from_db()
+
+        self.calendar.failing_event_ids.add(first.google_calendar_event_id)
+        self.save(first, description='Cambio 1')
+        self.save(second, description='Cambio 2')
+        self.run_due_jobs()
+
+        jobs = {job.payload['booking_id']: job for job in Job.objects.filter(name='booking.sync_google_calendar', attempts=1).exclude(status='done')}
+        self.assertEqual(list(jobs), [str(first.pk)])
+        self.assertEqual(jobs[str(first.pk)].status, 'pending')
+        self.assertEqual(self.calendar.events_by_id[second.google_calendar_event_id]['description'].splitlines()[-1], 'Notas: Cambio 2')
+
+
+class IncrementalCalendarSyncTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.calendar = FakeCalendarService()
+        google_calendar.set_service(self.calendar)
+        self.addCleanup(google_calendar.set_service, None)
+        self.staff = User.objects.create_user(email='staff@test.com', first_name='Luis', last_name='Pérez')
+        self.staff.is_staff = True
+        self.staff.save()
+        self.bookings = [
+            self.make_booking(aware(2037, 1, day, 10), aware(2037, 1, day, 22))
+            for day in range(1, 21)
+        ]
+
+    def google_edit(self, method, **kwargs):
+        """A change made by someone in the Google Calendar UI."""
+        return getattr(self.calendar.events(), method)(calendarId='primary', **kwargs).execute()
+
+    def test_push_only_sends_changed_event_bodies(self):
+        self.assertEqual(gcal_sync.push_changed()['pushed'], 20)
+        self.assertEqual(self.calendar.http_requests, 1)
+
+        stats = gcal_sync.push_changed()
+        self.assertEqual((stats['pushed'], stats['push_requests']), (0, 0))
+
+        booking = Booking.objects.get(pk=self.bookings[0].pk)
+        booking.description = 'Con mariachi'
+        booking.save()
+        Booking.objects.get(pk=self.bookings[1].pk).save()  # saved, but the event body is unchanged
+        stats = gcal_sync.push_changed()
+        self.assertEqual((stats['pushed'], stats['push_requests']), (1, 1))
+        self.assertEqual(self.calendar.calls[-1], ('patch', booking.google_calendar_event_id))
+
+    def test_pull_costs_api_calls_per_change_and_ignores_echoes(self):
+        gcal_sync.push_changed()
+        stats = gcal_sync.pull()
+        self.assertEqual((stats['changes'], stats['echoes'], stats['pull_requests']), (20, 20, 1))
+        self.assertTrue(CalendarSyncState.objects.get().sync_token)
+
+        moved, deleted = [Booking.objects.get(pk=b.pk) for b in self.bookings[:2]]
+        self.google_edit(
+            'patch', eventId=moved.google_calendar_event_id,
+            body={'start': {'dateTime': aware(2037, 2, 1, 12).isoformat()}, 'end': {'dateTime': aware(2037, 2, 1, 20).isoformat()}},
+        )
+        self.google_edit('delete', eventId=deleted.google_calendar_event_id)
+        self.google_edit('insert', body={
+            'summary': 'Fiesta Gómez', 'description': 'Reservado por teléfono',
+            'start': {'date': '2037-03-01'}, 'end': {'date': '2037-03-02'},
+        })
+        self.calendar.http_requests = 0
+
+        stats = gcal_sync.pull()
+        self.assertEqual(stats['changes'], 3)
+        self.assertEqual(self.calendar.http_requests, 1)
+        self.assertEqual((stats['updated'], stats['unlinked'], stats['created']), (1, 1, 1))
+
+        moved.refresh_from_db()
+        self.assertEqual(moved.start_datetime, aware(2037, 2, 1, 12))
+        created = Booking.objects.get(description__startswith='[GCal]')
+        self.assertEqual(created.description, '[GCal]\nFiesta Gómez\nReservado por teléfono')
+        self.assertEqual(created.user, self.staff)
+
+        self.assertEqual(gcal_sync.pull()['changes'], 0)
+        # Only the unlinked booking goes back: the moved one already matches its event
+        # and the [GCal] booking belongs to Google.
+        stats = gcal_sync.push_changed()
+        self.assertEqual(stats['pushed'], 1)
+        self.assertEqual(self.calendar.calls[-1][0], 'insert')
+
+    def test_full_pull_links_events_imported_before(self):
+        event = self.google_edit('insert', body={
+            'summary': 'Fiesta Gómez', 'start': {'date': '2037-03-01'}, 'end': {'date': '2037-03-02'},
+        })
+        imported = self.make_booking(
+            aware(2037, 3, 1, 10), aware(2037, 3, 1, 22), description='[GCal]\nFiesta Gómez', gcal_uid=event['iCalUID'],
+        )
+
+        for _ in range(2):
+            stats = gcal_sync.pull(full=True)
+            self.assertEqual((stats['created'], stats['conflicts']), (0, 0))
+        self.assertEqual(Booking.objects.filter(description__startswith='[GCal]').count(), 1)
+        imported.refresh_from_db()
+        self.assertEqual(imported.google_calendar_event_id, event['id'])
+
+    def test_expired_sync_token_falls_back_to_a_full_listing(self):
+        gcal_sync.push_changed()
+        gcal_sync.pull()
+        self.calendar.expired_tokens.add(CalendarSyncState.objects.get().sync_token)
+
+        stats = gcal_sync.pull()
+        self.assertEqual((stats['changes'], stats['pull_requests']), (20, 2))
+
+
+ICS_TEMPLATE = """BEGIN:VCALENDAR\r
+VERSION:2.0\r
+{events}END:VCALENDAR\r
+"""
+
+ICS_EVENT = """BEGIN:VEVENT\r
+UID:{uid}\r
+DTSTART;VALUE=DATE:{start}\r
+DTEND;VALUE=DATE:{end}\r
+SUMMARY:{summary}\r
+DESCRIPTION:Anticipo pendiente\\, llamar\r
+  antes del evento\r
+END:VEVENT\r
+"""
+
+
+class ImportGcalTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(email='staff@test.com', first_name='Luis', last_name='Pérez')
+        self.staff.is_staff = True
+        self.staff.save()
+
+    def write_ics(self, events):
+        handle, path = tempfile.mkstemp(suffix='.ics')
+        self.addCleanup(os.remove, path)
+        body = ''.join(
+            ICS_EVENT.format(uid=uid, start=start, end=end, summary=summary)
+            for uid, start, end, summary in events
+        )
+        with os.fdopen(handle, 'w', encoding='utf-8', newline='') as f:
+            f.write(ICS_TEMPLATE.format(events=body))
+        return path
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command('import_gcal', path, '--chunk-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_is_bulk_and_idempotent(self):
+        events = [
+            (f'ev{day}@google.com', f'203801{day:02d}', f'203801{day + 1:02d}', f'Fiesta {day}')
+            for day in range(1, 6)
+        ]
+        path = self.write_ics(events)
+        with CaptureQueriesContext(connection) as ctx:
+            output = self.run_import(path)
+        self.assertIn('Created: 5', output)
+        self.assertIn('rows/s', output)
+        # No per-event slug or conflict lookups, and one booking INSERT per chunk of 2.
+        self.assertFalse([q for q in ctx.captured_queries if 'SELECT 1 AS "a" FROM "booking_booking"' in q['sql']])
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "booking_booking"')]), 3)
+
+        bookings = list(Booking.objects.order_by('start_datetime'))
+        self.assertEqual(len(bookings), 5)
+        first = bookings[0]
+        self.assertEqual(first.gcal_uid, 'ev1@google.com')
+        self.assertEqual(first.google_calendar_event_id, 'ev1')
+        self.assertEqual(first.description, '[GCal]\nFiesta 1\nAnticipo pendiente, llamar antes del evento')
+        self.assertEqual(first.start_datetime, aware(2038, 1, 1, 10))
+        self.assertEqual(first.total_price, 5000)
+        self.assertEqual(len({b.slug for b in bookings}), 5)
+        self.assertEqual(BookingLineItem.objects.count(), 5)
+        self.assertEqual(VenueDayOccupancy.objects.filter(venue=self.venue).count(), 5)
+        self.assertEqual(status_counts.counts_for()['aceptacion'], 5)
+
+        output = self.run_import(path)
+        self.assertIn('Created: 0   Updated: 0   Unchanged: 5', output)
+        self.assertEqual(Booking.objects.count(), 5)
+
+        events[0] = ('ev1@google.com', '20380120', '20380121', 'Fiesta 1 (cambio)')
+        self.run_import(self.write_ics(events))
+        moved = Booking.objects.get(gcal_uid='ev1@google.com')
+        self.assertEqual(moved.start_datetime, aware(2038, 1, 20, 10))
+        self.assertTrue(moved.description.startswith('[GCal]\nFiesta 1 (cambio)'))
+        self.assertEqual(Booking.objects.count(), 5)
+
+    def test_conflicting_events_are_skipped(self):
+        self.make_booking(aware(2038, 2, 1, 12), aware(2038, 2, 1, 18))
+        path = self.write_ics([
+            ('a@google.com', '20380201', '20380202', 'Choca con una reserva'),
+            ('b@google.com', '20380203', '20380204', 'Libre'),
+            ('c@google.com', '20380203', '20380204', 'Choca con el anterior'),
+        ])
+        output = self.run_import(path)
+        self.assertIn('Created: 1', output)
+        self.assertIn('Conflicts: 2', output)
+        self.assertEqual(Booking.objects.filter(gcal_uid__isnull=False).count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        path = self.write_ics([('a@google.com', '20380301', '20380302', 'Prueba')])
+        output = self.run_import(path, '--dry-run')
+        self.assertIn('Created: 1', output)
+        self.assertFalse(Booking.objects.exists())
+
+
+class VenueCalendarFeedTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.first = self.make_booking(aware(2038, 4, 1, 10), aware(2038, 4, 1, 22), status='apartado')
+        self.second = self.make_booking(aware(2038, 4, 5, 10), aware(2038, 4, 5, 22))
+        self.make_booking(aware(2038, 4, 9, 10), aware(2038, 4, 9, 22), status='cancelado')
+        self.url = reverse('venue-calendar-feed', kwargs={'pk': self.venue.pk})
+        self.token = ics_feed.feed_token(self.venue.pk)
+
+    def fetch(self, **headers):
+        return self.client.get(self.url, {'token': self.token}, **headers)
+
+    def test_feed_lists_active_bookings(self):
+        response = self.fetch()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 2)
+        self.assertIn(f'UID:{self.first.pk}@terraza-pineda', body)
+        self.assertIn('DTSTART:20380401T160000Z', body)
+        self.assertIn('SUMMARY:Ana López', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+    def test_requires_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'token': 'nope'}).status_code, 404)
+
+    def test_conditional_and_gzipped(self):
+        response = self.fetch()
+        with self.assertNumQueries(1):
+            cached = self.fetch(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        gzipped = self.fetch(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+
+        self.second.status = 'cancelado'
+        self.second.save()
+        changed = self.fetch(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.content.decode().count('BEGIN:VEVENT'), 1)
+
+    def test_etag_follows_values_saved_outside_the_booking_row(self):
+        etag = self.fetch()['ETag']
+        Booking.objects.filter(pk=self.first.pk).update(total_price=9999)
+        response = self.fetch(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Total: $9999', response.content.decode().replace('\r\n ', ''))
+
+        etag = response['ETag']
+        self.user.phone = '5550001111'
+        self.user.save()
+        response = self.fetch(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Teléfono: 5550001111', response.content.decode().replace('\r\n ', ''))
+
+        etag = response['ETag']
+        self.package.title = 'Premium'
+        self.package.save()
+        self.assertEqual(self.fetch(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_only_changed_events_are_rendered(self):
+        self.fetch()
+        self.second.description = 'Con mariachi'
+        self.second.save()
+        with unittest.mock.patch.object(ics_feed, 'render_vevent', wraps=ics_feed.render_vevent) as render:
+            body = self.fetch().content.decode()
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(render.call_args[0][0]['id'], self.second.pk)
+        self.assertIn('Notas: Con mariachi', body.replace('\r\n ', ''))
+
+    def test_staff_get_the_subscription_url(self):
+        staff = User.objects.create_user(email='staff@test.com', first_name='Luis', last_name='Pérez')
+        staff.is_staff = True
+        staff.save()
+        client = APIClient()
+        client.force_authenticate(staff)
+        response = client.get(f'/api/bookings/venues/{self.venue.pk}/calendar-feed/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['url'].endswith(f'{self.url}?token={self.token}'))
+
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(f'/api/bookings/venues/{self.venue.pk}/calendar-feed/').status_code, 403)
+
+
+class WaitlistMatchingTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.others = [
+            User.objects.create_user(email=f'espera{i}@test.com', first_name='Eva', last_name=f'Ruiz {i}')
+            for i in range(3)
+        ]
+
+    def wish(self, user, day):
+        return BookingWish.objects.create(user=user, venue=self.venue, wished_start_datetime=aware(2038, 5, day, 12))
+
+    def cancel(self, booking):
+        booking.status = 'cancelado'
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        Job.objects.filter(status='pending').update(run_at=timezone.now())
+        queue.run_pending('test')
+
+    def test_wished_date_is_local(self):
+        wish = BookingWish.objects.create(user=self.user, venue=self.venue, wished_start_datetime=aware(2038, 5, 1, 23))
+        self.assertEqual(wish.wished_date, datetime.date(2038, 5, 1))
+
+    def test_cancellation_notifies_every_wish_on_the_freed_days(self):
+        # A two-day event: wishes on either day match, not only the start date.
+        booking = self.make_booking(aware(2038, 5, 1, 10), aware(2038, 5, 2, 22), status='apartado')
+        first, second = self.wish(self.others[0], 1), self.wish(self.others[1], 2)
+        elsewhere = self.wish(self.others[2], 3)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.cancel(booking)
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "booking_notification"')]
+        self.assertEqual(len(inserts), 2)  # the customer's status notification + one bulk insert
+
+        notified = set(BookingWish.objects.filter(notified=True).values_list('pk', flat=True))
+        self.assertEqual(notified, {first.pk, second.pk})
+        self.assertEqual(Notification.objects.filter(type='wishlist').count(), 2)
+        self.assertIn('02/05/2038', Notification.objects.get(user=self.others[1], type='wishlist').message)
+        self.assertFalse(BookingWish.objects.get(pk=elsewhere.pk).notified)
+
+    def test_days_still_taken_are_not_notified(self):
+        booking = self.make_booking(aware(2038, 5, 1, 10), aware(2038, 5, 1, 14), status='apartado')
+        self.make_booking(aware(2038, 5, 1, 16), aware(2038, 5, 1, 22), status='apartado')
+        wish = self.wish(self.others[0], 1)
+        self.cancel(booking)
+        self.assertFalse(BookingWish.objects.get(pk=wish.pk).notified)
+
+    def test_sweep_matches_days_freed_without_a_cancellation(self):
+        booking = self.make_booking(aware(2038, 5, 1, 10), aware(2038, 5, 1, 22), status='apartado')
+        waiting = self.wish(self.others[0], 1)
+        self.assertEqual(waitlist.sweep(), 0)
+
+        booking.delete()
+        self.assertEqual(waitlist.sweep(), 1)
+        self.assertTrue(BookingWish.objects.get(pk=waiting.pk).notified)
+        self.assertEqual(waitlist.sweep(), 0)
+
+
+class StaffNewBookingAlertsTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.staff = []
+        for i in range(3):
+            member = User.objects.create_user(email=f'staff{i}@test.com', first_name='Luis', last_name=f'Pérez {i}')
+            member.is_staff = True
+            member.save()
+            self.staff.append(member)
+
+    def create_bookings(self, count):
+        for day in range(1, count + 1):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.make_booking(aware(2038, 6, day, 10), aware(2038, 6, day, 22))
+        Job.objects.filter(status='pending').exclude(name='booking.notify_staff_new_booking').delete()
+
+    def test_fan_out_is_one_bulk_insert_per_batch(self):
+        self.create_bookings(8)
+        with CaptureQueriesContext(connection) as ctx:
+            queue.run_pending('test', limit=20)
+        staff_lookups = [q for q in ctx.captured_queries if 'FROM "users_useraccount" WHERE' in q['sql']]
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "booking_notification"')]
+        self.assertEqual((len(staff_lookups), len(inserts)), (1, 1))
+        self.assertEqual(Notification.objects.filter(type='new_booking_staff').count(), 24)
+        self.assertEqual(Notification.objects.filter(type='new_booking_staff', user=self.staff[0]).count(), 8)
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(STAFF_NEW_BOOKING_DIGEST=True)
+    def test_digest_email_per_staff_member(self):
+        self.create_bookings(2)
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.run_pending('test', limit=20)
+        self.assertEqual(Job.objects.filter(name='users.drain_outbox', status='pending').count(), 1)
+        self.assertEqual(mail.outbox, [])
+        outbox.drain(sleep=lambda seconds: None)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].subject, '2 nuevas solicitudes de reserva - Terraza Pineda')
+        self.assertIn('01/06/2038', mail.outbox[0].body)
+        self.assertIn('02/06/2038', mail.outbox[0].body)
+
+
+class UnreadNotificationCountTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.other = User.objects.create_user(email='otro@test.com', first_name='Eva', last_name='Ruiz')
+
+    def notify(self, user=None, **kwargs):
+        return Notification.objects.create(user=user or self.user, message='Hola', **kwargs)
+
+    def test_counter_follows_creates_reads_and_deletes(self):
+        first = self.notify()
+        self.notify()
+        self.notify(read=True)
+        Notification.objects.bulk_create([
+            Notification(user=self.user, message='Lote'),
+            Notification(user=self.other, message='Lote'),
+            Notification(user=self.other, message='Lote', read=True),
+        ])
+        self.assertEqual(unread.state_for(self.user)[0], 3)
+        self.assertEqual(unread.state_for(self.other)[0], 1)
+
+        first.read = True
+        first.save()
+        self.assertEqual(unread.state_for(self.user)[0], 2)
+        response = self.client.patch(f'/api/bookings/notifications/{first.pk}/', {'read': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(unread.state_for(self.user)[0], 3)
+        self.client.delete(f'/api/bookings/notifications/{first.pk}/')
+        self.assertEqual(unread.state_for(self.user)[0], 2)
+
+        self.client.post('/api/bookings/notifications/mark_all_read/')
+        self.assertEqual(unread.state_for(self.user)[0], 0)
+        self.assertEqual(unread.state_for(self.other)[0], 1)
+
+    def test_booking_notifications_are_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.make_booking(aware(2038, 7, 1, 10), aware(2038, 7, 1, 22))
+        booking.status = 'aceptacion'
+        booking.save()
+        self.assertEqual(unread.state_for(self.user)[0], Notification.objects.filter(user=self.user, read=False).count())
+        self.assertEqual(unread.state_for(self.user)[0], 2)
+
+    def test_unread_count_is_a_single_row_read(self):
+        self.notify()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/bookings/notifications/unread_count/')
+        self.assertEqual(response.data, {'unread': 1, 'version': 1})
+
+    @override_settings(NOTIFICATIONS_LONG_POLL_TIMEOUT=1, NOTIFICATIONS_LONG_POLL_INTERVAL=0.01)
+    def test_wait_returns_on_change_or_timeout(self):
+        self.notify()
+        count, version = unread.state_for(self.user)
+        response = self.client.get('/api/bookings/notifications/wait/', {'version': version - 1})
+        self.assertEqual(response.data, {'unread': 1, 'version': version, 'changed': True})
+
+        response = self.client.get('/api/bookings/notifications/wait/', {'version': version, 'timeout': 0.05})
+        self.assertEqual(response.data, {'unread': 1, 'version': version, 'changed': False})
+
+    def test_wait_does_not_block_unless_enabled_and_asked(self):
+        self.notify()
+        count, version = unread.state_for(self.user)
+        with override_settings(NOTIFICATIONS_LONG_POLL_TIMEOUT=5):
+            with self.assertNumQueries(1):
+                self.client.get('/api/bookings/notifications/wait/', {'version': version})
+        # Disabled by default: ?timeout= is capped at 0.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/bookings/notifications/wait/', {'version': version, 'timeout': 5})
+        self.assertEqual(response.data['changed'], False)
+
+    def test_reconcile_repairs_drift(self):
+        self.notify()
+        self.notify(user=self.other)
+        UnreadNotificationCount.objects.filter(user=self.user).update(count=7)
+        UnreadNotificationCount.objects.filter(user=self.other).delete()
+        self.assertEqual(unread.reconcile(), 2)
+        self.assertEqual(unread.state_for(self.user)[0], 1)
+        self.assertEqual(unread.state_for(self.other)[0], 1)
+
+    def test_deleting_a_user_drops_the_counter(self):
+        self.notify(user=self.other)
+        self.other.delete()
+        self.assertFalse(UnreadNotificationCount.objects.filter(user_id=self.other.pk).exists())
+
+
+class BookingFullTextSearchTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(email='staff@test.com', first_name='Luis', last_name='Pérez')
+        self.staff.is_staff = True
+        self.staff.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.wedding = self.make_booking(aware(2034, 3, 1, 10), aware(2034, 3, 1, 22), description='Boda de Carla y Jorge')
+        self.birthday = self.make_booking(aware(2034, 3, 2, 10), aware(2034, 3, 2, 22), description='Cumpleaños infantil')
+        other = User.objects.create_user(email='pedro@test.com', first_name='Pedro', last_name='Ramírez')
+        self.other = Booking.objects.create(
+            user=other, venue=self.venue, package=self.package,
+            start_datetime=aware(2034, 3, 3, 10), end_datetime=aware(2034, 3, 3, 22), description='',
+        )
+
+    def search(self, text):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('booking-list'), {'search': text})
+        self.assertEqual(response.status_code, 200)
+        self.queries = [q['sql'] for q in ctx.captured_queries]
+        return {row['id'] for row in response.data['results']}
+
+    def ids(self, *bookings):
+        return {str(booking.pk) for booking in bookings}
+
+    def test_description_words_match_through_the_index(self):
+        self.assertEqual(self.search('boda carla'), self.ids(self.wedding))
+        self.assertEqual(self.search('cumpleaños'), self.ids(self.birthday))
+        self.assertFalse([sql for sql in self.queries if '"booking_booking"."description" LIKE' in sql])
+
+    def test_customer_fields_are_searched_on_the_user_table(self):
+        self.assertEqual(self.search('Ramírez'), self.ids(self.other))
+        self.assertEqual(self.search('cliente@test'), self.ids(self.wedding, self.birthday))
+
+    def test_edited_descriptions_are_reindexed(self):
+        self.birthday.description = 'Bautizo'
+        self.birthday.save()
+        self.assertEqual(self.search('cumpleaños'), set())
+        self.assertEqual(self.search('bautizo'), self.ids(self.birthday))
+        self.birthday.delete()
+        self.assertEqual(self.search('bautizo'), set())
+
+    def test_each_term_may_match_a_different_field(self):
+        self.assertEqual(self.search('ana boda'), self.ids(self.wedding))
+        self.assertEqual(self.search('pedro boda'), set())
+
+    def test_words_match_as_prefixes(self):
+        self.assertEqual(self.search('cumple'), self.ids(self.birthday))
+        self.assertEqual(self.search('bod car'), self.ids(self.wedding))
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'PostgreSQL tsquery')
+    def test_postgresql_prefixes_and_stemming(self):
+        self.assertEqual(self.search('cumple'), self.ids(self.birthday))
+        self.assertEqual(self.search('bodas'), self.ids(self.wedding))
+        self.assertEqual(self.search('boda & !carla'), self.ids(self.wedding))
+        self.assertTrue([sql for sql in self.queries if 'to_tsquery' in sql])
+
+
+class BookingKeysetPaginationTestCase(BookingFixturesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user(email='staff@test.com', first_name='Ana', last_name='Ruiz')
+        self.staff.is_staff = True
+        self.staff.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+        self.bookings = [
+            self.make_booking(aware(2034, 3, day, 10), aware(2034, 3, day, 22)) for day in (4, 1, 3, 2, 5)
+        ]
+
+    def test_cursor_pages_follow_start_datetime(self):
+        response = self.client.get(reverse('booking-list'), {'cursor': '', 'page_size': 2})
+        seen = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        expected = sorted(self.bookings, key=lambda booking: booking.start_datetime)
+        self.assertEqual(seen, [str(booking.pk) for booking in expected])
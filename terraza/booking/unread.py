@@ -0,0 +1,105 @@
+"""
+Per-user unread notification counters (``UnreadNotificationCount``).
+
+Signals in booking/signals.py apply +1/-1 deltas when a notification is
+created, read, marked unread or deleted; ``Notification.objects.bulk_create``
+applies one delta per user for the whole batch, and ``mark_all_read`` resets
+the counter along with the rows. Deltas are ``F()`` updates, so concurrent
+writers never lose increments. Every change also bumps ``version``, which the
+long-poll endpoint watches.
+
+Badge requests read a single row (``state_for``) instead of counting or
+paginating notifications.
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+
+def _bump(user_id, delta):
+    from .models import UnreadNotificationCount
+
+    updated = UnreadNotificationCount.objects.filter(user_id=user_id).update(
+        count=F('count') + delta, version=F('version') + 1,
+    )
+    if not updated:
+        if delta < 0:
+            # No row to decrement: the user (and its counter) is being deleted.
+            return
+        counter, created = UnreadNotificationCount.objects.get_or_create(
+            user_id=user_id, defaults={'count': delta, 'version': 1},
+        )
+        if not created:
+            UnreadNotificationCount.objects.filter(pk=counter.pk).update(
+                count=F('count') + delta, version=F('version') + 1,
+            )
+
+
+def apply_deltas(deltas):
+    """Apply {user_id: delta}; zero deltas are skipped."""
+    with transaction.atomic():
+        for user_id, delta in sorted(deltas.items()):
+            if delta:
+                _bump(user_id, delta)
+
+
+def apply_created(notifications):
+    apply_deltas(Counter(n.user_id for n in notifications if not n.read))
+
+
+def apply_change(old_user_id, old_read, new_user_id, new_read):
+    """Move one notification between (user, read) states; None user means absent."""
+    deltas = Counter()
+    if old_user_id is not None and not old_read:
+        deltas[old_user_id] -= 1
+    if new_user_id is not None and not new_read:
+        deltas[new_user_id] += 1
+    apply_deltas(deltas)
+
+
+def mark_all_read(user):
+    """Mark every notification of ``user`` read and zero the counter. Returns rows updated."""
+    from .models import Notification, UnreadNotificationCount
+
+    with transaction.atomic():
+        updated = Notification.objects.filter(user=user, read=False).update(read=True)
+        if updated:
+            UnreadNotificationCount.objects.filter(user=user).update(count=0, version=F('version') + 1)
+    return updated
+
+
+def state_for(user):
+    """(count, version) of the user's unread notifications: one primary-key read."""
+    from .models import UnreadNotificationCount
+
+    row = UnreadNotificationCount.objects.filter(user=user).values_list('count', 'version').first()
+    return row or (0, 0)
+
+
+def reconcile():
+    """Recompute every counter from Notification; returns the number of rows written."""
+    from .models import Notification, UnreadNotificationCount
+
+    with transaction.atomic():
+        totals = dict(
+            Notification.objects.order_by().values_list('user_id')
+            .annotate(total=Count('id', filter=Q(read=False)))
+        )
+        existing = {row.user_id: row for row in UnreadNotificationCount.objects.select_for_update()}
+        to_create, to_update = [], []
+        for user_id, total in totals.items():
+            row = existing.pop(user_id, None)
+            if row is None:
+                to_create.append(UnreadNotificationCount(user_id=user_id, count=total, version=1))
+            elif row.count != total:
+                row.count, row.version = total, row.version + 1
+                to_update.append(row)
+        for row in existing.values():
+            if row.count:
+                row.count, row.version = 0, row.version + 1
+                to_update.append(row)
+        UnreadNotificationCount.objects.bulk_create(to_create, batch_size=500)
+        UnreadNotificationCount.objects.bulk_update(to_update, ['count', 'version'], batch_size=500)
+    return len(to_create) + len(to_update)
@@ -11,6 +11,7 @@ from .views import (
     NotificationViewSet,
     ReviewViewSet,
     VenueConfigurationView,
+    venue_calendar_feed,
 )
 
 router = SimpleRouter()
@@ -27,4 +28,5 @@ urlpatterns = [
     path('status-counts/', BookingStatusCountsView.as_view(), name='booking-status-counts'),
     path('booked-dates/', BookedDatesView.as_view(), name='booked-dates'),
     path('configuration/', VenueConfigurationView.as_view(), name='venue-configuration'),
+    path('venues/<int:pk>/calendar.ics', venue_calendar_feed, name='venue-calendar-feed'),
 ]
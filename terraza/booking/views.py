@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db.utils import IntegrityError
 from rest_framework import viewsets, permissions
 from django_filters.rest_framework import DjangoFilterBackend
@@ -5,20 +6,36 @@ from rest_framework import filters as drf_filters
 from rest_framework.views import APIView, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
 from django.utils import timezone
 from rest_framework.decorators import action
-
-
-class BookingPagination(PageNumberPagination):
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
+import datetime
+import hashlib
+import time
+
+from terraza.pagination import KeysetPagination
+
+
+class BookingPagination(KeysetPagination):
+    ordering_field = 'start_datetime'
+    default_ordering = 'start_datetime'
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 500
 
 from .filters import BookingFilter
-from .models import Booking, ExtraService, Venue, Package, BookingWish, Notification, Review, VenueConfiguration
+from .models import Booking, ExtraService, Venue, Package, BookingWish, Notification, Review, VenueConfiguration, VenueDayOccupancy
 from .serializers import BookingSerializer, ExtraServiceSerializer, PackageSerializer, VenueSerializer, BookingCreateSerializer, BookingUpdateSerializer, BookingWishSerializer, NotificationSerializer, ReviewSerializer, VenueConfigurationSerializer
-from .serializers import BookingListSerializer
+from .serializers import BookingListSerializer, AvailabilityCheckSerializer
+from terraza.eager_loading import EagerLoadingMixin
+from terraza.search import FullTextSearchFilter
 
 # Import logging utilities
 try:
@@ -40,14 +57,15 @@ class IsOwnerOrStaff(permissions.BasePermission):
         # Users can only view/edit their own bookings
         return obj.user == request.user
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
+    queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     pagination_class = BookingPagination
 
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrStaff]
     filter_backends = [
         DjangoFilterBackend,
-        drf_filters.SearchFilter,
+        FullTextSearchFilter,
         drf_filters.OrderingFilter,
     ]
     filterset_class = BookingFilter
@@ -58,9 +76,10 @@ class BookingViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         user = self.request.user
+        qs = super().get_queryset()
         if user.is_staff:
-            return Booking.objects.all()
-        return Booking.objects.filter(user=user)
+            return qs
+        return qs.filter(user=user)
 
     def perform_create(self, serializer):
         # The BookingCreateSerializer already handles user assignment
@@ -79,13 +98,14 @@ class BookingViewSet(viewsets.ModelViewSet):
             print(f"Failed to log booking creation: {e}")
 
     def perform_update(self, serializer):
-        # Store old instance data before updating
-        old_instance = self.get_object()
+        # Capture the state loaded by get_object() before the serializer mutates it;
+        # package, venue and extras come eager-loaded (BookingUpdateSerializer.setup_eager_loading).
+        old_instance = serializer.instance
         old_data = {
-            'status': old_instance.status,
+            'status': old_instance.previous('status'),
             'package': old_instance.package,
-            'start_datetime': old_instance.start_datetime,
-            'end_datetime': old_instance.end_datetime,
+            'start_datetime': old_instance.previous('start_datetime'),
+            'end_datetime': old_instance.previous('end_datetime'),
             'total_price': old_instance.total_price,
             'advance_paid': old_instance.advance_paid,
             'description': old_instance.description,
@@ -316,10 +336,7 @@ class BookingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    SHAREABLE_STATUSES = {
-        'aceptacion', 'apartado', 'liquidado',
-        'liquidado_entregado', 'entregado', 'finalizado',
-    }
+    SHAREABLE_STATUSES = Booking.SHAREABLE_STATUSES
 
     @action(detail=True, methods=['get'], url_path='share-card/confirmation')
     def share_card_confirmation(self, request, pk=None):
@@ -330,8 +347,9 @@ class BookingViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         try:
-            from .share_cards import generate_confirmation_card
-            url = generate_confirmation_card(booking)
+            from .share_cards import existing_card_url, generate_confirmation_card
+            # Normally pre-rendered by the booking.render_share_card job.
+            url = existing_card_url(booking.id, 'confirmation.png') or generate_confirmation_card(booking)
             if not url.startswith('http'):
                 url = request.build_absolute_uri(url)
             return Response({'url': url})
@@ -490,6 +508,59 @@ class BookingViewSet(viewsets.ModelViewSet):
             'label': coupon.label(),
         })
 
+    @action(detail=False, methods=['post'], url_path='check_availability', permission_classes=[permissions.AllowAny])
+    def check_availability(self, request):
+        """Answer many candidate (venue, start, end) ranges with one range query.
+
+        Body: {"ranges": [{"venue": 1, "start_datetime": ..., "end_datetime": ...,
+        "exclude_booking_id": optional}, ...]} (up to AvailabilityCheckSerializer.MAX_RANGES).
+        Staff also get the ids of the conflicting bookings.
+        """
+        from . import availability
+
+        serializer = AvailabilityCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ranges = serializer.validated_data['ranges']
+
+        rows = Booking.objects.filter(
+            venue_id__in={r['venue'] for r in ranges},
+            status__in=availability.ACTIVE_STATUSES,
+            start_datetime__lt=max(r['end_datetime'] for r in ranges),
+            end_datetime__gt=min(r['start_datetime'] for r in ranges),
+        ).values_list('id', 'venue_id', 'start_datetime', 'end_datetime')
+
+        bookings_by_venue = {}
+        for booking_id, venue_id, start, end in rows:
+            bookings_by_venue.setdefault(venue_id, []).append((str(booking_id), start, end))
+
+        positions_by_venue = {}
+        for position, r in enumerate(ranges):
+            positions_by_venue.setdefault(r['venue'], []).append(position)
+
+        conflicts = [None] * len(ranges)
+        for venue_id, positions in positions_by_venue.items():
+            matches = availability.sweep_overlaps(
+                bookings_by_venue.get(venue_id, []),
+                [(ranges[p]['start_datetime'], ranges[p]['end_datetime']) for p in positions],
+            )
+            for position, booking_ids in zip(positions, matches):
+                exclude = ranges[position].get('exclude_booking_id')
+                conflicts[position] = [b for b in booking_ids if b != (str(exclude) if exclude else None)]
+
+        is_staff = request.user.is_authenticated and request.user.is_staff
+        results = []
+        for r, booking_ids in zip(ranges, conflicts):
+            item = {
+                'venue': r['venue'],
+                'start_datetime': r['start_datetime'],
+                'end_datetime': r['end_datetime'],
+                'available': not booking_ids,
+            }
+            if is_staff:
+                item['conflicting_booking_ids'] = booking_ids
+            results.append(item)
+        return Response({'results': results})
+
     @action(detail=True, methods=['post'], url_path='apply_coupon')
     def apply_coupon(self, request, pk=None):
         from .models import Coupon, BookingLineItem
@@ -640,6 +711,54 @@ class VenueViewSet(viewsets.ModelViewSet):
     queryset = Venue.objects.all()
     serializer_class = VenueSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    @action(detail=True, methods=['get'], url_path='calendar-feed', permission_classes=[permissions.IsAdminUser])
+    def calendar_feed(self, request, pk=None):
+        """Subscription URL of the venue's .ics feed (staff only)."""
+        from . import ics_feed
+
+        venue = self.get_object()
+        url = reverse('venue-calendar-feed', kwargs={'pk': venue.pk})
+        return Response({'url': request.build_absolute_uri(f"{url}?token={ics_feed.feed_token(venue.pk)}")})
+
+
+def _feed_state(request, pk):
+    """Shared by the ETag callback and the view: one query per request."""
+    from . import ics_feed
+
+    if not hasattr(request, '_ics_feed_state'):
+        state = None
+        if ics_feed.check_token(pk, request.GET.get('token')):
+            state = ics_feed.feed_state(pk)
+        request._ics_feed_state = state
+    return request._ics_feed_state
+
+
+def _feed_etag(request, pk):
+    state = _feed_state(request, pk)
+    return state[0] if state else None
+
+
+@gzip_page
+@condition(etag_func=_feed_etag)
+def venue_calendar_feed(request, pk):
+    """iCalendar feed of the venue's active bookings, for calendar subscriptions.
+
+    Calendar apps poll without credentials, so access is granted by the
+    signed ``token`` query parameter (see ics_feed.feed_token).
+    """
+    from . import ics_feed
+
+    state = _feed_state(request, pk)
+    venue = Venue.objects.filter(pk=pk).first()
+    if state is None or venue is None:
+        raise Http404
+    etag, rows = state
+    response = HttpResponse(ics_feed.cached_feed(venue, etag, rows), content_type='text/calendar; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    response['Content-Disposition'] = f'inline; filename="{venue.slug or "reservas"}.ics"'
+    return response
+
     
 from rest_framework import viewsets, permissions
 from .models import Package, ExtraService
@@ -665,19 +784,23 @@ class BookingStatusCountsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
+        from . import status_counts
+
         user = request.user
         # Only show the user's own bookings unless staff
-        if user.is_staff:
-            qs = Booking.objects.all()
-        else:
-            qs = Booking.objects.filter(user=user)
-        status_counts = {status[0]: 0 for status in Booking.STATUS_CHOICES}
-        for status, _ in Booking.STATUS_CHOICES:
-            status_counts[status] = qs.filter(status=status).count()
-        return Response(status_counts)
+        return Response(status_counts.counts_for(None if user.is_staff else user))
 
 class BookedDatesView(APIView):
+    """Booked days per venue for the public calendar.
+
+    Reads the materialized ``VenueDayOccupancy`` rows. Optional ``from``/``to``
+    (YYYY-MM-DD) limit the window. Responses carry an ETag derived from the
+    latest ``updated_at`` and row count per venue, so the frontend can
+    revalidate with If-None-Match and get a 304 when nothing moved.
+    """
     permission_classes = [permissions.AllowAny]
+    HIDDEN_STATUSES = ['cancelado', 'rechazado', 'finalizado']
+    CACHE_TIMEOUT = 60 * 10
 
     def get(self, request, *args, **kwargs):
         from rest_framework_simplejwt.authentication import JWTAuthentication
@@ -690,59 +813,72 @@ class BookedDatesView(APIView):
         except Exception:
             pass
 
-        is_staff = auth_user and auth_user.is_staff
+        is_staff = bool(auth_user and auth_user.is_staff)
+
+        try:
+            window_from = self._parse_date(request.query_params.get('from'))
+            window_to = self._parse_date(request.query_params.get('to'))
+        except ValueError:
+            return Response({'detail': 'Formato de fecha inválido. Usa YYYY-MM-DD.'}, status=400)
 
         venue_id = request.query_params.get('venue')
-        qs = Booking.objects.exclude(status__in=['cancelado', 'rechazado', 'finalizado']).select_related('user')
+        qs = VenueDayOccupancy.objects.all()
         if venue_id:
             qs = qs.filter(venue_id=venue_id)
+        if window_from:
+            qs = qs.filter(date__gte=window_from)
+        if window_to:
+            qs = qs.filter(date__lte=window_to)
+
+        etag = self._etag(qs, is_staff, venue_id, window_from, window_to)
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cache_key = 'booked-dates:' + etag.strip('"')
+            booked = cache.get(cache_key)
+            if booked is None:
+                booked = self._build(qs, is_staff)
+                cache.set(cache_key, booked, self.CACHE_TIMEOUT)
+            response = Response(booked)
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        return datetime.date.fromisoformat(value)
+
+    def _etag(self, qs, is_staff, venue_id, window_from, window_to):
+        fingerprint = list(
+            qs.order_by().values('venue_id')
+            .annotate(last_modified=Max('updated_at'), total=Count('id'))
+            .order_by('venue_id')
+            .values_list('venue_id', 'last_modified', 'total')
+        )
+        role = 'staff' if is_staff else 'public'
+        raw = f"{role}|{venue_id}|{window_from}|{window_to}|{fingerprint}"
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
 
-        import datetime as dt
+    def _build(self, qs, is_staff):
         booked = []
-        for booking in qs:
-            local_start = timezone.localtime(booking.start_datetime)
-            local_end   = timezone.localtime(booking.end_datetime)
-            start_date  = local_start.date()
-            end_date    = local_end.date()
-            user_initials = self._get_initials(booking.user)
-            booking_id    = str(booking.id) if is_staff else None
-            label         = self._get_label(booking) if is_staff else None
-
-            current = start_date
-            while current <= end_date:
-                item = {'date': current.isoformat(), 'user_initials': user_initials}
+        for day, bookings in qs.order_by('date', 'venue_id').values_list('date', 'bookings'):
+            for entry in bookings:
+                if entry['status'] in self.HIDDEN_STATUSES:
+                    continue
+                item = {'date': day.isoformat(), 'user_initials': entry['initials']}
                 if is_staff:
-                    item['booking_id'] = booking_id
-                    item['label'] = label
+                    item['booking_id'] = entry['booking_id']
+                    item['label'] = entry['label']
                 booked.append(item)
-                current += dt.timedelta(days=1)
-
-        return Response(booked)
-
-    def _get_initials(self, user):
-        if user.first_name and user.last_name:
-            return f"{user.first_name[0]}{user.last_name[0]}".upper()
-        if user.first_name:
-            return user.first_name[0].upper()
-        if user.last_name:
-            return user.last_name[0].upper()
-        return "?"
-
-    def _get_label(self, booking):
-        if booking.description and booking.description.startswith('[GCal]\n'):
-            lines = booking.description.split('\n', 2)
-            return lines[1].strip() if len(lines) > 1 else 'Sin nombre'
-        name = f"{booking.user.first_name} {booking.user.last_name}".strip()
-        if name:
-            return name
-        if booking.description:
-            return booking.description[:40]
-        return 'Sin nombre'
+        return booked
 
 
 # Removed redundant views - BookedDatesView already handles availability
 
-class BookingWishViewSet(viewsets.ModelViewSet):
+class BookingWishViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = BookingWish.objects.all()
     serializer_class = BookingWishSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -750,8 +886,7 @@ class BookingWishViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         # Users see only their own wishes unless staff, and only from today onward
         user = self.request.user
-        today = timezone.now().date()
-        qs = BookingWish.objects.filter(wished_start_datetime__date__gte=today)
+        qs = super().get_queryset().filter(wished_date__gte=timezone.localdate())
         if user.is_staff:
             return qs
         return qs.filter(user=user)
@@ -759,31 +894,77 @@ class BookingWishViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
+    queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return super().get_queryset().filter(user=self.request.user).order_by('-created_at')
 
     def perform_update(self, serializer):
         serializer.save()
 
     @action(detail=False, methods=['post'], url_path='mark_all_read')
     def mark_all_read(self, request):
-        updated = Notification.objects.filter(user=request.user, read=False).update(read=True)
-        return Response({'marked_read': updated})
+        from . import unread
+
+        return Response({'marked_read': unread.mark_all_read(request.user)})
+
+    @action(detail=False, methods=['get'], url_path='unread_count')
+    def unread_count(self, request):
+        """Badge count: one row read of the denormalized counter."""
+        from . import unread
+
+        count, version = unread.state_for(request.user)
+        response = Response({'unread': count, 'version': version})
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    @action(detail=False, methods=['get'], url_path='wait')
+    def wait(self, request):
+        """Long poll: answer once the counter's version differs from ``?version=``.
+
+        Opt-in: without ``?timeout=`` it answers right away, like ``unread_count``
+        (the badge path clients should use by default). With it, re-reads the
+        counter every NOTIFICATIONS_LONG_POLL_INTERVAL seconds for up to that
+        many seconds, capped at NOTIFICATIONS_LONG_POLL_TIMEOUT (0, no blocking,
+        unless the deployment enables it; see settings), and answers with
+        ``changed: false`` when nothing moved.
+        """
+        from . import unread
+
+        max_timeout = settings.NOTIFICATIONS_LONG_POLL_TIMEOUT
+        try:
+            known = int(request.query_params['version'])
+        except (KeyError, ValueError):
+            known = None
+        try:
+            timeout = min(max(float(request.query_params.get('timeout', 0)), 0), max_timeout)
+        except ValueError:
+            return Response({'detail': 'timeout inválido.'}, status=400)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+        deadline = time.monotonic() + timeout
+        count, version = unread.state_for(request.user)
+        while version == known and time.monotonic() < deadline:
+            time.sleep(min(settings.NOTIFICATIONS_LONG_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+            count, version = unread.state_for(request.user)
+
+        response = Response({'unread': count, 'version': version, 'changed': version != known})
+        response['Cache-Control'] = 'no-store'
+        return response
+
+class ReviewViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
+        qs = super().get_queryset()
         if user.is_staff:
-            return Review.objects.all()
-        return Review.objects.filter(user=user)
+            return qs
+        return qs.filter(user=user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -0,0 +1,75 @@
+"""
+Set-based matching of waitlist wishes (``BookingWish``) against free days.
+
+A wish asks for one local date of a venue (``wished_date``). When a booking is
+cancelled or rejected, ``notify_freed`` looks at every pending wish on the
+dates that booking used to occupy; the periodic sweep (``sweep``, run by the
+``booking.sweep_waitlist`` job and the ``sweep_waitlist`` command) looks at
+every pending wish from today on, catching days freed by moves, deletions or
+imports that never went through the cancellation path.
+
+Either way a wish is only notified once its date no longer appears in the
+occupancy table, and all matches are written with one ``bulk_create`` of
+notifications and one ``update()`` of the wishes.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import ACTIVE_STATUSES
+from .occupancy import occupied_dates
+
+
+def _message(day, venue_name):
+    return (
+        f"¡Buenas noticias! El {day.strftime('%d/%m/%Y')} en {venue_name} "
+        f"está disponible nuevamente. ¡Reserva antes de que se ocupe!"
+    )
+
+
+def notify_available(wishes):
+    """Notify the pending wishes of ``wishes`` whose date is free. Returns how many."""
+    from .models import BookingWish, Notification
+
+    with transaction.atomic():
+        rows = list(
+            wishes.filter(notified=False)
+            .select_for_update(of=('self',))
+            .values_list('id', 'user_id', 'venue_id', 'wished_date', 'venue__name')
+        )
+        by_venue = {}
+        for row in rows:
+            by_venue.setdefault(row[2], []).append(row)
+
+        matched = []
+        for venue_id, venue_rows in by_venue.items():
+            dates = [row[3] for row in venue_rows]
+            busy = occupied_dates(venue_id, min(dates), max(dates), ACTIVE_STATUSES)
+            matched.extend(row for row in venue_rows if row[3] not in busy)
+        if not matched:
+            return 0
+
+        Notification.objects.bulk_create([
+            Notification(user_id=user_id, message=_message(day, venue_name), booking=None, type='wishlist')
+            for _, user_id, _, day, venue_name in matched
+        ])
+        BookingWish.objects.filter(pk__in=[row[0] for row in matched]).update(notified=True)
+    return len(matched)
+
+
+def notify_freed(venue_id, first_date, last_date):
+    """Notify the wishes on the days [first_date, last_date] a booking released."""
+    from .models import BookingWish
+
+    return notify_available(BookingWish.objects.filter(
+        venue_id=venue_id,
+        wished_date__gte=max(first_date, timezone.localdate()),
+        wished_date__lte=last_date,
+    ))
+
+
+def sweep():
+    """Notify every pending wish, from today on, whose date is free."""
+    from .models import BookingWish
+
+    return notify_available(BookingWish.objects.filter(wished_date__gte=timezone.localdate()))
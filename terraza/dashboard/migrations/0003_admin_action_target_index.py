@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_alter_adminaction_action'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adminaction',
+            index=models.Index(fields=['action', 'target_id', 'created_at'], name='dashboard_a_action_fcc033_idx'),
+        ),
+    ]
@@ -51,6 +51,10 @@ class AdminAction(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Latest action on an object (booking rejection notes in BookingListSerializer).
+            models.Index(fields=['action', 'target_id', 'created_at']),
+        ]
     
     def __str__(self):
         return f"{self.admin_user.email} - {self.action} at {self.created_at}"
@@ -18,10 +18,11 @@ from .serializers import (
     PendingCashTransferPaymentSerializer,
     DailyCardsSerializer
 )
-from booking.models import Booking
+from booking.models import Booking, VenueDayOccupancy
 from store.models import PaymentOrder, Payment
 from users.models import UserAccount as User
 from logs.utils import log_payment_activity, log_booking_activity
+from terraza.eager_loading import EagerLoadingMixin
 
 # Create your views here.
 
@@ -301,16 +302,34 @@ class DashboardViewSet(viewsets.ViewSet):
         days_since_monday = target_date.weekday()  # Monday is 0, Sunday is 6
         monday_date = target_date - timedelta(days=days_since_monday)
         
+        # One indexed scan over the materialized occupancy rows for the whole week,
+        # then a single fetch of the bookings they reference.
+        card_statuses = ['solicitud', 'aceptacion', 'apartado', 'liquidado', 'liquidado_entregado', 'entregado', 'finalizado']
+        week_rows = VenueDayOccupancy.objects.filter(
+            date__range=(monday_date, monday_date + timedelta(days=6))
+        ).values_list('date', 'bookings')
+        ids_by_date = {}
+        for day, entries in week_rows:
+            ids_by_date.setdefault(day, []).extend(
+                entry['booking_id'] for entry in entries if entry['status'] in card_statuses
+            )
+        week_bookings = {
+            str(booking.id): booking
+            for booking in Booking.objects.filter(
+                id__in={booking_id for ids in ids_by_date.values() for booking_id in ids}
+            ).select_related('user', 'package')
+        }
+
         for i in range(7):
             card_date = monday_date + timedelta(days=i)
             day_name = spanish_days[i]
             day_number = card_date.day
             
-            # Get bookings for this specific day (all non-cancelled/rejected statuses)
-            day_bookings = Booking.objects.filter(
-                start_datetime__date=card_date,
-                status__in=['solicitud', 'aceptacion', 'apartado', 'liquidado', 'liquidado_entregado', 'entregado', 'finalizado']
-            ).select_related('user', 'package')
+            # Bookings touching this day (all non-cancelled/rejected statuses)
+            day_bookings = sorted(
+                (week_bookings[booking_id] for booking_id in ids_by_date.get(card_date, []) if booking_id in week_bookings),
+                key=lambda booking: booking.start_datetime,
+            )
             
             # Create daily object with all booking data
             daily_object = {
@@ -724,7 +743,7 @@ class DashboardViewSet(viewsets.ViewSet):
             'events': events_data
         })
 
-class DashboardStatsViewSet(viewsets.ReadOnlyModelViewSet):
+class DashboardStatsViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for dashboard statistics"""
     queryset = DashboardStats.objects.all()
     serializer_class = DashboardStatsSerializer
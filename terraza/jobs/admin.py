@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at', 'wait_ms', 'duration_ms', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'dedupe_key', 'last_error']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'wait_ms', 'duration_ms', 'locked_by', 'locked_at']
+    actions = ['retry_now']
+
+    @admin.action(description="Reintentar ahora")
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='running').update(
+            status='pending', attempts=0, run_at=timezone.now(), last_error='',
+        )
+        self.message_user(request, f"{updated} job(s) reprogramados.")
@@ -0,0 +1,77 @@
+"""
+Background job worker.
+
+Usage:
+    python manage.py run_jobs
+    python manage.py run_jobs --once
+    python manage.py run_jobs --stats
+"""
+
+import datetime
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (emails, Google Calendar sync, share cards, ...)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run the due jobs and exit")
+        parser.add_argument("--batch-size", type=int, default=10, help="Jobs claimed per round")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument(
+            "--stale-after", type=int, default=600,
+            help="Seconds after which a running job is considered abandoned",
+        )
+        parser.add_argument(
+            "--keep-done-days", type=int, default=7,
+            help="Delete successful jobs older than this many days",
+        )
+        parser.add_argument("--stats", action="store_true", help="Print queue statistics and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            self._print_stats()
+            return
+
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        stale_after = datetime.timedelta(seconds=options["stale_after"])
+        keep_done = datetime.timedelta(days=options["keep_done_days"])
+        total = 0
+
+        self.stdout.write(f"Worker {worker} iniciado.")
+        try:
+            while True:
+                close_old_connections()
+                queue.requeue_stale(stale_after)
+                ran = queue.run_pending(worker, options["batch_size"])
+                total += ran
+                if ran:
+                    continue
+                if options["once"]:
+                    break
+                queue.purge_done(keep_done)
+                time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker}: {total} job(s) ejecutados."))
+
+    def _print_stats(self):
+        rows = queue.stats()
+        if not rows:
+            self.stdout.write("No hay jobs registrados.")
+            return
+        self.stdout.write(
+            f"{'job':<40} {'pend':>5} {'run':>4} {'done':>6} {'dead':>5} {'avg ms':>8} {'max ms':>8} {'wait ms':>8}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']:<40} {row['pending']:>5} {row['running']:>4} {row['done']:>6} {row['dead']:>5} "
+                f"{row['avg_duration_ms'] or 0:>8.0f} {row['max_duration_ms'] or 0:>8} {row['avg_wait_ms'] or 0:>8.0f}"
+            )
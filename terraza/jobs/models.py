@@ -0,0 +1,57 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A unit of deferred work, run by ``python manage.py run_jobs``.
+
+    Jobs are inserted once the transaction that enqueued them commits (see
+    jobs/queue.py). Failed runs are retried with exponential backoff until
+    ``max_attempts`` is reached, after which the job stays in the ``dead``
+    state for inspection in the admin.
+    """
+
+    STATUS_CHOICES = (
+        ('pending', 'Pendiente'),
+        ('running', 'En ejecución'),
+        ('done', 'Completado'),
+        ('dead', 'Fallido definitivamente'),
+    )
+
+    name = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Pending jobs sharing a key are coalesced into one (see queue.enqueue).
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    # Timing metrics of the latest attempt
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    wait_ms = models.PositiveIntegerField(null=True, blank=True, help_text="Retraso entre run_at y el inicio.")
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=Q(status='pending'),
+                name='jobs_job_unique_pending_dedupe_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
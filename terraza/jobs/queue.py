@@ -0,0 +1,250 @@
+"""
+Enqueue and run background jobs stored in the ``Job`` table.
+
+Handlers are plain functions registered by name, usually in an app's
+``jobs.py`` (autodiscovered by JobsConfig.ready)::
+
+    @queue.register('booking.send_confirmation_email')
+    def send_confirmation_email(booking_id):
+        ...
+
+    queue.enqueue('booking.send_confirmation_email', {'booking_id': str(booking.pk)})
+
+``enqueue`` defers the insert to ``transaction.on_commit``, so a job never
+runs for a write that was rolled back. Payloads are passed to the handler as
+keyword arguments and must be JSON serializable: pass ids, not instances.
+
+Handlers run in autocommit mode, like a management command: one that needs
+several writes to land together opens its own ``transaction.atomic()``
+block. The queue doesn't wrap them in one, since handlers send email and call
+HTTP APIs, and a transaction held open across that I/O would roll back the
+state they recorded along the way (e.g. outbox rows marked sent) on a late
+failure.
+
+Handlers registered with ``batch=True`` receive the payloads of every due
+job of their name claimed in the same round, as a list, and return one error
+(or None) per payload; use them when the work is cheaper in bulk, e.g. one
+batched HTTP request instead of one request per job.
+
+Workers (``python manage.py run_jobs``) claim due jobs in batches, using
+``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports it, and
+record the outcome and timing of every attempt on the row. With
+``JOBS_EAGER = True`` jobs run in-process right after the commit instead,
+ignoring ``delay``, which is handy in development when no worker is running.
+"""
+
+import datetime
+import time
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+
+from .models import Job
+
+# Retry delays: 30s, 1m, 2m, 4m, ... capped at one hour.
+BACKOFF_BASE = 30
+BACKOFF_MAX = 60 * 60
+
+_handlers = {}
+_batch_handlers = set()
+
+
+def register(name, batch=False):
+    """Decorator registering ``func`` as the handler of jobs called ``name``."""
+    def decorator(func):
+        _handlers[name] = func
+        if batch:
+            _batch_handlers.add(name)
+        else:
+            _batch_handlers.discard(name)
+        return func
+    return decorator
+
+
+def backoff(attempts):
+    """Delay before retrying a job that has failed ``attempts`` times."""
+    return datetime.timedelta(seconds=min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX))
+
+
+def enqueue(name, payload=None, *, delay=None, dedupe_key=None, max_attempts=None):
+    """Schedule a job once the current transaction commits (immediately outside one).
+
+    ``delay`` (a timedelta) postpones the first run. Enqueueing again with the
+    ``dedupe_key`` of a job that is still pending replaces its payload and
+    pushes its ``run_at`` back instead of adding a second job, which debounces
+    bursts of saves into one run.
+    """
+    payload = payload or {}
+
+    def _insert():
+        job = _create(name, payload, delay, dedupe_key, max_attempts)
+        if job is not None and getattr(settings, 'JOBS_EAGER', False):
+            _run_eagerly(job)
+
+    transaction.on_commit(_insert)
+
+
+def _create(name, payload, delay, dedupe_key, max_attempts):
+    run_at = timezone.now() + (delay or datetime.timedelta(0))
+    if dedupe_key:
+        pending = Job.objects.filter(dedupe_key=dedupe_key, status='pending')
+        if pending.update(payload=payload, run_at=run_at):
+            return None
+
+    fields = {'name': name, 'payload': payload, 'run_at': run_at, 'dedupe_key': dedupe_key}
+    if max_attempts is not None:
+        fields['max_attempts'] = max_attempts
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**fields)
+    except IntegrityError:
+        # A concurrent enqueue created the pending job first; fold into it.
+        Job.objects.filter(dedupe_key=dedupe_key, status='pending').update(payload=payload, run_at=run_at)
+        return None
+
+
+def _mark_running(queryset, worker, now):
+    return queryset.filter(status='pending').update(
+        status='running',
+        locked_by=worker,
+        locked_at=now,
+        started_at=now,
+        attempts=F('attempts') + 1,
+    )
+
+
+def _run_eagerly(job):
+    now = timezone.now()
+    if _mark_running(Job.objects.filter(pk=job.pk), 'eager', now):
+        job.refresh_from_db()
+        run_job(job)
+
+
+def claim(limit, worker):
+    """Lock up to ``limit`` due jobs for ``worker`` and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', run_at__lte=now)
+            .order_by('run_at', 'id')
+            .values_list('pk', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        _mark_running(Job.objects.filter(pk__in=ids), worker, now)
+    # Without row locks (SQLite) another worker may have won some of them.
+    return list(Job.objects.filter(pk__in=ids, status='running', locked_by=worker, locked_at=now))
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome. Returns True on success."""
+    if job.name in _batch_handlers:
+        return run_batch([job])[0]
+
+    handler = _handlers.get(job.name)
+    started = time.monotonic()
+    error = None
+    if handler is None:
+        error = f"No hay un handler registrado para '{job.name}'."
+    else:
+        try:
+            handler(**job.payload)
+        except Exception:
+            error = traceback.format_exc()
+    _finish(job, error, int((time.monotonic() - started) * 1000), fatal=handler is None)
+    return error is None
+
+
+def run_batch(jobs):
+    """Run claimed jobs of one batch handler with a single call. Returns a success flag per job."""
+    handler = _handlers[jobs[0].name]
+    started = time.monotonic()
+    try:
+        errors = list(handler([job.payload for job in jobs]))
+        if len(errors) != len(jobs):
+            raise RuntimeError(f"{jobs[0].name} devolvió {len(errors)} resultados para {len(jobs)} jobs.")
+    except Exception:
+        errors = [traceback.format_exc()] * len(jobs)
+    # Timing is that of the whole batch: the jobs shared the work.
+    duration_ms = int((time.monotonic() - started) * 1000)
+    for job, error in zip(jobs, errors):
+        _finish(job, str(error) if error is not None else None, duration_ms)
+    return [error is None for error in errors]
+
+
+def _finish(job, error, duration_ms, fatal=False):
+    finished_at = timezone.now()
+    job.finished_at = finished_at
+    job.duration_ms = duration_ms
+    job.wait_ms = max(0, int((job.started_at - job.run_at).total_seconds() * 1000))
+    job.locked_by = ''
+    job.locked_at = None
+    job.last_error = error or ''
+    if error is None:
+        job.status = 'done'
+    elif fatal or job.attempts >= job.max_attempts:
+        job.status = 'dead'
+    elif job.dedupe_key and Job.objects.filter(dedupe_key=job.dedupe_key, status='pending').exists():
+        # A newer pending job with the same key will redo this work.
+        job.status = 'done'
+    else:
+        job.status = 'pending'
+        job.run_at = finished_at + backoff(job.attempts)
+
+    job.save(update_fields=[
+        'status', 'run_at', 'last_error', 'locked_by', 'locked_at',
+        'finished_at', 'duration_ms', 'wait_ms',
+    ])
+    if error is not None:
+        print(f"[jobs] {job.name} #{job.pk} falló (intento {job.attempts}/{job.max_attempts}): {error.strip().splitlines()[-1]}")
+
+
+def run_pending(worker, limit=10):
+    """Claim and run one batch of due jobs. Returns the number of jobs run."""
+    jobs = claim(limit, worker)
+    batches = {}
+    for job in jobs:
+        if job.name in _batch_handlers:
+            batches.setdefault(job.name, []).append(job)
+        else:
+            run_job(job)
+    for batch in batches.values():
+        run_batch(batch)
+    return len(jobs)
+
+
+def requeue_stale(older_than):
+    """Give jobs whose worker died mid-run (locked before ``older_than``) back to the queue."""
+    stale = Job.objects.filter(status='running', locked_at__lt=timezone.now() - older_than)
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='dead', locked_by='', locked_at=None, last_error='El worker se detuvo durante la ejecución.',
+    )
+    requeued = stale.update(status='pending', locked_by='', locked_at=None, run_at=timezone.now())
+    return requeued + dead
+
+
+def purge_done(older_than):
+    """Delete successful jobs finished before ``older_than`` ago."""
+    deleted, _ = Job.objects.filter(status='done', finished_at__lt=timezone.now() - older_than).delete()
+    return deleted
+
+
+def stats():
+    """Per job name: counts by status and timing of the successful runs."""
+    return list(
+        Job.objects.values('name')
+        .annotate(
+            pending=Count('id', filter=Q(status='pending')),
+            running=Count('id', filter=Q(status='running')),
+            done=Count('id', filter=Q(status='done')),
+            dead=Count('id', filter=Q(status='dead')),
+            avg_duration_ms=Avg('duration_ms', filter=Q(status='done')),
+            max_duration_ms=Max('duration_ms', filter=Q(status='done')),
+            avg_wait_ms=Avg('wait_ms', filter=Q(status='done')),
+        )
+        .order_by('name')
+    )
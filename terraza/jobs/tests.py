@@ -0,0 +1,143 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+
+from booking.models import Booking, Notification, Package, Venue
+from users import outbox
+from . import queue
+from .models import Job
+
+User = get_user_model()
+
+_calls = []
+
+
+@queue.register('tests.record')
+def record(value):
+    _calls.append(value)
+
+
+@queue.register('tests.fail')
+def fail():
+    raise ValueError('boom')
+
+
+@queue.register('tests.write_then_fail')
+def write_then_fail():
+    Job.objects.create(name='tests.written')
+    raise ValueError('boom')
+
+
+class JobQueueTestCase(TestCase):
+    def setUp(self):
+        _calls.clear()
+
+    def enqueue(self, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.enqueue(*args, **kwargs)
+
+    def test_jobs_are_inserted_on_commit_and_run_once(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            queue.enqueue('tests.record', {'value': 1})
+        self.assertFalse(Job.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(queue.run_pending('test-worker'), 1)
+        self.assertEqual(queue.run_pending('test-worker'), 0)
+        job = Job.objects.get()
+        self.assertEqual(_calls, [1])
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.duration_ms)
+        self.assertIsNotNone(job.wait_ms)
+
+    def test_dedupe_key_coalesces_pending_jobs(self):
+        self.enqueue('tests.record', {'value': 1}, dedupe_key='k')
+        self.enqueue('tests.record', {'value': 2}, dedupe_key='k', delay=datetime.timedelta(minutes=5))
+
+        job = Job.objects.get()
+        self.assertEqual(job.payload, {'value': 2})
+        self.assertGreater(job.run_at, timezone.now() + datetime.timedelta(minutes=4))
+        self.assertEqual(queue.run_pending('test-worker'), 0)
+
+    def test_failures_back_off_then_dead_letter(self):
+        self.enqueue('tests.fail', max_attempts=2)
+
+        queue.run_pending('test-worker')
+        job = Job.objects.get()
+        self.assertEqual(job.status, 'pending')
+        self.assertIn('ValueError: boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, job.finished_at + queue.backoff(1))
+        self.assertEqual(queue.run_pending('test-worker'), 0)
+
+        Job.objects.update(run_at=timezone.now())
+        queue.run_pending('test-worker')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'dead')
+        self.assertEqual(job.attempts, 2)
+
+    def test_handler_writes_are_not_rolled_back_by_a_later_failure(self):
+        # Handlers run in autocommit and record progress (sent emails) as they go.
+        self.enqueue('tests.write_then_fail')
+        queue.run_pending('test-worker')
+        self.assertTrue(Job.objects.filter(name='tests.written').exists())
+        self.assertEqual(Job.objects.get(name='tests.write_then_fail').status, 'pending')
+
+    def test_unknown_handler_goes_straight_to_dead_letter(self):
+        self.enqueue('tests.missing')
+        queue.run_pending('test-worker')
+        self.assertEqual(Job.objects.get().status, 'dead')
+
+    def test_stale_running_jobs_are_requeued(self):
+        self.enqueue('tests.record', {'value': 3})
+        queue.claim(10, 'crashed-worker')
+        Job.objects.update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+
+        self.assertEqual(queue.requeue_stale(datetime.timedelta(minutes=10)), 1)
+        queue.run_pending('test-worker')
+        self.assertEqual(_calls, [3])
+
+
+class BookingSideEffectJobsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='cliente@test.com', first_name='Ana', last_name='López')
+        self.staff = User.objects.create_user(email='staff@test.com', first_name='Luis', last_name='Pérez')
+        self.staff.is_staff = True
+        self.staff.save()
+        self.venue = Venue.objects.create(name='Terraza', slug='terraza')
+        self.package = Package.objects.create(title='Básico', price=5000, description='Paquete básico')
+
+    def test_booking_writes_defer_email_and_staff_notifications(self):
+        start = timezone.make_aware(datetime.datetime(2035, 1, 1, 10))
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                user=self.user, venue=self.venue, package=self.package,
+                start_datetime=start, end_datetime=start + datetime.timedelta(hours=12),
+            )
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(Notification.objects.filter(user=self.staff).exists())
+        self.assertEqual(
+            sorted(Job.objects.values_list('name', flat=True)),
+            ['booking.notify_staff_new_booking', 'booking.send_confirmation_email'],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.run_pending('test-worker')
+        # Rendered by the job, sent by the outbox drain (users/outbox.py).
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertTrue(Job.objects.filter(name='users.drain_outbox', status='pending').exists())
+        outbox.drain(sleep=lambda seconds: None)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user.email])
+        self.assertTrue(Notification.objects.filter(user=self.staff, booking=booking, type='new_booking_staff').exists())
+
+        booking.status = 'cancelado'
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.save()
+        self.assertTrue(Job.objects.filter(name='booking.send_status_email', status='pending').exists())
+        self.assertTrue(Job.objects.filter(name='booking.notify_waitlist', status='pending').exists())
@@ -0,0 +1,78 @@
+"""
+Request-scoped buffer for log rows.
+
+Every ``log_*`` helper in logs/utils.py used to open its own
+``transaction.atomic()`` and insert a specialized row plus an ``ActivityLog``
+row, so a single booking update could cost half a dozen INSERTs and
+savepoints in the middle of the request.
+
+The helpers now build unsaved rows and hand them to ``record``. Inside
+``buffering()`` (opened for every request by logs.middleware) the
+rows are kept in a context variable and written at the end of the request,
+or as soon as LOG_BUFFER_SIZE rows are pending, with one ``bulk_create`` per
+model. Outside of it (management commands, the job worker, tests that call
+the helpers directly) ``record`` writes the rows immediately, as before.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import transaction
+
+_pending = ContextVar('logs_pending', default=None)
+
+
+def write(rows):
+    """Insert ``rows`` now, one ``bulk_create`` per model."""
+    by_model = {}
+    for row in rows:
+        by_model.setdefault(type(row), []).append(row)
+    with transaction.atomic():
+        for model, model_rows in by_model.items():
+            model.objects.bulk_create(model_rows)
+
+
+def record(*rows):
+    """Write log rows, or queue them when a buffer is open."""
+    pending = _pending.get()
+    if pending is None:
+        write(rows)
+        return
+    pending.extend(rows)
+    if len(pending) >= settings.LOG_BUFFER_SIZE:
+        flush()
+
+
+def flush():
+    """Write the rows buffered so far. Returns how many were written."""
+    pending = _pending.get()
+    if not pending:
+        return 0
+    rows = pending[:]
+    pending.clear()
+    try:
+        write(rows)
+    except Exception as e:
+        # The buffer is written after the view returned; all that is left is to report it.
+        print(f"CRITICAL: Failed to write {len(rows)} buffered log rows: {str(e)}")
+        return 0
+    return len(rows)
+
+
+@contextmanager
+def buffering():
+    """Buffer the log rows recorded inside the block and write them on exit."""
+    if _pending.get() is not None:
+        # Nested: the outer block writes everything.
+        yield
+        return
+    token = _pending.set([])
+    try:
+        yield
+    finally:
+        try:
+            flush()
+        finally:
+            _pending.reset(token)
+
@@ -0,0 +1,61 @@
+"""
+Archive the log rows older than the retention window (see logs/partitions.py).
+
+Every month past the window is written to a gzipped JSONL file in
+default_storage (LOG_ARCHIVE_DIR) and then removed from the database. On
+PostgreSQL the month's partition is dropped; the partitions of the coming
+months are created on the same run, so schedule it monthly (cron).
+
+Usage:
+    python manage.py archive_logs
+    python manage.py archive_logs --months 6 --batch-size 5000
+    python manage.py archive_logs --dry-run
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from logs import partitions
+
+
+class Command(BaseCommand):
+    help = "Archive log rows older than the retention window and remove them from the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months", type=int, default=settings.LOG_RETENTION_MONTHS,
+            help="Full months to keep besides the current one (default: LOG_RETENTION_MONTHS)",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Rows read and deleted per query",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only list the months that would be archived",
+        )
+
+    def handle(self, *args, **options):
+        if options["months"] < 0 or options["batch_size"] <= 0:
+            raise CommandError("--months no puede ser negativo y --batch-size debe ser mayor que cero")
+
+        cutoff = partitions.add_months(partitions.month_start(timezone.now()), -options["months"])
+        total = 0
+        for model in partitions.LOG_MODELS:
+            table = model._meta.db_table
+            for month in partitions.months_before(model, cutoff):
+                if options["dry_run"]:
+                    self.stdout.write(f"{table} {month:%Y-%m}")
+                    continue
+                path, rows = partitions.archive_month(model, month, batch_size=options["batch_size"])
+                total += rows
+                if path:
+                    self.stdout.write(f"{table} {month:%Y-%m}: {rows} fila(s) -> {path}")
+
+        if options["dry_run"]:
+            return
+        created = partitions.ensure_partitions()
+        for name in created:
+            self.stdout.write(f"Partición creada: {name}")
+        self.stdout.write(self.style.SUCCESS(f"{total} fila(s) archivadas (anteriores a {cutoff:%Y-%m})."))
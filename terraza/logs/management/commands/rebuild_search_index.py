@@ -0,0 +1,24 @@
+"""
+Re-create the SQLite full-text indexes of the log and booking tables
+(see terraza/search.py). Needed after VACUUM or a migration that rebuilt one
+of the tables; PostgreSQL maintains its search vectors by itself.
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from terraza import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS5 indexes used by the search filters"
+
+    def handle(self, *args, **options):
+        for table in search.INDEXED_COLUMNS:
+            if not search.rebuild(table):
+                self.stdout.write("La base de datos mantiene sus propios índices de búsqueda; no hay nada que reconstruir.")
+                return
+            self.stdout.write(f"Índice reconstruido: {table}")
+        self.stdout.write(self.style.SUCCESS("Índices de búsqueda reconstruidos."))
@@ -0,0 +1,58 @@
+"""
+Load archived log rows back into the database, e.g. for an audit
+(see logs/partitions.py and archive_logs).
+
+Restored rows are older than the retention window, so the next
+archive_logs run archives them again (to a new file next to the original).
+
+Usage:
+    python manage.py restore_logs 2025-01
+    python manage.py restore_logs 2025-01 --table logs_auditlog
+    python manage.py restore_logs --list
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from logs import partitions
+
+
+class Command(BaseCommand):
+    help = "Restore the archived log rows of a month"
+
+    def add_arguments(self, parser):
+        parser.add_argument("month", nargs="?", help="Month to restore, as YYYY-MM")
+        parser.add_argument(
+            "--table", action="append", default=None,
+            choices=[model._meta.db_table for model in partitions.LOG_MODELS],
+            help="Only restore this log table (repeatable)",
+        )
+        parser.add_argument("--list", action="store_true", help="List the archives instead of restoring")
+
+    def handle(self, *args, **options):
+        month = None
+        if options["month"]:
+            try:
+                month = datetime.datetime.strptime(options["month"], "%Y-%m").replace(tzinfo=datetime.timezone.utc)
+            except ValueError:
+                raise CommandError("El mes debe tener el formato YYYY-MM")
+        elif not options["list"]:
+            raise CommandError("Indica el mes a restaurar (YYYY-MM) o usa --list")
+
+        models = [
+            model for model in partitions.LOG_MODELS
+            if not options["table"] or model._meta.db_table in options["table"]
+        ]
+        total = 0
+        for model in models:
+            for path in partitions.archives(model, month):
+                if options["list"]:
+                    self.stdout.write(path)
+                    continue
+                rows = partitions.restore(path)
+                total += rows
+                self.stdout.write(f"{path}: {rows} fila(s)")
+
+        if not options["list"]:
+            self.stdout.write(self.style.SUCCESS(f"{total} fila(s) restauradas."))
@@ -0,0 +1,33 @@
+"""
+Rebuild the hourly ActivityLog rollup that serves the activity summary
+(see logs/rollup.py). Needed once after deploying it, to count the rows
+written before; later writes keep it up to date.
+
+Usage:
+    python manage.py rollup_activity_logs
+    python manage.py rollup_activity_logs --days 7   # only the last 7 days
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from logs import rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute ActivityLogRollup rows from ActivityLog"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=None,
+            help="Only rebuild the hours of the last N days (default: every hour with log rows)",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["days"] is not None:
+            since = timezone.now() - datetime.timedelta(days=options["days"])
+        rows = rollup.rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollup row(s)."))
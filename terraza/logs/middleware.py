@@ -0,0 +1,12 @@
+from .buffer import buffering
+
+
+class LogBufferMiddleware:
+    """Writes the log rows of each request in bulk once the response is ready (see logs/buffer.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with buffering():
+            return self.get_response(request)
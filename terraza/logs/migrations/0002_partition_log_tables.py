@@ -0,0 +1,111 @@
+import datetime
+
+from django.db import migrations
+
+TABLES = (
+    'logs_activitylog', 'logs_bookinglog', 'logs_paymentlog',
+    'logs_useractivitylog', 'logs_systemlog', 'logs_auditlog',
+)
+# Frozen copy of logs.partitions.MONTHS_AHEAD at the time of this migration.
+MONTHS_AHEAD = 3
+
+
+def _month_start(value):
+    value = value.astimezone(datetime.timezone.utc)
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _definitions(cursor, table):
+    """Secondary indexes and foreign keys of ``table``, as SQL to recreate them."""
+    cursor.execute(
+        """
+        SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+        WHERE i.indrelid = %s::regclass AND NOT i.indisprimary
+        """,
+        [table],
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        """,
+        [table],
+    )
+    foreign_keys = [
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}'
+        for name, definition in cursor.fetchall()
+    ]
+    return indexes, foreign_keys
+
+
+def _rebuild(schema_editor, table, partitioned):
+    """Copy ``table`` into a new (un)partitioned table of the same name and schema."""
+    old = f'{table}_old'
+    with schema_editor.connection.cursor() as cursor:
+        indexes, foreign_keys = _definitions(cursor, table)
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+            [table],
+        )
+        primary_key = cursor.fetchone()[0]
+        cursor.execute(f'SELECT min("timestamp") FROM "{table}"')
+        oldest = cursor.fetchone()[0]
+
+    schema_editor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+    schema_editor.execute(f'ALTER TABLE "{old}" RENAME CONSTRAINT "{primary_key}" TO "{old}_pkey"')
+    if partitioned:
+        schema_editor.execute(
+            f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        # The partition key has to be part of the primary key.
+        schema_editor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{primary_key}" PRIMARY KEY (id, "timestamp")')
+        schema_editor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+        this_month = _month_start(datetime.datetime.now(datetime.timezone.utc))
+        month = _month_start(oldest) if oldest else this_month
+        while month <= _add_months(this_month, MONTHS_AHEAD):
+            schema_editor.execute(
+                f'CREATE TABLE "{table}_p{month:%Y%m}" PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)',
+                [month, _add_months(month, 1)],
+            )
+            month = _add_months(month, 1)
+    else:
+        schema_editor.execute(f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        schema_editor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{primary_key}" PRIMARY KEY (id)')
+
+    schema_editor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+    schema_editor.execute(f'DROP TABLE "{old}"')
+    for sql in indexes + foreign_keys:
+        schema_editor.execute(sql)
+
+
+def partition_tables(apps, schema_editor):
+    # SQLite keeps plain tables; archive_logs deletes archived rows in batches there.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        _rebuild(schema_editor, table, partitioned=True)
+
+
+def unpartition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        _rebuild(schema_editor, table, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:05
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+
+def backfill(apps, schema_editor):
+    ActivityLog = apps.get_model('logs', 'ActivityLog')
+    ActivityLogRollup = apps.get_model('logs', 'ActivityLogRollup')
+    counts = (
+        ActivityLog.objects.order_by()
+        .annotate(hour=TruncHour('timestamp', tzinfo=datetime.timezone.utc))
+        .values('hour', 'category', 'log_level', 'action')
+        .annotate(total=Count('id'))
+    )
+    ActivityLogRollup.objects.bulk_create(
+        [ActivityLogRollup(count=row.pop('total'), **row) for row in counts.iterator(chunk_size=2000)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0002_partition_log_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityLogRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('category', models.CharField(choices=[('booking', 'Booking'), ('payment', 'Payment'), ('user', 'User'), ('admin', 'Admin'), ('system', 'System'), ('venue', 'Venue'), ('package', 'Package'), ('notification', 'Notification'), ('review', 'Review')], max_length=20)),
+                ('log_level', models.CharField(choices=[('info', 'Info'), ('warning', 'Warning'), ('error', 'Error'), ('critical', 'Critical')], max_length=10)),
+                ('action', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-hour'],
+                'unique_together': {('hour', 'category', 'log_level', 'action')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
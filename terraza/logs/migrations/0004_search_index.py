@@ -0,0 +1,16 @@
+from django.db import migrations
+
+from terraza.search import CreateSearchIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0003_activitylogrollup'),
+    ]
+
+    operations = [
+        CreateSearchIndex(table='logs_activitylog', columns=('description', 'action')),
+        CreateSearchIndex(table='logs_bookinglog', columns=('description',)),
+        CreateSearchIndex(table='logs_paymentlog', columns=('description',)),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('logs', '0004_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['timestamp', 'id'], name='logs_activi_timesta_2048f3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['timestamp', 'id'], name='logs_auditl_timesta_c5eddf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookinglog',
+            index=models.Index(fields=['timestamp', 'id'], name='logs_bookin_timesta_c95528_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentlog',
+            index=models.Index(fields=['timestamp', 'id'], name='logs_paymen_timesta_85c7a3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['timestamp', 'id'], name='logs_system_timesta_32e317_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useractivitylog',
+            index=models.Index(fields=['timestamp', 'id'], name='logs_userac_timesta_d96b65_idx'),
+        ),
+    ]
@@ -7,6 +7,16 @@ from django.utils import timezone
 
 User = get_user_model()
 
+class ActivityLogQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create sends no post_save; keep the hourly rollup in step here.
+        from . import rollup
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        rollup.apply_created(objs)
+        return objs
+
+
 class ActivityLog(models.Model):
     """Main activity log model for tracking all system activities"""
     
@@ -49,10 +59,14 @@ class ActivityLog(models.Model):
     # Additional context
     metadata = models.JSONField(default=dict, blank=True)
     session_id = models.CharField(max_length=255, blank=True)
+
+    objects = ActivityLogQuerySet.as_manager()
     
     class Meta:
         ordering = ['-timestamp']
         indexes = [
+            # Keyset pagination of the listings (terraza/pagination.py).
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['timestamp', 'category']),
             models.Index(fields=['user', 'timestamp']),
             models.Index(fields=['category', 'action']),
@@ -62,6 +76,26 @@ class ActivityLog(models.Model):
     def __str__(self):
         return f"{self.timestamp} - {self.user} - {self.action} ({self.category})"
 
+class ActivityLogRollup(models.Model):
+    """Number of ActivityLog rows per hour (UTC), category, level and action.
+
+    Maintained by logs/rollup.py as log rows are written, so the activity
+    summary reads a few hundred rows whatever the size of ActivityLog.
+    Rebuild with ``python manage.py rollup_activity_logs``.
+    """
+    hour = models.DateTimeField()
+    category = models.CharField(max_length=20, choices=ActivityLog.CATEGORIES)
+    log_level = models.CharField(max_length=10, choices=ActivityLog.LOG_LEVELS)
+    action = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('hour', 'category', 'log_level', 'action')
+        ordering = ['-hour']
+
+    def __str__(self):
+        return f"{self.hour} {self.category}/{self.log_level} {self.action}: {self.count}"
+
 class BookingLog(models.Model):
     """Specific logging for booking-related activities"""
     
@@ -90,6 +124,7 @@ class BookingLog(models.Model):
     class Meta:
         ordering = ['-timestamp']
         indexes = [
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['booking_id', 'timestamp']),
             models.Index(fields=['action', 'timestamp']),
         ]
@@ -130,6 +165,7 @@ class PaymentLog(models.Model):
     class Meta:
         ordering = ['-timestamp']
         indexes = [
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['payment_id', 'timestamp']),
             models.Index(fields=['order_id', 'timestamp']),
             models.Index(fields=['action', 'timestamp']),
@@ -165,6 +201,7 @@ class UserActivityLog(models.Model):
     class Meta:
         ordering = ['-timestamp']
         indexes = [
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['user', 'timestamp']),
             models.Index(fields=['action', 'timestamp']),
         ]
@@ -194,6 +231,7 @@ class SystemLog(models.Model):
     class Meta:
         ordering = ['-timestamp']
         indexes = [
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['level', 'timestamp']),
             models.Index(fields=['component', 'timestamp']),
         ]
@@ -228,6 +266,7 @@ class AuditLog(models.Model):
     class Meta:
         ordering = ['-timestamp']
         indexes = [
+            models.Index(fields=['timestamp', 'id']),
             models.Index(fields=['audit_type', 'timestamp']),
             models.Index(fields=['table_name', 'record_id']),
             models.Index(fields=['user', 'timestamp']),
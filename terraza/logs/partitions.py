@@ -0,0 +1,183 @@
+"""
+Monthly partitions of the log tables and their archival.
+
+On PostgreSQL every log table is range-partitioned by month on
+``timestamp`` (migration 0002): ``<table>_pYYYYMM`` holds the rows of one
+month (UTC) and ``<table>_default`` catches rows that arrive for a month
+whose partition doesn't exist yet. ``ensure_partitions`` creates the
+partitions of the coming months; ``create_partition`` moves any rows that
+already landed in the default partition into the new one.
+
+``archive_month`` streams the rows of one month to a gzipped JSONL file in
+``default_storage`` (Django's ``jsonl`` serialization, so ``loaddata``
+semantics apply on the way back), then drops the month's partition and
+deletes whatever is left in batches. On SQLite, or a table that isn't
+partitioned, the batched delete does all the work. ``restore`` loads an
+archive back into its table.
+
+Commands: ``archive_logs`` and ``restore_logs``.
+"""
+
+import datetime
+import gzip
+import tempfile
+
+from django.conf import settings
+from django.core import serializers
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from .models import ActivityLog, AuditLog, BookingLog, PaymentLog, SystemLog, UserActivityLog
+
+LOG_MODELS = (ActivityLog, BookingLog, PaymentLog, UserActivityLog, SystemLog, AuditLog)
+# Partitions created ahead of time, so rows don't pile up in the default partition.
+MONTHS_AHEAD = 3
+
+
+def month_start(value):
+    value = value.astimezone(datetime.timezone.utc)
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(model, month):
+    return f"{model._meta.db_table}_p{month:%Y%m}"
+
+
+def is_partitioned(model):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [model._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(model):
+    """Names of the monthly partitions of ``model``'s table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            """,
+            [model._meta.db_table],
+        )
+        prefix = f"{model._meta.db_table}_p"
+        return sorted(name for name, in cursor.fetchall() if name.startswith(prefix))
+
+
+def create_partition(model, month):
+    """Create the partition of ``month``, moving its rows out of the default partition."""
+    table = model._meta.db_table
+    name = partition_name(model, month)
+    quote = connection.ops.quote_name
+    bounds = [month, add_months(month, 1)]
+    # Model columns only: generated ones (the search vector, see terraza/search.py) can't be inserted.
+    columns = ', '.join(quote(field.column) for field in model._meta.concrete_fields)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} "
+            f"(LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+        )
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {quote(table + '_default')}
+                WHERE "timestamp" >= %s AND "timestamp" < %s
+                RETURNING {columns}
+            )
+            INSERT INTO {quote(name)} ({columns}) SELECT {columns} FROM moved
+            """,
+            bounds,
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)",
+            bounds,
+        )
+    return name
+
+
+def ensure_partitions(months_ahead=MONTHS_AHEAD, models=LOG_MODELS):
+    """Create the missing partitions from this month to ``months_ahead`` months on."""
+    this_month = month_start(datetime.datetime.now(datetime.timezone.utc))
+    created = []
+    for model in models:
+        if not is_partitioned(model):
+            continue
+        existing = set(partitions(model))
+        for offset in range(months_ahead + 1):
+            month = add_months(this_month, offset)
+            if partition_name(model, month) not in existing:
+                created.append(create_partition(model, month))
+    return created
+
+
+def archive_name(model, month):
+    return f"{settings.LOG_ARCHIVE_DIR}/{model._meta.db_table}/{month:%Y-%m}.jsonl.gz"
+
+
+def months_before(model, before):
+    """First days of the months of ``model`` with rows older than ``before``."""
+    first = model._base_manager.filter(timestamp__lt=before).order_by('timestamp').values_list('timestamp', flat=True).first()
+    if first is None:
+        return []
+    months, month = [], month_start(first)
+    while month < before:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def archive_month(model, month, batch_size=1000):
+    """Archive and remove the rows of one month. Returns (archive path or None, rows)."""
+    rows = model._base_manager.filter(timestamp__gte=month, timestamp__lt=add_months(month, 1))
+    count = rows.count()
+    path = None
+    if count:
+        with tempfile.TemporaryFile() as tmp:
+            with gzip.open(tmp, 'wt', encoding='utf-8') as out:
+                serializers.serialize('jsonl', rows.order_by('timestamp').iterator(chunk_size=batch_size), stream=out)
+            tmp.seek(0)
+            # A month archived twice (e.g. rows restored for an audit) gets a suffixed name.
+            path = default_storage.save(archive_name(model, month), File(tmp))
+
+    if is_partitioned(model) and partition_name(model, month) in partitions(model):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {connection.ops.quote_name(partition_name(model, month))}")
+    while True:
+        ids = list(rows.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        model._base_manager.filter(pk__in=ids).delete()
+    return path, count
+
+
+def archives(model, month=None):
+    """Archive paths of ``model``, optionally only those of ``month``."""
+    directory = f"{settings.LOG_ARCHIVE_DIR}/{model._meta.db_table}"
+    if not default_storage.exists(directory):
+        return []
+    _, files = default_storage.listdir(directory)
+    prefix = f"{month:%Y-%m}" if month else ''
+    return [f"{directory}/{name}" for name in sorted(files) if name.startswith(prefix) and name.endswith('.gz')]
+
+
+def restore(path):
+    """Load an archive back into its table. Returns how many rows were restored."""
+    count = 0
+    with default_storage.open(path, 'rb') as raw, gzip.open(raw, 'rt', encoding='utf-8') as stream:
+        with transaction.atomic():
+            for obj in serializers.deserialize('jsonl', stream):
+                # Raw save, as loaddata: keeps the archived timestamp.
+                obj.save()
+                count += 1
+    return count
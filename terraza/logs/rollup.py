@@ -0,0 +1,93 @@
+"""
+Hourly counts of ActivityLog rows (``ActivityLogRollup``).
+
+Every ActivityLog row adds one to the rollup row of its (hour, category,
+log_level, action): ``ActivityLog.objects.bulk_create`` (used by the log
+buffer, see logs/buffer.py) applies the counts of the whole batch, and a
+post_save signal covers single saves. Increments are ``F()`` updates, so
+concurrent writers never lose counts.
+
+Rows removed by archive_logs stay counted: the rollup keeps the history the
+summary reports on. ``rebuild`` recomputes the hours that still have raw
+rows (``python manage.py rollup_activity_logs``).
+"""
+
+import datetime
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+
+KEY_FIELDS = ('category', 'log_level', 'action')
+
+
+def hour_of(value):
+    return value.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _bump(hour, category, log_level, action, delta):
+    from .models import ActivityLogRollup
+
+    key = {'hour': hour, 'category': category, 'log_level': log_level, 'action': action}
+    updated = ActivityLogRollup.objects.filter(**key).update(count=F('count') + delta)
+    if not updated:
+        row, created = ActivityLogRollup.objects.get_or_create(**key, defaults={'count': delta})
+        if not created:
+            ActivityLogRollup.objects.filter(pk=row.pk).update(count=F('count') + delta)
+
+
+def apply_created(logs):
+    counts = Counter((hour_of(log.timestamp), log.category, log.log_level, log.action) for log in logs)
+    if not counts:
+        return
+    with transaction.atomic():
+        for key, delta in sorted(counts.items()):
+            _bump(*key, delta)
+
+
+def summary(since):
+    """Totals of the rollup rows from the hour of ``since`` on."""
+    from .models import ActivityLogRollup
+
+    rows = ActivityLogRollup.objects.filter(hour__gte=hour_of(since)).order_by()
+
+    def totals(field):
+        return rows.values(field).annotate(total=Sum('count')).values_list(field, 'total')
+
+    return {
+        'total_activities': rows.aggregate(total=Sum('count'))['total'] or 0,
+        'by_category': dict(totals('category')),
+        'by_level': dict(totals('log_level')),
+        'top_actions': dict(totals('action').order_by('-total')[:10]),
+    }
+
+
+def rebuild(since=None):
+    """Recompute the rollup from ActivityLog, from the hour of ``since`` (default: the oldest row) on.
+
+    Returns the number of rollup rows written.
+    """
+    from .models import ActivityLog, ActivityLogRollup
+
+    if since is None:
+        since = ActivityLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if since is None:
+            return 0
+    start = hour_of(since)
+    counts = (
+        ActivityLog.objects.filter(timestamp__gte=start).order_by()
+        .annotate(hour=TruncHour('timestamp', tzinfo=datetime.timezone.utc))
+        .values('hour', *KEY_FIELDS)
+        .annotate(total=Count('id'))
+    )
+    with transaction.atomic():
+        ActivityLogRollup.objects.filter(hour__gte=start).delete()
+        rows = ActivityLogRollup.objects.bulk_create(
+            [
+                ActivityLogRollup(count=row.pop('total'), **row)
+                for row in counts.iterator(chunk_size=2000)
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
@@ -59,34 +59,18 @@ def log_booking_changes(sender, instance, created, **kwargs):
             if created and 'log_booking_created' in utils:
                 # New booking created
                 utils['log_booking_created'](instance, instance.user)
-            elif hasattr(instance, '_old_status') and instance._old_status != instance.status:
-                # Status changed
+            elif instance.has_changed('status') and instance.previous('status') is not None:
+                # Status changed (previous value tracked at load time, see terraza/tracking.py)
                 if 'log_booking_status_change' in utils:
                     utils['log_booking_status_change'](
                         instance, 
                         instance.user, 
-                        instance._old_status, 
+                        instance.previous('status'), 
                         instance.status
                     )
     except Exception as e:
         print(f"Failed to log booking changes: {e}")
 
-@receiver(pre_save, sender=None)
-def store_old_booking_status(sender, instance, **kwargs):
-    """Store old status before saving to detect changes"""
-    try:
-        # Check if this is a Booking model
-        if hasattr(instance, '_meta') and instance._meta.model_name == 'booking':
-            if instance.pk:  # Only for existing instances
-                from booking.models import Booking
-                try:
-                    old_instance = Booking.objects.get(pk=instance.pk)
-                    instance._old_status = old_instance.status
-                except Booking.DoesNotExist:
-                    pass
-    except Exception as e:
-        print(f"Failed to store old booking status: {e}")
-
 # Payment signals
 @receiver(post_save, sender=None)
 def log_payment_changes(sender, instance, created, **kwargs):
@@ -196,6 +180,15 @@ def store_old_user_data(sender, instance, **kwargs):
     except Exception as e:
         print(f"Failed to store old user data: {e}")
 
+# Activity rollup (bulk_create is handled by ActivityLogQuerySet)
+@receiver(post_save, sender='logs.ActivityLog')
+def count_activity_log(sender, instance, created, raw=False, **kwargs):
+    """Count a single saved activity in the hourly rollup"""
+    # Raw saves are restored archives (restore_logs); they were counted when first written.
+    if created and not raw:
+        from .rollup import apply_created
+        apply_created([instance])
+
 # System startup logging
 def log_system_startup():
     """Log system startup"""
@@ -1,3 +1,290 @@
-from django.test import TestCase
+import datetime
+import shutil
+import tempfile
+import uuid
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import buffer, partitions, rollup
+from .middleware import LogBufferMiddleware
+from .models import ActivityLog, ActivityLogRollup, AuditLog, BookingLog, SystemLog
+from .utils import log_activity, log_booking_activity, log_system_event
+
+User = get_user_model()
+
+
+class LogBufferTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='ana@test.com', first_name='Ana', last_name='López')
+
+    def log_booking(self, action='created'):
+        log_booking_activity(
+            user=self.user, booking_id=uuid.uuid4(), action=action,
+            new_status='solicitud', description='Nueva reserva',
+        )
+
+    def inserts(self, queries):
+        # Log rows only; the hourly rollup (logs/rollup.py) has its own writes.
+        return [q['sql'] for q in queries if q['sql'].startswith('INSERT') and 'logs_activitylogrollup' not in q['sql']]
+
+    def test_without_a_buffer_rows_are_written_immediately(self):
+        self.log_booking()
+        self.assertEqual(BookingLog.objects.count(), 1)
+        self.assertEqual(ActivityLog.objects.filter(category='booking').count(), 1)
+
+    def test_buffered_rows_are_written_with_one_insert_per_model(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with buffer.buffering():
+                for action in ('created', 'status_changed', 'updated'):
+                    self.log_booking(action)
+                log_activity(user=self.user, category='booking', action='updated', description='Reserva actualizada')
+                self.assertEqual(ActivityLog.objects.count(), 0)
+
+        self.assertEqual(len(self.inserts(ctx.captured_queries)), 2)
+        self.assertEqual(BookingLog.objects.count(), 3)
+        self.assertEqual(ActivityLog.objects.count(), 4)
+
+    @override_settings(LOG_BUFFER_SIZE=4)
+    def test_buffer_is_flushed_when_it_fills_up(self):
+        with buffer.buffering():
+            self.log_booking()
+            self.assertEqual(BookingLog.objects.count(), 0)
+            self.log_booking()
+            self.assertEqual(BookingLog.objects.count(), 2)
+            log_system_event(level='info', component='Test', message='Evento')
+        self.assertEqual(SystemLog.objects.count(), 1)
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+    def test_middleware_writes_the_rows_of_the_request(self):
+        def view(request):
+            self.log_booking()
+            self.assertEqual(BookingLog.objects.count(), 0)
+            return HttpResponse('ok')
+
+        response = LogBufferMiddleware(view)(RequestFactory().get('/'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BookingLog.objects.count(), 1)
+
+    def test_rows_are_written_when_the_view_fails(self):
+        def view(request):
+            log_system_event(level='warning', component='Test', message='Antes del error')
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            LogBufferMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(SystemLog.objects.count(), 1)
+
+
+class LogArchiveTestCase(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        settings_override = override_settings(MEDIA_ROOT=self.media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def make_log(self, model, when, **fields):
+        log = model.objects.create(**fields)
+        model.objects.filter(pk=log.pk).update(timestamp=when)
+        return log.pk
+
+    def utc(self, *args):
+        return datetime.datetime(*args, tzinfo=datetime.timezone.utc)
+
+    def test_archive_and_restore_a_month(self):
+        old = [
+            self.make_log(ActivityLog, self.utc(2024, 1, 5, 10), category='system', action='a', description='Uno'),
+            self.make_log(ActivityLog, self.utc(2024, 1, 20, 10), category='system', action='b', description='Dos'),
+        ]
+        self.make_log(BookingLog, self.utc(2024, 2, 1, 10), booking_id=uuid.uuid4(), action='created', description='Reserva')
+        recent = self.make_log(ActivityLog, datetime.datetime.now(datetime.timezone.utc), category='system', action='c', description='Hoy')
+
+        out = StringIO()
+        call_command('archive_logs', months=12, batch_size=1, stdout=out)
+
+        self.assertEqual(list(ActivityLog.objects.values_list('pk', flat=True)), [recent])
+        self.assertFalse(BookingLog.objects.exists())
+        self.assertEqual(len(partitions.archives(ActivityLog, self.utc(2024, 1, 1))), 1)
+        self.assertIn('3 fila(s) archivadas', out.getvalue())
+
+        call_command('restore_logs', '2024-01', stdout=StringIO())
+
+        restored = ActivityLog.objects.filter(pk__in=old).order_by('timestamp')
+        self.assertEqual([log.timestamp for log in restored], [self.utc(2024, 1, 5, 10), self.utc(2024, 1, 20, 10)])
+        self.assertFalse(BookingLog.objects.exists())
+
+    def test_dry_run_keeps_the_rows(self):
+        self.make_log(SystemLog, self.utc(2023, 6, 1), component='Test', message='Viejo')
+        out = StringIO()
+        call_command('archive_logs', months=1, dry_run=True, stdout=out)
+        self.assertIn('logs_systemlog 2023-06', out.getvalue())
+        self.assertEqual(SystemLog.objects.count(), 1)
+        self.assertEqual(partitions.archives(SystemLog), [])
+
+
+class ActivityLogRollupTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin@test.com', first_name='Luis', last_name='Pérez')
+        self.admin.is_staff = True
+        self.admin.save()
+
+    def log(self, action='created', category='booking', log_level='info'):
+        log_activity(user=self.admin, category=category, action=action, description='Prueba', log_level=log_level)
+
+    def counts(self):
+        return {
+            (row.category, row.log_level, row.action): row.count
+            for row in ActivityLogRollup.objects.all()
+        }
+
+    def summary(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.get('/api/logs/activity/summary/', {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_writes_are_counted(self):
+        self.log()
+        with buffer.buffering():
+            self.log()
+            self.log('updated')
+            self.log('failed', log_level='error')
+        self.assertEqual(self.counts(), {
+            ('booking', 'info', 'created'): 2,
+            ('booking', 'info', 'updated'): 1,
+            ('booking', 'error', 'failed'): 1,
+        })
+
+    def test_summary_is_served_from_the_rollup(self):
+        for _ in range(3):
+            self.log()
+        self.log('login', category='user')
+        old = ActivityLog.objects.create(category='system', action='old', description='Viejo')
+        ActivityLog.objects.filter(pk=old.pk).update(timestamp=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        rollup.rebuild()
+
+        data = self.summary()
+
+        self.assertEqual(data['total_activities'], 4)
+        self.assertEqual(data['by_category'], {'booking': 3, 'user': 1})
+        self.assertEqual(data['by_level'], {'info': 4})
+        self.assertEqual(data['top_actions'], {'created': 3, 'login': 1})
+
+    def test_summary_does_not_read_the_log_table(self):
+        for _ in range(5):
+            self.log()
+        with CaptureQueriesContext(connection) as ctx:
+            self.summary()
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "logs_activitylog"' in q['sql']])
+
+    def test_rebuild_matches_the_incremental_counts(self):
+        for action in ('created', 'created', 'updated'):
+            self.log(action)
+        incremental = self.counts()
+        ActivityLogRollup.objects.all().delete()
+        call_command('rollup_activity_logs', stdout=StringIO())
+        self.assertEqual(self.counts(), incremental)
+
+
+class LogFullTextSearchTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin@test.com', first_name='Luis', last_name='Pérez')
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def search(self, url, text):
+        response = self.client.get(url, {'search': text})
+        self.assertEqual(response.status_code, 200)
+        return [row['description'] for row in response.json()['results']]
+
+    def test_activity_and_booking_logs_are_searched_through_the_index(self):
+        log_booking_activity(
+            user=self.admin, booking_id=uuid.uuid4(), action='created',
+            description='Nueva reserva creada para Terraza el 2034-03-01',
+        )
+        log_activity(category='system', action='payment_failed', description='Pago rechazado por el banco')
+
+        self.assertEqual(self.search('/api/logs/activity/', 'rechazado banco'), ['Pago rechazado por el banco'])
+        self.assertEqual(self.search('/api/logs/activity/', 'payment_failed'), ['Pago rechazado por el banco'])
+        self.assertEqual(self.search('/api/logs/booking/', 'terraza'), ['Nueva reserva creada para Terraza el 2034-03-01'])
+        self.assertEqual(self.search('/api/logs/booking/', 'admin@test.com'), ['Nueva reserva creada para Terraza el 2034-03-01'])
+        self.assertEqual(self.search('/api/logs/booking/', 'inexistente'), [])
+
+    def test_query_syntax_in_the_search_text_is_harmless(self):
+        log_activity(category='system', action='a', description='Error "grave" en NEAR(pago)')
+        self.assertEqual(self.search('/api/logs/activity/', '"grave" NEAR( OR'), [])
+        self.assertEqual(len(self.search('/api/logs/activity/', '"grave"')), 1)
+
+
+class LogKeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin@test.com', first_name='Ana', last_name='Ruiz')
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        base = datetime.datetime(2034, 3, 1, tzinfo=datetime.timezone.utc)
+        for minutes in (0, 5, 5, 5, 10, 20, 20):
+            entry = AuditLog.objects.create(audit_type='data_change', description='cambio')
+            # Ties on timestamp are broken by id.
+            AuditLog.objects.filter(pk=entry.pk).update(timestamp=base + datetime.timedelta(minutes=minutes))
+        self.expected = [
+            str(pk) for pk in AuditLog.objects.order_by('-timestamp', '-pk').values_list('pk', flat=True)
+        ]
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_walks_every_row_once_forwards_and_backwards(self):
+        pages = [self.get('/api/logs/audit/', {'cursor': '', 'page_size': 3})]
+        while pages[-1]['next']:
+            pages.append(self.get(pages[-1]['next']))
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 1])
+        self.assertEqual([row['id'] for page in pages for row in page['results']], self.expected)
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+        back = self.get(pages[-1]['previous'])
+        self.assertEqual(back['results'], pages[1]['results'])
+        back = self.get(back['previous'])
+        self.assertEqual(back['results'], pages[0]['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_pages_seek_instead_of_counting_and_offsetting(self):
+        first = self.get('/api/logs/audit/', {'cursor': '', 'page_size': 3})
+        with CaptureQueriesContext(connection) as ctx:
+            self.get(first['next'])
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_ascending_ordering_and_counts(self):
+        page = self.get('/api/logs/audit/', {'cursor': '', 'ordering': 'timestamp', 'with_count': 'exact'})
+        self.assertEqual([row['id'] for row in page['results']], self.expected[::-1])
+        self.assertEqual(page['count'], 7)
+        # SQLite has no planner estimate: approx falls back to an exact count.
+        page = self.get('/api/logs/audit/', {'cursor': '', 'with_count': 'approx', 'audit_type': 'security_event'})
+        self.assertEqual(page['count'], 0)
+
+    def test_page_numbers_still_work(self):
+        page = self.get('/api/logs/audit/', {'page': 2, 'page_size': 3})
+        self.assertEqual(page['count'], 7)
+        self.assertEqual([row['id'] for row in page['results']], self.expected[3:6])
+
+    def test_bad_cursor_and_unsupported_ordering(self):
+        self.assertEqual(self.client.get('/api/logs/audit/', {'cursor': 'no-es-un-cursor'}).status_code, 404)
+        response = self.client.get('/api/logs/audit/', {'cursor': '', 'ordering': 'audit_type'})
+        self.assertEqual(response.status_code, 400)
@@ -2,7 +2,7 @@ import json
 import traceback
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
-from django.db import transaction
+from .buffer import record
 from .models import (
     ActivityLog, BookingLog, PaymentLog, UserActivityLog, 
     SystemLog, AuditLog
@@ -21,6 +21,38 @@ def get_user_agent(request):
     """Extract user agent from request"""
     return request.META.get('HTTP_USER_AGENT', '')
 
+def _activity_row(
+    user=None,
+    category='system',
+    action='',
+    description='',
+    log_level='info',
+    content_object=None,
+    metadata=None,
+    request=None,
+    session_id=None
+):
+    """Build an unsaved ActivityLog row"""
+    log_data = {
+        'user': user,
+        'category': category,
+        'action': action,
+        'description': description,
+        'log_level': log_level,
+        'metadata': metadata or {},
+        'session_id': session_id or '',
+    }
+    
+    if request:
+        log_data['ip_address'] = get_client_ip(request)
+        log_data['user_agent'] = get_user_agent(request)
+    
+    if content_object:
+        log_data['content_type'] = ContentType.objects.get_for_model(content_object)
+        log_data['object_id'] = content_object.id
+    
+    return ActivityLog(**log_data)
+
 def log_activity(
     user=None, 
     category='system', 
@@ -34,26 +66,17 @@ def log_activity(
 ):
     """Log a general activity"""
     try:
-        with transaction.atomic():
-            log_data = {
-                'user': user,
-                'category': category,
-                'action': action,
-                'description': description,
-                'log_level': log_level,
-                'metadata': metadata or {},
-                'session_id': session_id or '',
-            }
-            
-            if request:
-                log_data['ip_address'] = get_client_ip(request)
-                log_data['user_agent'] = get_user_agent(request)
-            
-            if content_object:
-                log_data['content_type'] = ContentType.objects.get_for_model(content_object)
-                log_data['object_id'] = content_object.id
-            
-            ActivityLog.objects.create(**log_data)
+        record(_activity_row(
+            user=user,
+            category=category,
+            action=action,
+            description=description,
+            log_level=log_level,
+            content_object=content_object,
+            metadata=metadata,
+            request=request,
+            session_id=session_id
+        ))
             
     except Exception as e:
         # Fallback to system log if activity logging fails
@@ -71,8 +94,8 @@ def log_booking_activity(
 ):
     """Log a booking-related activity"""
     try:
-        with transaction.atomic():
-            BookingLog.objects.create(
+        record(
+            BookingLog(
                 user=user,
                 booking_id=booking_id,
                 action=action,
@@ -80,16 +103,16 @@ def log_booking_activity(
                 new_status=new_status,
                 description=description,
                 metadata=metadata or {}
-            )
-            
+            ),
             # Also log as general activity
-            log_activity(
+            _activity_row(
                 user=user,
                 category='booking',
                 action=action,
                 description=description,
                 metadata=metadata
             )
+        )
             
     except Exception as e:
         log_system_error('BookingLog', f"Failed to log booking activity: {str(e)}", str(e))
@@ -110,8 +133,8 @@ def log_payment_activity(
 ):
     """Log a payment-related activity"""
     try:
-        with transaction.atomic():
-            PaymentLog.objects.create(
+        record(
+            PaymentLog(
                 user=user,
                 payment_id=payment_id,
                 order_id=order_id,
@@ -124,16 +147,16 @@ def log_payment_activity(
                 description=description,
                 error_message=error_message,
                 metadata=metadata or {}
-            )
-            
+            ),
             # Also log as general activity
-            log_activity(
+            _activity_row(
                 user=user,
                 category='payment',
                 action=action,
                 description=description,
                 metadata=metadata
             )
+        )
             
     except Exception as e:
         log_system_error('PaymentLog', f"Failed to log payment activity: {str(e)}", str(e))
@@ -147,28 +170,28 @@ def log_user_activity(
 ):
     """Log a user-related activity"""
     try:
-        with transaction.atomic():
-            log_data = {
-                'user': user,
-                'action': action,
-                'description': description,
-                'metadata': metadata or {}
-            }
-            
-            if request:
-                log_data['ip_address'] = get_client_ip(request)
-                log_data['user_agent'] = get_user_agent(request)
-            
-            UserActivityLog.objects.create(**log_data)
-            
+        log_data = {
+            'user': user,
+            'action': action,
+            'description': description,
+            'metadata': metadata or {}
+        }
+        
+        if request:
+            log_data['ip_address'] = get_client_ip(request)
+            log_data['user_agent'] = get_user_agent(request)
+        
+        record(
+            UserActivityLog(**log_data),
             # Also log as general activity
-            log_activity(
+            _activity_row(
                 user=user,
                 category='user',
                 action=action,
                 description=description,
                 metadata=metadata
             )
+        )
             
     except Exception as e:
         log_system_error('UserActivityLog', f"Failed to log user activity: {str(e)}", str(e))
@@ -182,24 +205,25 @@ def log_system_event(
 ):
     """Log a system-level event"""
     try:
-        with transaction.atomic():
-            SystemLog.objects.create(
-                level=level,
-                component=component,
-                message=message,
-                stack_trace=stack_trace,
-                metadata=metadata or {}
-            )
-            
-            # Also log as general activity for info and warning levels
-            if level in ['info', 'warning']:
-                log_activity(
-                    category='system',
-                    action=f"{component}: {level}",
-                    description=message,
-                    log_level=level,
-                    metadata=metadata
-                )
+        rows = [SystemLog(
+            level=level,
+            component=component,
+            message=message,
+            stack_trace=stack_trace,
+            metadata=metadata or {}
+        )]
+        
+        # Also log as general activity for info and warning levels
+        if level in ['info', 'warning']:
+            rows.append(_activity_row(
+                category='system',
+                action=f"{component}: {level}",
+                description=message,
+                log_level=level,
+                metadata=metadata
+            ))
+        
+        record(*rows)
                 
     except Exception as e:
         # If system logging fails, we can't do much more
@@ -229,26 +253,25 @@ def log_audit_event(
 ):
     """Log an audit event for sensitive operations"""
     try:
-        with transaction.atomic():
-            log_data = {
-                'user': user,
-                'audit_type': audit_type,
-                'table_name': table_name,
-                'record_id': str(record_id),
-                'field_name': field_name,
-                'old_value': str(old_value) if old_value is not None else '',
-                'new_value': str(new_value) if new_value is not None else '',
-                'description': description,
-                'metadata': metadata or {}
-            }
-            
-            if request:
-                log_data['ip_address'] = get_client_ip(request)
-            
-            AuditLog.objects.create(**log_data)
-            
+        log_data = {
+            'user': user,
+            'audit_type': audit_type,
+            'table_name': table_name,
+            'record_id': str(record_id),
+            'field_name': field_name,
+            'old_value': str(old_value) if old_value is not None else '',
+            'new_value': str(new_value) if new_value is not None else '',
+            'description': description,
+            'metadata': metadata or {}
+        }
+        
+        if request:
+            log_data['ip_address'] = get_client_ip(request)
+        
+        record(
+            AuditLog(**log_data),
             # Also log as general activity
-            log_activity(
+            _activity_row(
                 user=user,
                 category='admin',
                 action=f"Audit: {audit_type}",
@@ -256,6 +279,7 @@ def log_audit_event(
                 log_level='warning',
                 metadata=metadata
             )
+        )
             
     except Exception as e:
         log_system_error('AuditLog', f"Failed to log audit event: {str(e)}", str(e))
@@ -2,19 +2,25 @@ from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter, SearchFilter
 from django.db.models import Q, Count
 from django.utils import timezone
 from datetime import timedelta
 
+from terraza.eager_loading import EagerLoadingMixin
+from terraza.pagination import KeysetPagination
+from terraza.search import FullTextSearchFilter
 
-class LogPagination(PageNumberPagination):
+
+class LogPagination(KeysetPagination):
+    ordering_field = 'timestamp'
+    default_ordering = '-timestamp'
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 200
 
+from . import rollup
 from .models import (
     ActivityLog, BookingLog, PaymentLog, UserActivityLog, 
     SystemLog, AuditLog
@@ -29,13 +35,13 @@ class IsAdminUser(permissions.BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_staff
 
-class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+class ActivityLogViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing activity logs"""
     queryset = ActivityLog.objects.all()
     serializer_class = ActivityLogSerializer
     permission_classes = [IsAdminUser]
     pagination_class = LogPagination
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['category', 'action', 'log_level', 'user']
     ordering_fields = ['timestamp', 'category', 'action']
     ordering = ['-timestamp']
@@ -43,48 +49,32 @@ class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Get summary statistics for activity logs"""
+        """Get summary statistics for activity logs (from the hourly rollup, see logs/rollup.py)"""
         days = int(request.query_params.get('days', 30))
         start_date = timezone.now() - timedelta(days=days)
-        recent_logs = self.queryset.filter(timestamp__gte=start_date)
-
-        total_activities = recent_logs.count()
-        by_category = dict(
-            recent_logs.values('category').annotate(count=Count('id')).values_list('category', 'count')
-        )
-        by_level = dict(
-            recent_logs.values('log_level').annotate(count=Count('id')).values_list('log_level', 'count')
-        )
-        top_actions = dict(
-            recent_logs.values('action').annotate(count=Count('id'))
-            .order_by('-count').values_list('action', 'count')[:10]
-        )
 
         return Response({
             'period_days': days,
             'start_date': start_date.date(),
             'end_date': timezone.now().date(),
-            'total_activities': total_activities,
-            'by_category': by_category,
-            'by_level': by_level,
-            'top_actions': top_actions,
+            **rollup.summary(start_date),
         })
     
     @action(detail=False, methods=['get'])
     def recent_activity(self, request):
         """Get recent activity for dashboard"""
         limit = int(request.query_params.get('limit', 50))
-        recent_logs = self.queryset.order_by('-timestamp')[:limit]
+        recent_logs = self.get_queryset().order_by('-timestamp')[:limit]
         serializer = self.get_serializer(recent_logs, many=True)
         return Response(serializer.data)
 
-class BookingLogViewSet(viewsets.ReadOnlyModelViewSet):
+class BookingLogViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing booking logs"""
     queryset = BookingLog.objects.all()
     serializer_class = BookingLogSerializer
     permission_classes = [IsAdminUser]
     pagination_class = LogPagination
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['action', 'old_status', 'new_status', 'user']
     ordering_fields = ['timestamp', 'action']
     ordering = ['-timestamp']
@@ -100,17 +90,17 @@ class BookingLogViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        logs = self.queryset.filter(booking_id=booking_id).order_by('-timestamp')
+        logs = self.get_queryset().filter(booking_id=booking_id).order_by('-timestamp')
         serializer = self.get_serializer(logs, many=True)
         return Response(serializer.data)
 
-class PaymentLogViewSet(viewsets.ReadOnlyModelViewSet):
+class PaymentLogViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing payment logs"""
     queryset = PaymentLog.objects.all()
     serializer_class = PaymentLogSerializer
     permission_classes = [IsAdminUser]
     pagination_class = LogPagination
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['action', 'method', 'gateway', 'old_status', 'new_status', 'user']
     ordering_fields = ['timestamp', 'action', 'amount']
     ordering = ['-timestamp']
@@ -125,7 +115,7 @@ class PaymentLogViewSet(viewsets.ReadOnlyModelViewSet):
                 {'error': 'payment_id parameter is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        logs = self.queryset.filter(payment_id=payment_id).order_by('-timestamp')
+        logs = self.get_queryset().filter(payment_id=payment_id).order_by('-timestamp')
         serializer = self.get_serializer(logs, many=True)
         return Response(serializer.data)
 
@@ -134,7 +124,7 @@ class PaymentLogViewSet(viewsets.ReadOnlyModelViewSet):
         """Get payment activity summary"""
         days = int(request.query_params.get('days', 30))
         start_date = timezone.now() - timedelta(days=days)
-        recent_logs = self.queryset.filter(timestamp__gte=start_date)
+        recent_logs = self.get_queryset().filter(timestamp__gte=start_date)
 
         total_payments = recent_logs.count()
         successful_payments = recent_logs.filter(new_status='paid').count()
@@ -160,7 +150,7 @@ class PaymentLogViewSet(viewsets.ReadOnlyModelViewSet):
             'by_gateway': by_gateway,
         })
 
-class UserActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+class UserActivityLogViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing user activity logs"""
     queryset = UserActivityLog.objects.all()
     serializer_class = UserActivityLogSerializer
@@ -182,11 +172,11 @@ class UserActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        logs = self.queryset.filter(user_id=user_id).order_by('-timestamp')
+        logs = self.get_queryset().filter(user_id=user_id).order_by('-timestamp')
         serializer = self.get_serializer(logs, many=True)
         return Response(serializer.data)
 
-class SystemLogViewSet(viewsets.ReadOnlyModelViewSet):
+class SystemLogViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing system logs"""
     queryset = SystemLog.objects.all()
     serializer_class = SystemLogSerializer
@@ -201,7 +191,7 @@ class SystemLogViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def errors(self, request):
         """Get only error and critical level logs"""
-        error_logs = self.queryset.filter(level__in=['error', 'critical']).order_by('-timestamp')
+        error_logs = self.get_queryset().filter(level__in=['error', 'critical']).order_by('-timestamp')
         serializer = self.get_serializer(error_logs, many=True)
         return Response(serializer.data)
     
@@ -215,11 +205,11 @@ class SystemLogViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        logs = self.queryset.filter(component=component).order_by('-timestamp')
+        logs = self.get_queryset().filter(component=component).order_by('-timestamp')
         serializer = self.get_serializer(logs, many=True)
         return Response(serializer.data)
 
-class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+class AuditLogViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing audit logs"""
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
@@ -234,13 +224,13 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def data_changes(self, request):
         """Get only data change audit logs"""
-        data_changes = self.queryset.filter(audit_type='data_change').order_by('-timestamp')
+        data_changes = self.get_queryset().filter(audit_type='data_change').order_by('-timestamp')
         serializer = self.get_serializer(data_changes, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def security_events(self, request):
         """Get only security event audit logs"""
-        security_events = self.queryset.filter(audit_type='security_event').order_by('-timestamp')
+        security_events = self.get_queryset().filter(audit_type='security_event').order_by('-timestamp')
         serializer = self.get_serializer(security_events, many=True)
         return Response(serializer.data)
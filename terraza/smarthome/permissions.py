@@ -1,6 +1,9 @@
+import datetime
+
 from django.utils import timezone
 from rest_framework.permissions import BasePermission
 
+from booking.availability import make_local_datetime
 from booking.models import Booking
 
 ACTIVE_BOOKING_STATUSES = [
@@ -10,12 +13,15 @@ ACTIVE_BOOKING_STATUSES = [
 
 class HasSameDayActiveBooking(BasePermission):
     """Allows access to a SmartDevice only if the requesting user has an active
-    booking at that device's venue starting today."""
+    booking at that device's venue starting today (local date)."""
 
     def has_object_permission(self, request, view, obj):
+        # A local-day range on start_datetime: start_date holds the UTC date.
+        today = timezone.localdate()
         return Booking.objects.filter(
-            venue=obj.venue,
+            venue_id=obj.venue_id,
             user=request.user,
             status__in=ACTIVE_BOOKING_STATUSES,
-            start_date=timezone.now().date(),
+            start_datetime__gte=make_local_datetime(today),
+            start_datetime__lt=make_local_datetime(today + datetime.timedelta(days=1)),
         ).exists()
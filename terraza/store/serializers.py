@@ -18,7 +18,7 @@ class PaymentSerializer(serializers.ModelSerializer):
             # Check if it's a filename (contains .png, .jpg, etc.)
             if any(ext in obj.payment_photo_base64.lower() for ext in ['.png', '.jpg', '.jpeg', '.gif', '.webp']):
                 # It's a filename, construct the URL
-                return f"/media/user_{obj.user.id}/{obj.payment_photo_base64}"
+                return f"/media/user_{obj.user_id}/{obj.payment_photo_base64}"
             else:
                 # It's actual base64 data, return as is
                 return obj.payment_photo_base64
@@ -38,6 +38,11 @@ class PaymentOrderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ("status", "created_at", "external_session_id", "payments")
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        # booking_detail is a method field, invisible to the automatic planner.
+        return queryset.select_related('booking')
+
     def get_booking_detail(self, obj):
         return {
             "start_datetime": obj.booking.start_datetime,
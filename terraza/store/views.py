@@ -13,21 +13,23 @@ from .filters import PaymentOrderFilter
 from .models import PaymentOrder, Payment, RefundRequest
 from .serializers import PaymentOrderSerializer, PaymentSerializer, RefundRequestSerializer
 from logs.utils import log_payment_activity, log_booking_activity
+from terraza.eager_loading import EagerLoadingMixin
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 mercado = mercadopago.SDK(settings.MERCADO_PAGO_ACCESS_TOKEN)
 
 
-class PaymentOrderViewSet(viewsets.ModelViewSet):
+class PaymentOrderViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = PaymentOrder.objects.all()
     serializer_class = PaymentOrderSerializer
     permission_classes = [permissions.IsAuthenticated]
     filterset_class = PaymentOrderFilter
 
     def get_queryset(self):
+        qs = super().get_queryset()
         if self.request.user.is_staff:
-            return self.queryset.all()
-        return self.queryset.filter(user=self.request.user)
+            return qs
+        return qs.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         booking = serializer.validated_data["booking"]
@@ -413,16 +415,17 @@ class PaymentOrderViewSet(viewsets.ModelViewSet):
         
         
         
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     http_method_names = ['get', 'delete', 'head', 'options']
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
+        qs = super().get_queryset()
         if self.request.user.is_staff:
-            return self.queryset.all()
-        return self.queryset.filter(user=self.request.user)
+            return qs
+        return qs.filter(user=self.request.user)
 
     @action(detail=True, methods=["post"], url_path="approve")
     def approve_payment(self, request, pk=None):
@@ -511,7 +514,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class RefundRequestViewSet(viewsets.ModelViewSet):
+class RefundRequestViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = RefundRequest.objects.all()
     serializer_class = RefundRequestSerializer
     permission_classes = [permissions.IsAdminUser]  # or custom permission
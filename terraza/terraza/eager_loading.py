@@ -0,0 +1,119 @@
+"""
+Derive ``select_related``/``prefetch_related`` plans from DRF serializers.
+
+The planner walks a serializer's readable fields, follows nested serializers
+and dotted ``source`` paths through the model graph, and turns every relation
+it crosses into a join (forward FK / one-to-one) or a prefetch (many-to-many,
+reverse FK, or anything reached through one of those). Plans are computed once
+per serializer class.
+
+``SerializerMethodField``s can't be inspected; serializers that read relations
+from method fields declare a ``setup_eager_loading(queryset)`` static method,
+which is applied before the derived plan.
+
+Usage in a viewset::
+
+    class PaymentOrderViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
+        queryset = PaymentOrder.objects.all()
+        serializer_class = PaymentOrderSerializer
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+
+_plans = {}
+
+
+def _relation(model, attr):
+    """Return the model field or reverse relation reachable as ``model.attr``, or None."""
+    try:
+        field = model._meta.get_field(attr)
+    except FieldDoesNotExist:
+        field = next(
+            (rel for rel in model._meta.related_objects if rel.get_accessor_name() == attr),
+            None,
+        )
+    if field is None or not field.is_relation:
+        return None
+    return field
+
+
+def _walk(serializer, model, prefix, many, select, prefetch):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        child = None
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+        elif isinstance(field, serializers.BaseSerializer):
+            child = field
+        elif isinstance(field, ManyRelatedField):
+            # The related objects are listed even when only their pks are rendered.
+            child = field.child_relation
+
+        if field.source == '*':
+            if isinstance(child, serializers.Serializer):
+                _walk(child, model, prefix, many, select, prefetch)
+            continue
+
+        current_model, path, path_many = model, prefix, many
+        for attr in field.source.split('.'):
+            relation = _relation(current_model, attr)
+            if relation is None:
+                current_model = None
+                break
+            path = f"{path}__{attr}" if path else attr
+            path_many = path_many or relation.many_to_many or relation.one_to_many
+            current_model = relation.related_model
+            if current_model is None:
+                # Generic foreign keys can only be prefetched.
+                prefetch.append(path)
+                break
+            if attr == field.source.split('.')[-1] and isinstance(field, PrimaryKeyRelatedField):
+                # The pk is read from the local <fk>_id column; no join needed.
+                break
+            (prefetch if path_many else select).append(path)
+
+        if current_model is not None and isinstance(child, serializers.Serializer):
+            _walk(child, current_model, path, path_many, select, prefetch)
+
+
+def plan_for(serializer_class):
+    """Return the (select_related, prefetch_related) lookups the serializer needs."""
+    plan = _plans.get(serializer_class)
+    if plan is None:
+        select, prefetch = [], []
+        serializer = serializer_class()
+        model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+        if model is not None:
+            _walk(serializer, model, '', False, select, prefetch)
+        plan = (tuple(dict.fromkeys(select)), tuple(dict.fromkeys(prefetch)))
+        _plans[serializer_class] = plan
+    return plan
+
+
+def eager_load(queryset, serializer_class):
+    """Apply the serializer's hook and derived plan to the queryset."""
+    if serializer_class is None:
+        return queryset
+    hook = getattr(serializer_class, 'setup_eager_loading', None)
+    if hook is not None:
+        queryset = hook(queryset)
+
+    select, prefetch = plan_for(serializer_class)
+    seen = {getattr(lookup, 'prefetch_to', lookup) for lookup in queryset._prefetch_related_lookups}
+    prefetch = [lookup for lookup in prefetch if lookup not in seen]
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class EagerLoadingMixin:
+    """Viewset mixin that eager-loads ``get_queryset()`` for the active serializer."""
+
+    def get_queryset(self):
+        return eager_load(super().get_queryset(), self.get_serializer_class())
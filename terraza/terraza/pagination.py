@@ -0,0 +1,158 @@
+"""
+Keyset (cursor) pagination for the big listings.
+
+``PageNumberPagination`` runs a ``COUNT(*)`` of the filtered queryset and an
+``OFFSET`` scan on every page, so page 500 of the audit trail reads and
+throws away 25,000 rows. ``KeysetPagination`` keeps the page-number
+behaviour by default and switches to keyset pagination when the request
+carries a ``cursor`` parameter (empty for the first page):
+
+* rows are ordered by ``(ordering_field, pk)``, served by an index on those
+  two columns, and a page is ``WHERE (ordering_field, pk) < (last row)``
+  plus ``LIMIT page_size + 1``: the cost of a page doesn't depend on how
+  deep it is;
+* the response is ``{next, previous, results}``, with opaque ``cursor``
+  links; no count unless asked for.
+
+``?with_count=approx`` adds the planner's row estimate of the filtered
+queryset (PostgreSQL ``EXPLAIN``; other backends count exactly), and
+``?with_count=exact`` an exact ``COUNT(*)``.
+
+The direction follows the view's ordering (``?ordering=timestamp`` walks
+the logs oldest first); ordering by any other field isn't supported in
+cursor mode.
+
+Usage::
+
+    class LogPagination(KeysetPagination):
+        ordering_field = 'timestamp'
+        default_ordering = '-timestamp'
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimated_count(queryset):
+    """Planner estimate of the rows of ``queryset`` on PostgreSQL, an exact count elsewhere."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page numbers by default, keyset pagination with ``?cursor=`` (see module docstring)."""
+
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    ordering_field = None
+    default_ordering = None
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = self._count(queryset, request.query_params.get(self.count_query_param))
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        # Walking backwards (a "previous" link) reads the opposite direction and flips the page.
+        descending = self._descending(queryset) != reverse
+        field = self.ordering_field
+        sign = '-' if descending else ''
+        queryset = queryset.order_by(f'{sign}{field}', f'{sign}pk')
+        if position is not None:
+            value, pk = position
+            lookup = 'lt' if descending else 'gt'
+            # Same rows as (field, pk) < (value, pk); the leading bound lets the index seek.
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}e': value}),
+                Q(**{f'{field}__{lookup}': value}) | Q(**{f'pk__{lookup}': pk}),
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        # Forwards, there is a previous page past any cursor; backwards, always a next one.
+        has_next = more or reverse
+        has_previous = more if reverse else position is not None
+        self.next_position = self._position(rows[-1]) if rows and has_next else None
+        self.previous_position = self._position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def _descending(self, queryset):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        first = str(ordering[0]) if ordering else self.default_ordering
+        if first.lstrip('-') != self.ordering_field:
+            raise ValidationError({
+                'ordering': f'La paginación por cursor solo admite ordenar por {self.ordering_field}.'
+            })
+        return first.startswith('-')
+
+    def _count(self, queryset, mode):
+        if mode == 'approx':
+            return estimated_count(queryset)
+        if mode == 'exact':
+            return queryset.count()
+        return None
+
+    def _position(self, row):
+        return getattr(row, self.ordering_field), row.pk
+
+    def decode_cursor(self, request, model):
+        """``((value, pk), reverse)`` of the ``cursor`` parameter; ``(None, False)`` for the first page."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            value = model._meta.get_field(self.ordering_field).to_python(value)
+            pk = model._meta.pk.to_python(pk)
+        except (TypeError, ValueError, DjangoValidationError) as e:
+            raise NotFound(self.invalid_cursor_message) from e
+        return (value, pk), bool(reverse)
+
+    def encode_cursor(self, position, reverse):
+        value, pk = position
+        payload = json.dumps([value.isoformat(), str(pk), reverse])
+        encoded = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        return self.encode_cursor(self.next_position, False) if self.next_position else None
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return self.encode_cursor(self.previous_position, True) if self.previous_position else None
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        body = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.count is not None:
+            body = {'count': self.count, **body}
+        return Response(body)
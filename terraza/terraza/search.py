@@ -0,0 +1,216 @@
+"""
+Full-text search over the description columns of logs and bookings.
+
+``SearchFilter`` turns ``?search=`` into ``ILIKE '%term%'`` over every
+search field, a sequential scan of the whole table. Tables listed in
+``INDEXED_COLUMNS`` get a full-text index instead (migration operation
+``CreateSearchIndex``):
+
+* PostgreSQL: a generated ``search_vector`` tsvector column (Spanish
+  configuration, so "reservas" finds "reserva") with a GIN index. The
+  database keeps it up to date on every write.
+* SQLite: an FTS5 external-content table ``<table>_fts`` over the same
+  columns, kept in sync by triggers and joined back by rowid. These tables
+  have UUID primary keys, so VACUUM may renumber their rowids, and
+  migrations that rebuild a table drop its triggers; run
+  ``python manage.py rebuild_search_index`` after either.
+
+``FullTextSearchFilter`` is a drop-in replacement for ``SearchFilter``:
+search fields that are indexed columns of the model are matched through the
+index, every word as a prefix on both backends ("res" finds "reserva"); fields across a relation (``user__email``) are matched with
+``icontains`` on the related table and joined back with an ``IN`` subquery,
+so the big table is never scanned. Any other backend, or a model without an
+index, falls back to ``SearchFilter``.
+
+Usage in a viewset::
+
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
+    search_fields = ['description', 'user__email']
+"""
+
+import operator
+import re
+from functools import reduce
+
+from django.db import connection
+from django.db.migrations.operations.base import Operation
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+# db_table -> text columns covered by its full-text index.
+INDEXED_COLUMNS = {
+    'logs_activitylog': ('description', 'action'),
+    'logs_bookinglog': ('description',),
+    'logs_paymentlog': ('description',),
+    'booking_booking': ('description',),
+}
+SEARCH_CONFIG = 'spanish'
+VECTOR_COLUMN = 'search_vector'
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _document(columns):
+    return " || ' ' || ".join(f"coalesce({_quote(column)}, '')" for column in columns)
+
+
+def _sqlite_sql(table, columns):
+    fts = _quote(f'{table}_fts')
+    names = ', '.join(_quote(column) for column in columns)
+    new = ', '.join(f'new.{_quote(column)}' for column in columns)
+    old = ', '.join(f'old.{_quote(column)}' for column in columns)
+    remove = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.rowid, {old});"
+    add = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.rowid, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content={_quote(table)}, "
+        f"tokenize = 'unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER {_quote(table + '_fts_insert')} AFTER INSERT ON {_quote(table)} BEGIN {add} END",
+        f"CREATE TRIGGER {_quote(table + '_fts_delete')} AFTER DELETE ON {_quote(table)} BEGIN {remove} END",
+        f"CREATE TRIGGER {_quote(table + '_fts_update')} AFTER UPDATE OF {names} ON {_quote(table)} "
+        f"BEGIN {remove} {add} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _postgresql_sql(table, columns):
+    return [
+        f"ALTER TABLE {_quote(table)} ADD COLUMN {VECTOR_COLUMN} tsvector GENERATED ALWAYS AS "
+        f"(to_tsvector('{SEARCH_CONFIG}'::regconfig, {_document(columns)})) STORED",
+        f"CREATE INDEX {_quote(table + '_search_idx')} ON {_quote(table)} USING gin ({VECTOR_COLUMN})",
+    ]
+
+
+def supports_full_text(vendor=None):
+    return (vendor or connection.vendor) in ('postgresql', 'sqlite')
+
+
+class CreateSearchIndex(Operation):
+    """Migration operation installing the full-text index of ``table`` over ``columns``."""
+
+    reversible = True
+
+    def __init__(self, table, columns):
+        self.table = table
+        self.columns = tuple(columns)
+
+    def deconstruct(self):
+        return self.__class__.__name__, [], {'table': self.table, 'columns': self.columns}
+
+    def state_forwards(self, app_label, state):
+        # The index lives outside the models: no migration state to change.
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        vendor = schema_editor.connection.vendor
+        if vendor == 'postgresql':
+            statements = _postgresql_sql(self.table, self.columns)
+        elif vendor == 'sqlite':
+            statements = _sqlite_sql(self.table, self.columns)
+        else:
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        vendor = schema_editor.connection.vendor
+        if vendor == 'postgresql':
+            schema_editor.execute(f"ALTER TABLE {_quote(self.table)} DROP COLUMN IF EXISTS {VECTOR_COLUMN}")
+        elif vendor == 'sqlite':
+            for suffix in ('_fts_insert', '_fts_delete', '_fts_update'):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {_quote(self.table + suffix)}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {_quote(self.table + '_fts')}")
+
+    def describe(self):
+        return f"Create full-text search index on {self.table}"
+
+
+def rebuild(table):
+    """Re-create the SQLite index of ``table`` from its rows (PostgreSQL maintains its own)."""
+    if connection.vendor != 'sqlite':
+        return False
+    columns = INDEXED_COLUMNS[table]
+    with connection.cursor() as cursor:
+        for suffix in ('_fts_insert', '_fts_delete', '_fts_update'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {_quote(table + suffix)}")
+        cursor.execute(f"DROP TABLE IF EXISTS {_quote(table + '_fts')}")
+        for sql in _sqlite_sql(table, columns):
+            cursor.execute(sql)
+    return True
+
+
+def _words(text):
+    # Split as both tokenizers do; each word is then matched as a prefix.
+    return re.findall(r'\w+', text)
+
+
+def _fts5_query(words):
+    # Quoted, so words like NEAR or OR can't hit FTS5 query syntax.
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _tsquery(words):
+    # \w+ words can't contain tsquery operators; ``:*`` makes each one a prefix.
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def matching_pks(model, text):
+    """Subquery of the pks of ``model`` rows whose indexed columns have every word of ``text`` as a prefix."""
+    table = model._meta.db_table
+    pk = _quote(model._meta.pk.column)
+    words = _words(text)
+    if connection.vendor == 'postgresql':
+        return RawSQL(
+            f"SELECT {pk} FROM {_quote(table)} "
+            f"WHERE {VECTOR_COLUMN} @@ to_tsquery('{SEARCH_CONFIG}', %s)",
+            [_tsquery(words)],
+        )
+    return RawSQL(
+        f"SELECT {pk} FROM {_quote(table)} WHERE rowid IN "
+        f"(SELECT rowid FROM {_quote(table + '_fts')} WHERE {_quote(table + '_fts')} MATCH %s)",
+        [_fts5_query(words)],
+    )
+
+
+class FullTextSearchFilter(SearchFilter):
+    """``SearchFilter`` backed by the full-text index of the model (see module docstring).
+
+    Same semantics as ``SearchFilter``: every search term has to match one of
+    the search fields, not necessarily the same one.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        terms = self.get_search_terms(request)
+        model = queryset.model
+        indexed = INDEXED_COLUMNS.get(model._meta.db_table, ())
+        if not search_fields or not terms or not indexed or not supports_full_text():
+            return super().filter_queryset(request, queryset, view)
+
+        use_index = any(field in indexed for field in search_fields)
+        local, related = [], {}
+        for field in search_fields:
+            if field in indexed:
+                continue
+            name, _, rest = field.partition('__')
+            if rest:
+                related.setdefault(name, []).append(rest)
+            else:
+                local.append(field)
+
+        conditions = []
+        for term in terms:
+            options = [Q(**{f'{field}__icontains': term}) for field in local]
+            if use_index and _words(term):
+                options.append(Q(pk__in=matching_pks(model, term)))
+            for name, fields in related.items():
+                related_model = model._meta.get_field(name).related_model
+                matches = related_model._default_manager.filter(
+                    reduce(operator.or_, (Q(**{f'{field}__icontains': term}) for field in fields))
+                )
+                options.append(Q(**{f'{name}__in': matches.values('pk')}))
+            conditions.append(reduce(operator.or_, options) if options else Q(pk__in=[]))
+
+        return queryset.filter(reduce(operator.and_, conditions))
@@ -153,6 +153,7 @@ INSTALLED_APPS = [
     'dashboard',
     'logs',
     'smarthome',
+    'jobs',
 
     #Exterior
     'rest_framework',
@@ -176,6 +177,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "logs.middleware.LogBufferMiddleware",
 ]
 
 
@@ -380,6 +382,46 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 GOOGLE_SERVICE_ACCOUNT_JSON = env("GOOGLE_SERVICE_ACCOUNT_JSON", default=None)
 GOOGLE_SERVICE_ACCOUNT_KEY_FILE = env("GOOGLE_SERVICE_ACCOUNT_KEY_FILE", default=None)
 GOOGLE_CALENDAR_ID = env("GOOGLE_CALENDAR_ID", default="primary")
+# Seconds a booking must stay unchanged before its event is pushed; saves in
+# between are coalesced into one sync (see booking/signals.py).
+GOOGLE_CALENDAR_SYNC_DELAY = env.int("GOOGLE_CALENDAR_SYNC_DELAY", default=15)
+# Seconds between incremental pulls of changes made in Google Calendar
+# (start the recurring job with `python manage.py sync_gcal --schedule`).
+GOOGLE_CALENDAR_PULL_INTERVAL = env.int("GOOGLE_CALENDAR_PULL_INTERVAL", default=300)
+
+# Seconds between sweeps matching waitlist wishes against free days
+# (start the recurring job with `python manage.py sweep_waitlist --schedule`).
+WAITLIST_SWEEP_INTERVAL = env.int("WAITLIST_SWEEP_INTERVAL", default=3600)
+
+# Also email staff a digest of each batch of new bookings (in-app alerts are always sent)
+STAFF_NEW_BOOKING_DIGEST = env.bool("STAFF_NEW_BOOKING_DIGEST", default=False)
+
+# Long poll of the notification badge (GET /api/bookings/notifications/wait/):
+# longest a request may block, and how often it re-reads the counter, in seconds.
+# A blocked request holds a worker and a DB connection, which starves gunicorn's
+# default sync workers; keep 0 (answer at once, like unread_count) unless the API
+# runs on threaded workers (gunicorn --worker-class gthread --threads N), and even
+# then only a few seconds.
+NOTIFICATIONS_LONG_POLL_TIMEOUT = env.int("NOTIFICATIONS_LONG_POLL_TIMEOUT", default=0)
+NOTIFICATIONS_LONG_POLL_INTERVAL = env.float("NOTIFICATIONS_LONG_POLL_INTERVAL", default=1.0)
+
+# Email outbox (users/outbox.py): seconds to wait for more emails before a
+# drain, messages per drain, and the SMTP provider's limits (Gmail Workspace
+# allows 2000 messages per rolling 24 hours).
+EMAIL_OUTBOX_DELAY = env.int("EMAIL_OUTBOX_DELAY", default=5)
+EMAIL_OUTBOX_BATCH_SIZE = env.int("EMAIL_OUTBOX_BATCH_SIZE", default=50)
+EMAIL_RATE_PER_MINUTE = env.int("EMAIL_RATE_PER_MINUTE", default=120)
+EMAIL_DAILY_QUOTA = env.int("EMAIL_DAILY_QUOTA", default=1800)
+EMAIL_MAX_ATTEMPTS = env.int("EMAIL_MAX_ATTEMPTS", default=5)
+
+# Log rows (logs/utils.py) recorded during a request are written in bulk when
+# the response is ready, or earlier once this many are pending (see logs/buffer.py).
+LOG_BUFFER_SIZE = env.int("LOG_BUFFER_SIZE", default=100)
+# `python manage.py archive_logs` moves log rows older than this many full
+# months to gzipped JSONL files under LOG_ARCHIVE_DIR in default_storage (keep
+# that path out of whatever serves MEDIA_URL publicly).
+LOG_RETENTION_MONTHS = env.int("LOG_RETENTION_MONTHS", default=12)
+LOG_ARCHIVE_DIR = env("LOG_ARCHIVE_DIR", default="private/log_archive")
 
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Booking API',
@@ -387,3 +429,19 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
     # Add other options if needed
 }
+
+# Seconds a per-venue booking availability index may be served before it is
+# rebuilt (see booking/availability.py). Saves in this process invalidate it
+# immediately; the TTL bounds staleness across worker processes.
+BOOKING_AVAILABILITY_INDEX_TTL = env.int("BOOKING_AVAILABILITY_INDEX_TTL", default=30)
+
+# Seconds the venue configuration may be served from the cache (see
+# VenueConfiguration.get_config). The cache is per process and saves only clear
+# the saving process' copy, so this bounds how long the other gunicorn workers and
+# the job worker keep old hours and deposit minimums after an admin edit.
+VENUE_CONFIG_CACHE_TTL = env.int("VENUE_CONFIG_CACHE_TTL", default=5)
+
+# Background jobs (see jobs/queue.py) are run by `python manage.py run_jobs`.
+# JOBS_EAGER runs them in-process right after the commit instead, for
+# development setups without a worker.
+JOBS_EAGER = env.bool("JOBS_EAGER", default=False)
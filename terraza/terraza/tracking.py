@@ -0,0 +1,84 @@
+"""
+Old-value tracking for model fields.
+
+Models list the fields they care about in ``tracked_fields``. The values are
+captured once when a row is loaded (``from_db``), so signal receivers and views
+can ask ``has_changed('status')`` or ``previous('status')`` without loading the
+row again. The snapshot stays valid through ``pre_save``/``post_save`` and is
+reset once ``save()`` returns, or after ``refresh_from_db()``.
+
+Foreign keys are tracked by their raw id: ``previous('venue')`` returns the
+previous ``venue_id``.
+
+Instances that were never loaded from the database (built in memory and not
+saved yet) report every tracked field as changed and ``previous()`` as None.
+"""
+
+from django.db.models import DEFERRED
+
+
+class TrackedFieldsMixin:
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_tracked_fields()
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # post_save runs after _state.adding flips; nothing was stored before this insert.
+            self._tracked_snapshot = dict.fromkeys(self.tracked_fields)
+        super().save(*args, **kwargs)
+        self._snapshot_tracked_fields(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot_tracked_fields(fields)
+
+    def _tracked_attnames(self):
+        return {name: self._meta.get_field(name).attname for name in self.tracked_fields}
+
+    def _snapshot_tracked_fields(self, only=None):
+        snapshot = getattr(self, '_tracked_snapshot', None)
+        if snapshot is None:
+            snapshot = self._tracked_snapshot = {}
+        only = set(only) if only is not None else None
+        for name, attname in self._tracked_attnames().items():
+            if only is not None and name not in only and attname not in only:
+                continue
+            value = self.__dict__.get(attname, DEFERRED)
+            if value is DEFERRED:
+                snapshot.pop(name, None)
+            else:
+                snapshot[name] = value
+
+    def _load_missing_snapshot(self, name):
+        # Deferred at load time, or the instance was built by hand for an existing row.
+        attname = self._tracked_attnames()[name]
+        stored = type(self)._base_manager.using(self._state.db or 'default').filter(
+            pk=self.pk,
+        ).values_list(attname, flat=True).first()
+        self.__dict__.setdefault('_tracked_snapshot', {})[name] = stored
+        return stored
+
+    def previous(self, name):
+        """Value of ``name`` as last loaded from or saved to the database."""
+        if name not in self.tracked_fields:
+            raise ValueError(f"{type(self).__name__}.{name} is not a tracked field")
+        if self._state.adding:
+            return None
+        snapshot = getattr(self, '_tracked_snapshot', {})
+        if name in snapshot:
+            return snapshot[name]
+        return self._load_missing_snapshot(name)
+
+    def has_changed(self, name):
+        if self._state.adding:
+            return True
+        attname = self._tracked_attnames()[name]
+        return self.__dict__.get(attname) != self.previous(name)
+
+    def changed_fields(self):
+        return [name for name in self.tracked_fields if self.has_changed(name)]
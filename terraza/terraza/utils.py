@@ -7,6 +7,8 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import exception_handler
 
+from booking import availability
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,6 +19,11 @@ def custom_exception_handler(exc, context):
                 {"detail": "A booking with this slug already exists."},
                 status=status.HTTP_409_CONFLICT,
             )
+        if availability.is_overlap_violation(exc):
+            return Response(
+                {field: [message] for field, message in availability.overlap_error_dict().items()},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         return Response(
             {"detail": "A database error occurred."},
             status=status.HTTP_400_BAD_REQUEST,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserAccount, Profile
+from .models import OutboxEmail, UserAccount, Profile
 
 # Register your models here.
 @admin.register(UserAccount)
@@ -16,3 +16,20 @@ class ProfileAdmin(admin.ModelAdmin):
     list_filter = ['gender', 'country', 'date_created']
     search_fields = ['user__email', 'user__first_name', 'user__last_name', 'pid']
     readonly_fields = ['date_created', 'pid']
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ['id', 'subject', 'to', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['subject', 'to', 'last_error']
+    readonly_fields = ['created_at', 'sent_at', 'locked_at']
+    actions = ['retry_now']
+
+    @admin.action(description="Reintentar envío")
+    def retry_now(self, request, queryset):
+        from . import outbox
+
+        updated = queryset.filter(status='failed').update(status='pending', attempts=0, last_error='')
+        if updated:
+            outbox.schedule_drain()
+        self.message_user(request, f"{updated} correo(s) reprogramados.")
@@ -1,8 +1,12 @@
 from django.core.mail.backends.smtp import EmailBackend
 from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.template.loader import get_template
 from django.conf import settings
+from django.utils import translation
 import logging
+import threading
+
+from . import outbox
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +15,25 @@ def _contact_email():
     return getattr(settings, 'CONTACT_EMAIL', settings.DEFAULT_FROM_EMAIL)
 
 
+# Compiled email templates per (template name, language); rendering then skips
+# the loader lookup and the parse.
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def render_email(template_name, context, language=None):
+    language = language or translation.get_language() or settings.LANGUAGE_CODE
+    key = (template_name, language)
+    template = _templates.get(key)
+    if template is None:
+        with translation.override(language):
+            template = get_template(template_name)
+        with _templates_lock:
+            _templates[key] = template
+    with translation.override(language):
+        return template.render(context)
+
+
 class CustomEmailBackend(EmailBackend):
     def send_messages(self, email_messages):
         for message in email_messages:
@@ -28,7 +51,7 @@ class TerrazaEmailService:
         date_str = booking.start_datetime.strftime('%d/%m/%Y')
         subject = f'Reserva confirmada · {user.first_name} · {date_str} - Terraza Pineda'
 
-        html_content = render_to_string('email/booking_confirmation.html', {
+        html_content = render_email('email/booking_confirmation.html', {
             'user': user,
             'booking': booking,
             'domain': settings.SITE_URL_FRONTEND,
@@ -52,15 +75,15 @@ class TerrazaEmailService:
             to=[user.email],
         )
         msg.attach_alternative(html_content, "text/html")
-        msg.send()
-        logger.info(f"Booking confirmation sent to {user.email}")
+        outbox.queue_message(msg)
+        logger.info(f"Booking confirmation queued for {user.email}")
 
     @staticmethod
     def send_booking_status_update(user, booking, old_status):
         date_str = booking.start_datetime.strftime('%d/%m/%Y')
         subject = f'Actualización de reserva · {user.first_name} · {date_str} - Terraza Pineda'
 
-        html_content = render_to_string('email/booking_status_update.html', {
+        html_content = render_email('email/booking_status_update.html', {
             'user': user,
             'booking': booking,
             'old_status': old_status,
@@ -85,5 +108,37 @@ class TerrazaEmailService:
             to=[user.email],
         )
         msg.attach_alternative(html_content, "text/html")
-        msg.send()
-        logger.info(f"Booking status update sent to {user.email}")
+        outbox.queue_message(msg)
+        logger.info(f"Booking status update queued for {user.email}")
+
+    @staticmethod
+    def send_staff_new_bookings_digest(recipients, bookings):
+        """Queue one email per staff member listing ``bookings``."""
+        count = len(bookings)
+        subject = (
+            'Nueva solicitud de reserva - Terraza Pineda' if count == 1
+            else f'{count} nuevas solicitudes de reserva - Terraza Pineda'
+        )
+        lines = [
+            f"- {booking.start_datetime.strftime('%d/%m/%Y %H:%M')} · {booking.venue.name} · "
+            f"{booking.user.get_full_name().strip() or booking.user.email}"
+            for booking in bookings
+        ]
+        listing = "\n".join(lines)
+
+        messages = [
+            EmailMultiAlternatives(
+                subject=subject,
+                body=(
+                    f"Hola {recipient['first_name']},\n\n"
+                    f"Se recibieron nuevas solicitudes de reserva:\n\n"
+                    f"{listing}\n\n"
+                    f"Revísalas en el panel: {settings.SITE_URL_FRONTEND}\n"
+                ),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[recipient['email']],
+            )
+            for recipient in recipients
+        ]
+        outbox.queue_messages(messages)
+        logger.info(f"New booking digest ({count}) queued for {len(messages)} staff member(s)")
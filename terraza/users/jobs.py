@@ -0,0 +1,19 @@
+"""
+Background jobs of the users app (see jobs/queue.py).
+"""
+
+import datetime
+
+from jobs import queue
+from . import outbox
+
+
+@queue.register(outbox.DRAIN_JOB)
+def drain_outbox():
+    """Send a batch of queued emails; schedule another drain while some are left."""
+    stats = outbox.drain()
+    if not outbox.pending_count():
+        return
+    # Out of daily quota: try again later instead of spinning.
+    delay = datetime.timedelta(hours=1) if stats['throttled'] else datetime.timedelta(0)
+    outbox.schedule_drain(delay=delay)
@@ -0,0 +1,100 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+from django.utils import timezone, translation
+
+from users.email_service import _templates, render_email
+
+User = get_user_model()
+
+TEMPLATES = {
+    'confirmation': 'email/booking_confirmation.html',
+    'status': 'email/booking_status_update.html',
+}
+
+
+def sample_contexts(count):
+    """Contexts like the ones TerrazaEmailService builds, over unsaved objects."""
+    from booking.models import Booking, Package, Venue
+
+    venue = Venue(name='Terraza Pineda')
+    package = Package(title='Paquete Fiesta', price=3500, description='')
+    start = timezone.now().replace(minute=0, second=0, microsecond=0)
+    contexts = []
+    for i in range(count):
+        user = User(email=f'cliente{i}@test.com', first_name=f'Cliente {i}', last_name='Prueba')
+        booking = Booking(
+            pk=i + 1,
+            user=user,
+            venue=venue,
+            package=package if i % 2 else None,
+            start_datetime=start + datetime.timedelta(days=i),
+            end_datetime=start + datetime.timedelta(days=i, hours=5),
+            status='apartado',
+            description=f'Cumpleaños {i}' if i % 3 else '',
+        )
+        contexts.append({
+            'user': user,
+            'booking': booking,
+            'old_status': 'solicitud',
+            'domain': settings.SITE_URL_FRONTEND,
+            'contact_email': getattr(settings, 'CONTACT_EMAIL', settings.DEFAULT_FROM_EMAIL),
+        })
+    return contexts
+
+
+class Command(BaseCommand):
+    help = 'Render N booking emails and report the render time per message'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='Number of emails to render')
+        parser.add_argument('--template', choices=sorted(TEMPLATES), default='confirmation')
+        parser.add_argument('--language', default=settings.LANGUAGE_CODE)
+        parser.add_argument(
+            '--max-us', type=float,
+            help='Fail when the cached-template path takes longer than this many µs per message',
+        )
+
+    def _time(self, render, contexts):
+        started = time.perf_counter()
+        for context in contexts:
+            render(context)
+        return (time.perf_counter() - started) / len(contexts) * 1e6
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if count <= 0:
+            raise CommandError('--count debe ser mayor que cero')
+        template_name = TEMPLATES[options['template']]
+        language = options['language']
+        contexts = sample_contexts(count)
+
+        def full_render(context):
+            # What render_to_string() does for every message.
+            with translation.override(language):
+                return get_template(template_name).render(context)
+
+        def cached_render(context):
+            # What TerrazaEmailService does.
+            return render_email(template_name, context, language=language)
+
+        # Warm up both paths so neither pays for compiling the template.
+        _templates.clear()
+        full_render(contexts[0])
+        cached_render(contexts[0])
+        plain = self._time(full_render, contexts)
+        cached = self._time(cached_render, contexts)
+
+        self.stdout.write(f'{template_name}: {count} mensajes')
+        self.stdout.write(f'  plantilla completa:  {plain:8.1f} µs/mensaje')
+        self.stdout.write(f'  plantilla en caché:  {cached:8.1f} µs/mensaje ({plain / cached:.1f}x)')
+
+        if options['max_us'] is not None and cached > options['max_us']:
+            raise CommandError(
+                f'El renderizado tarda {cached:.1f} µs por mensaje (máximo {options["max_us"]:.1f} µs)'
+            )
+        self.stdout.write(self.style.SUCCESS('Benchmark completado'))
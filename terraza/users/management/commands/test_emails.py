@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
+from users import outbox
 from users.email_service import TerrazaEmailService
 
 User = get_user_model()
@@ -40,6 +41,7 @@ class Command(BaseCommand):
             booking = Booking.objects.filter(user=user).first()
             if booking:
                 TerrazaEmailService.send_booking_confirmation(user, booking)
+                outbox.drain()
                 self.stdout.write(self.style.SUCCESS(f'Booking confirmation email sent for booking #{booking.id}'))
             else:
                 self.stdout.write(self.style.ERROR('No bookings found for this user'))
@@ -0,0 +1,148 @@
+"""
+Outgoing email queue (``OutboxEmail``) and the sender that drains it.
+
+``TerrazaEmailService`` no longer calls ``msg.send()``, which opened a new
+TLS session with the SMTP server for every message. It stores the rendered
+message with ``queue_message``/``queue_messages`` and schedules the
+``users.drain_outbox`` job (debounced by EMAIL_OUTBOX_DELAY seconds, so a
+burst of emails is drained by one run).
+
+``drain`` claims up to EMAIL_OUTBOX_BATCH_SIZE pending emails and sends them
+over a single ``get_connection()``, spaced to stay under
+EMAIL_RATE_PER_MINUTE and stopping at EMAIL_DAILY_QUOTA messages per rolling
+24 hours (Gmail rejects the whole account once its quota is exceeded).
+Failed messages are retried by later drains up to EMAIL_MAX_ATTEMPTS times.
+"""
+
+import datetime
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from jobs import queue
+
+DRAIN_JOB = 'users.drain_outbox'
+# Emails claimed by a drain that died mid-batch go back to the queue after this long.
+STALE_AFTER = datetime.timedelta(minutes=15)
+
+
+def _row(message):
+    from .models import OutboxEmail
+
+    html = next((content for content, mimetype in getattr(message, 'alternatives', []) if mimetype == 'text/html'), '')
+    return OutboxEmail(
+        subject=message.subject,
+        body=message.body,
+        html_body=html,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(message.to),
+    )
+
+
+def schedule_drain(delay=None):
+    if delay is None:
+        delay = datetime.timedelta(seconds=settings.EMAIL_OUTBOX_DELAY)
+    queue.enqueue(DRAIN_JOB, {}, dedupe_key='email-outbox', delay=delay)
+
+
+def queue_message(message):
+    """Store an EmailMessage for the next drain."""
+    return queue_messages([message])[0]
+
+
+def queue_messages(messages):
+    from .models import OutboxEmail
+
+    rows = OutboxEmail.objects.bulk_create([_row(message) for message in messages])
+    if rows:
+        schedule_drain()
+    return rows
+
+
+def _to_message(row, connection):
+    message = EmailMultiAlternatives(
+        subject=row.subject,
+        body=row.body,
+        from_email=row.from_email,
+        to=row.to,
+        connection=connection,
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, 'text/html')
+    return message
+
+
+def _claim(limit):
+    from .models import OutboxEmail
+
+    now = timezone.now()
+    OutboxEmail.objects.filter(status='sending', locked_at__lt=now - STALE_AFTER).update(status='pending', locked_at=None)
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('id')
+            .values_list('pk', flat=True)[:limit]
+        )
+        OutboxEmail.objects.filter(pk__in=ids, status='pending').update(status='sending', locked_at=now)
+    return list(OutboxEmail.objects.filter(pk__in=ids, status='sending', locked_at=now).order_by('id'))
+
+
+def remaining_quota():
+    from .models import OutboxEmail
+
+    since = timezone.now() - datetime.timedelta(days=1)
+    sent = OutboxEmail.objects.filter(status='sent', sent_at__gte=since).count()
+    return max(settings.EMAIL_DAILY_QUOTA - sent, 0)
+
+
+def drain(batch_size=None, sleep=time.sleep):
+    """Send one batch of pending emails over a single connection. Returns stats."""
+    from .models import OutboxEmail
+
+    stats = Counter()
+    limit = min(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE, remaining_quota())
+    if limit <= 0:
+        stats['throttled'] = OutboxEmail.objects.filter(status='pending').count()
+        return stats
+    rows = _claim(limit)
+    if not rows:
+        return stats
+
+    interval = 60.0 / settings.EMAIL_RATE_PER_MINUTE
+    last_sent = None
+    connection = get_connection()
+    try:
+        connection.open()
+        for row in rows:
+            if last_sent is not None:
+                sleep(max(0.0, interval - (time.monotonic() - last_sent)))
+            row.attempts += 1
+            try:
+                connection.send_messages([_to_message(row, connection)])
+            except Exception as e:
+                row.last_error = str(e)
+                row.status = 'failed' if row.attempts >= settings.EMAIL_MAX_ATTEMPTS else 'pending'
+                stats['failed'] += 1
+                print(f"[outbox] No se pudo enviar el correo #{row.pk} a {', '.join(row.to)}: {e}")
+            else:
+                row.status = 'sent'
+                row.sent_at = timezone.now()
+                row.last_error = ''
+                stats['sent'] += 1
+            row.locked_at = None
+            last_sent = time.monotonic()
+    finally:
+        connection.close()
+        OutboxEmail.objects.bulk_update(rows, ['status', 'attempts', 'last_error', 'sent_at', 'locked_at'])
+    return stats
+
+
+def pending_count():
+    from .models import OutboxEmail
+
+    return OutboxEmail.objects.filter(status='pending').count()
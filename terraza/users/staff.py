@@ -0,0 +1,19 @@
+"""
+Staff recipients of new-booking alerts and digest emails.
+
+Read by the job worker once per batch of new bookings (booking/staff_alerts.py),
+straight from the database: a cached copy lives in each process, and the
+worker's would keep alerting demoted or deactivated staff, with customer data,
+until it expired.
+"""
+
+
+def staff_recipients():
+    """[{'id', 'email', 'first_name', 'last_name'}] of the active staff members."""
+    from .models import UserAccount
+
+    return list(
+        UserAccount.objects.filter(is_staff=True, is_active=True)
+        .order_by('pk')
+        .values('id', 'email', 'first_name', 'last_name')
+    )
@@ -1,3 +1,129 @@
-from django.test import TestCase
+import smtplib
+from io import StringIO
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from jobs.models import Job
+from . import outbox, staff
+from .models import OutboxEmail, UserAccount
+
+
+class StaffRecipientsTestCase(TestCase):
+    def setUp(self):
+        self.admin = UserAccount.objects.create_user(email='admin@test.com', first_name='Luis', last_name='Pérez')
+        self.admin.is_staff = True
+        self.admin.save()
+        self.customer = UserAccount.objects.create_user(email='cliente@test.com', first_name='Ana', last_name='López')
+
+    def emails(self):
+        return [recipient['email'] for recipient in staff.staff_recipients()]
+
+    def test_recipients_are_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.emails(), ['admin@test.com'])
+
+    def test_promoting_and_demoting_staff_is_seen_at_once(self):
+        self.emails()
+        # A plain update, as from another process: nothing to invalidate.
+        UserAccount.objects.filter(pk=self.customer.pk).update(is_staff=True)
+        self.assertEqual(self.emails(), ['admin@test.com', 'cliente@test.com'])
+
+        UserAccount.objects.filter(pk=self.admin.pk).update(is_active=False)
+        self.assertEqual(self.emails(), ['cliente@test.com'])
+
+
+class CountingBackend(locmem.EmailBackend):
+    """locmem backend that records connections and can refuse some recipients."""
+    opened = 0
+    refused = set()
+
+    def open(self):
+        type(self).opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.refused:
+                raise smtplib.SMTPRecipientsRefused({address: (550, b'No such user') for address in message.to})
+        return super().send_messages(messages)
+
+
+@override_settings(
+    EMAIL_BACKEND='users.tests.CountingBackend',
+    EMAIL_RATE_PER_MINUTE=60, EMAIL_DAILY_QUOTA=100, EMAIL_OUTBOX_BATCH_SIZE=50, EMAIL_MAX_ATTEMPTS=2,
+)
+class EmailOutboxTestCase(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+        CountingBackend.refused = set()
+        self.sleeps = []
+
+    def queue(self, count, start=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            outbox.queue_messages([
+                EmailMultiAlternatives(subject=f'Correo {i}', body='Hola', to=[f'persona{i}@test.com'])
+                for i in range(start, start + count)
+            ])
+
+    def drain(self):
+        return outbox.drain(sleep=self.sleeps.append)
+
+    def test_messages_share_one_connection_and_drain_job(self):
+        self.queue(3)
+        self.queue(2, start=3)
+        self.assertEqual(Job.objects.filter(name=outbox.DRAIN_JOB, status='pending').count(), 1)
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(self.drain()['sent'], 5)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(OutboxEmail.objects.filter(status='sent').count(), 5)
+        # One message per second at 60/min: a pause before every message but the first.
+        self.assertEqual(len(self.sleeps), 4)
+        self.assertTrue(all(0.9 < seconds <= 1.0 for seconds in self.sleeps))
+
+    def test_html_alternative_is_kept(self):
+        message = EmailMultiAlternatives(subject='Reserva', body='Texto', to=['ana@test.com'])
+        message.attach_alternative('<p>Hola</p>', 'text/html')
+        outbox.queue_message(message)
+        self.drain()
+        self.assertEqual(mail.outbox[0].alternatives[0][0], '<p>Hola</p>')
+
+    @override_settings(EMAIL_DAILY_QUOTA=3)
+    def test_daily_quota_holds_the_rest(self):
+        self.queue(5)
+        self.assertEqual(self.drain()['sent'], 3)
+        self.assertEqual(self.drain()['throttled'], 2)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_failures_are_retried_then_given_up(self):
+        CountingBackend.refused = {'persona1@test.com'}
+        self.queue(3)
+        self.assertEqual(self.drain(), {'sent': 2, 'failed': 1})
+        self.assertEqual(OutboxEmail.objects.get(to=['persona1@test.com']).status, 'pending')
+        self.drain()
+        failed = OutboxEmail.objects.get(to=['persona1@test.com'])
+        self.assertEqual((failed.status, failed.attempts), ('failed', 2))
+        self.assertIn('No such user', failed.last_error)
+
+
+class EmailTemplatesTestCase(TestCase):
+    def test_templates_are_compiled_once_per_language(self):
+        from .email_service import _templates, render_email
+
+        _templates.clear()
+        render_email('email/activation.html', {}, language='es')
+        render_email('email/activation.html', {}, language='es')
+        render_email('email/activation.html', {}, language='en')
+        self.assertEqual(set(_templates), {('email/activation.html', 'es'), ('email/activation.html', 'en')})
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_email_render', count=5, template='status', stdout=out)
+        self.assertIn('µs/mensaje', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('benchmark_email_render', count=5, max_us=0.001, stdout=StringIO())